@@ -0,0 +1,43 @@
+"""add indexes for hot queries
+
+Revision ID: 0b9e7d3f1a64
+Revises: f41d6a2c8e57
+Create Date: 2026-10-18 14:48:09.517302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b9e7d3f1a64'
+down_revision: Union[str, None] = 'f41d6a2c8e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns, unique
+_INDEXES = [
+    ('ix_feeds_url', 'feeds', ['url'], True),
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_users_uuid', 'users', ['uuid'], True),
+    ('ix_posts_feed_id_published_at', 'posts', ['feed_id', 'published_at', 'id'], False),
+    ('ix_user_feed_post_link_user_id_feed_id_is_read', 'user_feed_post_link', ['user_id', 'feed_id', 'is_read'], False),
+    ('ix_user_feed_post_link_feed_id_post_id', 'user_feed_post_link', ['feed_id', 'post_id'], False),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY does not lock out writes but cannot run
+    # inside a transaction. a build that fails (e.g. duplicate urls or
+    # emails) leaves an invalid index behind, drop it before retrying
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in _INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(_INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,28 @@
+"""add retention overrides to feeds
+
+Revision ID: 2d8f4c1b7e90
+Revises: 7c2a9e4b6d18
+Create Date: 2026-10-18 16:42:51.208337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8f4c1b7e90'
+down_revision: Union[str, None] = '7c2a9e4b6d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('feeds', sa.Column('retention_days', sa.Integer(), nullable=True))
+    op.add_column('feeds', sa.Column('retention_max_posts', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('feeds', 'retention_max_posts')
+    op.drop_column('feeds', 'retention_days')
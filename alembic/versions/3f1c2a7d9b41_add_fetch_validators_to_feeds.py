@@ -0,0 +1,31 @@
+"""add fetch validators to feeds
+
+Revision ID: 3f1c2a7d9b41
+Revises: 5ecddbaaf9ef
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9b41'
+down_revision: Union[str, None] = '5ecddbaaf9ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('feeds', sa.Column('etag', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('feeds', sa.Column('last_modified', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+    op.add_column('feeds', sa.Column('content_hash', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('feeds', 'content_hash')
+    op.drop_column('feeds', 'last_modified')
+    op.drop_column('feeds', 'etag')
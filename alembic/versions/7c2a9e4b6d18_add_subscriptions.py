@@ -0,0 +1,85 @@
+"""add subscriptions
+
+Revision ID: 7c2a9e4b6d18
+Revises: 0b9e7d3f1a64
+Create Date: 2026-10-18 15:36:52.904127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2a9e4b6d18'
+down_revision: Union[str, None] = '0b9e7d3f1a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('subscriptions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('feed_id', sa.Integer(), nullable=False),
+    sa.Column('read_until', sa.DateTime(), nullable=True),
+    sa.Column('read_post_ids', sa.JSON(), nullable=True),
+    sa.Column('unread_post_ids', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['feed_id'], ['feeds.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'feed_id')
+    )
+    op.create_index('ix_subscriptions_feed_id', 'subscriptions', ['feed_id'], unique=False)
+
+    # every followed feed becomes a subscription. read_until is the
+    # newest read post published before the first unread one, only posts
+    # read after it are kept as read exceptions, so switching modes keeps
+    # read state without listing every read post
+    op.execute(
+        """
+        INSERT INTO subscriptions
+            (user_id, feed_id, read_until, read_post_ids, unread_post_ids,
+             created_at, updated_at)
+        WITH first_unread AS (
+            SELECT user_id, feed_id, MIN(published_at) AS published_at
+            FROM user_feed_post_link
+            WHERE NOT is_read
+            GROUP BY user_id, feed_id
+        ),
+        watermarks AS (
+            SELECT l.user_id, l.feed_id,
+                   MAX(l.published_at) FILTER (
+                       WHERE l.is_read
+                       AND (u.published_at IS NULL
+                            OR l.published_at < u.published_at)
+                   ) AS read_until,
+                   MIN(l.created_at) AS created_at,
+                   MAX(l.updated_at) AS updated_at
+            FROM user_feed_post_link l
+            LEFT JOIN first_unread u
+                ON u.user_id = l.user_id AND u.feed_id = l.feed_id
+            GROUP BY l.user_id, l.feed_id
+        )
+        SELECT w.user_id, w.feed_id, w.read_until,
+               COALESCE(
+                   (
+                       SELECT json_agg(l.post_id ORDER BY l.post_id)
+                       FROM user_feed_post_link l
+                       WHERE l.user_id = w.user_id
+                       AND l.feed_id = w.feed_id
+                       AND l.is_read
+                       AND (w.read_until IS NULL
+                            OR l.published_at > w.read_until)
+                   ),
+                   '[]'::json
+               ),
+               '[]'::json, w.created_at, w.updated_at
+        FROM watermarks w
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('subscriptions')
@@ -0,0 +1,169 @@
+"""partition links by month
+
+Revision ID: 8a3e5f7c9d21
+Revises: 2d8f4c1b7e90
+Create Date: 2026-10-18 17:31:06.552914
+
+opt in, the revision only changes the schema when run with
+
+    alembic -x partitioned=true upgrade head
+
+otherwise it is recorded as applied without touching the table. to
+partition later, downgrade to 2d8f4c1b7e90 and upgrade again with the
+flag. user_feed_post_link is rebuilt as a table range partitioned by
+month on published_at, which has to become part of the primary key.
+the table is copied, so run it in a maintenance window
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a3e5f7c9d21'
+down_revision: Union[str, None] = '2d8f4c1b7e90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TABLE = 'user_feed_post_link'
+_MONTHS_AHEAD = 3
+
+
+def upgrade() -> None:
+    if context.get_x_argument(as_dictionary=True).get('partitioned') != 'true':
+        return
+
+    # links created before published_at was copied onto them
+    op.execute(
+        """
+        UPDATE user_feed_post_link l
+        SET published_at = p.published_at
+        FROM posts p
+        WHERE p.id = l.post_id AND l.published_at IS NULL
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TABLE user_feed_post_link_partitioned (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            feed_id INTEGER NOT NULL REFERENCES feeds (id),
+            post_id INTEGER NOT NULL REFERENCES posts (id),
+            is_read BOOLEAN,
+            read_at TIMESTAMP WITHOUT TIME ZONE,
+            published_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL
+        ) PARTITION BY RANGE (published_at)
+        """
+    )
+
+    # one partition per month from the oldest link up to _MONTHS_AHEAD
+    # months from now, rows outside of them go to the default partition
+    oldest = op.get_bind().execute(sa.text('SELECT min(published_at) FROM user_feed_post_link')).scalar()
+    month = _month_start(oldest or datetime.now())
+    last = _add_months(_month_start(datetime.now()), _MONTHS_AHEAD)
+    while month <= last:
+        op.execute(
+            "CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table}_partitioned "
+            "FOR VALUES FROM ('{month}') TO ('{next}')".format(
+                table=_TABLE, month=month, next=_add_months(month, 1)
+            )
+        )
+        month = _add_months(month, 1)
+
+    op.execute('CREATE TABLE {0}_default PARTITION OF {0}_partitioned DEFAULT'.format(_TABLE))
+
+    op.execute(
+        """
+        INSERT INTO user_feed_post_link_partitioned
+            (user_id, feed_id, post_id, is_read, read_at, published_at, created_at, updated_at)
+        SELECT user_id, feed_id, post_id, is_read, read_at, published_at, created_at, updated_at
+        FROM user_feed_post_link
+        """
+    )
+
+    op.drop_table(_TABLE)
+    op.rename_table('user_feed_post_link_partitioned', _TABLE)
+
+    # created on the parent, postgres creates them on every partition
+    op.create_primary_key('user_feed_post_link_pkey', _TABLE, ['user_id', 'feed_id', 'post_id', 'published_at'])
+    _create_indexes()
+
+
+def downgrade() -> None:
+    is_partitioned = op.get_bind().execute(
+        sa.text(
+            """
+            SELECT 1
+            FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = :table
+            """
+        ),
+        {'table': _TABLE},
+    ).first()
+    if is_partitioned is None:
+        return
+
+    op.create_table(
+        'user_feed_post_link_plain',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('feed_id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('is_read', sa.Boolean(), nullable=True),
+        sa.Column('read_at', sa.DateTime(), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['feed_id'], ['feeds.id']),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+    )
+
+    op.execute(
+        """
+        INSERT INTO user_feed_post_link_plain
+            (user_id, feed_id, post_id, is_read, read_at, published_at, created_at, updated_at)
+        SELECT user_id, feed_id, post_id, is_read, read_at, published_at, created_at, updated_at
+        FROM user_feed_post_link
+        """
+    )
+
+    # dropping the parent drops every partition with it
+    op.drop_table(_TABLE)
+    op.rename_table('user_feed_post_link_plain', _TABLE)
+
+    op.create_primary_key('user_feed_post_link_pkey', _TABLE, ['user_id', 'feed_id', 'post_id'])
+    _create_indexes()
+
+
+def _create_indexes() -> None:
+    op.create_index(
+        'ix_user_feed_post_link_timeline',
+        _TABLE,
+        ['user_id', 'published_at', 'post_id'],
+        postgresql_include=['feed_id', 'is_read', 'read_at'],
+    )
+    op.create_index(
+        'ix_user_feed_post_link_user_id_feed_id_is_read',
+        _TABLE,
+        ['user_id', 'feed_id', 'is_read'],
+    )
+    op.create_index(
+        'ix_user_feed_post_link_feed_id_post_id',
+        _TABLE,
+        ['feed_id', 'post_id'],
+    )
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
@@ -0,0 +1,79 @@
+"""add guid to posts
+
+Revision ID: a84e6c1f2d07
+Revises: 3f1c2a7d9b41
+Create Date: 2026-10-18 11:02:47.118392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a84e6c1f2d07'
+down_revision: Union[str, None] = '3f1c2a7d9b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# oldest post of every (feed_id, guid) group is the one that is kept
+_KEEP = """
+    SELECT feed_id, guid, MIN(id) AS id
+    FROM posts
+    GROUP BY feed_id, guid
+"""
+
+_DUPLICATES = """
+    SELECT p.id AS duplicate_id, k.id AS keep_id
+    FROM posts p
+    JOIN ({keep}) k ON p.feed_id = k.feed_id AND p.guid = k.guid
+    WHERE p.id <> k.id
+""".format(keep=_KEEP)
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('guid', sqlmodel.sql.sqltypes.AutoString(), nullable=True))
+
+    # existing posts never stored the entry guid, use their link instead
+    op.execute("UPDATE posts SET guid = url")
+
+    # earlier syncs inserted the same entry several times, move links of
+    # the duplicates onto the post that is kept before deleting them. a
+    # user linked to both keeps the read state of either
+    op.execute(
+        """
+        INSERT INTO user_feed_post_link
+            (user_id, feed_id, post_id, is_read, read_at, created_at, updated_at)
+        SELECT l.user_id, l.feed_id, d.keep_id, BOOL_OR(l.is_read),
+               MAX(l.read_at), MIN(l.created_at), MAX(l.updated_at)
+        FROM user_feed_post_link l
+        JOIN ({duplicates}) d ON l.post_id = d.duplicate_id
+        GROUP BY l.user_id, l.feed_id, d.keep_id
+        ON CONFLICT (user_id, feed_id, post_id) DO UPDATE SET
+            is_read = user_feed_post_link.is_read OR EXCLUDED.is_read,
+            read_at = GREATEST(user_feed_post_link.read_at, EXCLUDED.read_at),
+            updated_at = GREATEST(user_feed_post_link.updated_at, EXCLUDED.updated_at)
+        """.format(duplicates=_DUPLICATES)
+    )
+    op.execute(
+        """
+        DELETE FROM user_feed_post_link
+        WHERE post_id IN (SELECT duplicate_id FROM ({duplicates}) d)
+        """.format(duplicates=_DUPLICATES)
+    )
+    op.execute(
+        """
+        DELETE FROM posts
+        WHERE id IN (SELECT duplicate_id FROM ({duplicates}) d)
+        """.format(duplicates=_DUPLICATES)
+    )
+
+    op.alter_column('posts', 'guid', nullable=False)
+    op.create_unique_constraint('uq_posts_feed_id_guid', 'posts', ['feed_id', 'guid'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_posts_feed_id_guid', 'posts', type_='unique')
+    op.drop_column('posts', 'guid')
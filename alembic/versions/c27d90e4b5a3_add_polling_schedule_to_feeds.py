@@ -0,0 +1,28 @@
+"""add polling schedule to feeds
+
+Revision ID: c27d90e4b5a3
+Revises: a84e6c1f2d07
+Create Date: 2026-10-18 11:48:05.550921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27d90e4b5a3'
+down_revision: Union[str, None] = 'a84e6c1f2d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('feeds', sa.Column('poll_interval', sa.Integer(), nullable=True))
+    op.add_column('feeds', sa.Column('next_sync_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('feeds', 'next_sync_at')
+    op.drop_column('feeds', 'poll_interval')
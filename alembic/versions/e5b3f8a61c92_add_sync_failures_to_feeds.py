@@ -0,0 +1,26 @@
+"""add sync failures to feeds
+
+Revision ID: e5b3f8a61c92
+Revises: c27d90e4b5a3
+Create Date: 2026-10-18 13:20:14.873560
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b3f8a61c92'
+down_revision: Union[str, None] = 'c27d90e4b5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('feeds', sa.Column('sync_failures', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('feeds', 'sync_failures')
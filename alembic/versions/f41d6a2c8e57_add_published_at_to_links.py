@@ -0,0 +1,44 @@
+"""add published at to links
+
+Revision ID: f41d6a2c8e57
+Revises: e5b3f8a61c92
+Create Date: 2026-10-18 14:05:31.240718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f41d6a2c8e57'
+down_revision: Union[str, None] = 'e5b3f8a61c92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_feed_post_link', sa.Column('published_at', sa.DateTime(), nullable=True))
+
+    # links created so far only know their post, copy its published_at
+    op.execute(
+        """
+        UPDATE user_feed_post_link l
+        SET published_at = p.published_at
+        FROM posts p
+        WHERE p.id = l.post_id
+        """
+    )
+
+    op.create_index(
+        'ix_user_feed_post_link_timeline',
+        'user_feed_post_link',
+        ['user_id', 'published_at', 'post_id'],
+        postgresql_include=['feed_id', 'is_read', 'read_at'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_feed_post_link_timeline', table_name='user_feed_post_link')
+    op.drop_column('user_feed_post_link', 'published_at')
@@ -0,0 +1,131 @@
+"""prints the size and encode/decode times of cached post listings with
+every available cache codec and compression
+
+    python benchmarks/cache_codecs.py
+    python benchmarks/cache_codecs.py --posts 20 100 500 --runs 200
+
+listings are shaped like the post pages served by the feeds api, with
+datetimes as they come out of the database. msgpack and lz4 are skipped
+when their packages are not installed
+"""
+
+# builtin imports
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# internal imports
+from rss_reader.utils.cache_codec import (  # noqa: E402
+    CODECS,
+    COMPRESSIONS,
+    CacheCodec,
+)
+
+_COMPRESS_MIN_BYTES = 1024
+
+
+class _PlainJson:
+    """the format Cache used before codecs, datetimes come back as text"""
+
+    def encode(self, val: any) -> bytes:
+        return json.dumps(val, default=str).encode("utf-8")
+
+    def decode(self, data: bytes) -> any:
+        return json.loads(data)
+
+
+def main():
+    args = _parse_args()
+
+    for posts in args.posts:
+        listing = _post_listing(posts)
+        print("== {} posts ==".format(posts))
+        print(
+            "{:<20} {:>10} {:>12} {:>12}".format(
+                "codec", "bytes", "encode ms", "decode ms"
+            )
+        )
+
+        _report("json (before)", _PlainJson(), listing, args.runs)
+
+        for name, codec in _codecs():
+            _report(name, codec, listing, args.runs)
+
+        print()
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, nargs="+", default=[20, 100, 500])
+    parser.add_argument("--runs", type=int, default=200)
+
+    return parser.parse_args()
+
+
+def _codecs() -> list[tuple[str, CacheCodec]]:
+    codecs = []
+    for codec in CODECS:
+        for compression in COMPRESSIONS:
+            try:
+                c = CacheCodec(codec, compression, _COMPRESS_MIN_BYTES)
+            except ValueError as e:
+                print("skipping {}+{}: {}".format(codec, compression, e))
+                continue
+
+            codecs.append(("{}+{}".format(codec, compression), c))
+
+    return codecs
+
+
+def _post_listing(posts: int) -> dict:
+    # a page of posts joined with the reader's link rows, wrapped the way
+    # the response cache stores it
+    now = datetime.now()
+
+    return {
+        "value": {
+            "posts": [
+                {
+                    "id": i,
+                    "title": "post {} about something worth reading".format(i),
+                    "url": "https://example.com/2024/05/{}/a-long-post-slug".format(i),
+                    "guid": "https://example.com/?p={}".format(i),
+                    "uuid": str(uuid.uuid4()),
+                    "published_at": now - timedelta(hours=i),
+                    "feed_id": 42,
+                    "is_read": i % 3 == 0,
+                    "read_at": now - timedelta(minutes=i) if i % 3 == 0 else None,
+                }
+                for i in range(posts)
+            ],
+            "next_cursor": "WyIyMDI0LTA1LTAxVDEyOjAwOjAwIiwgMTIzXQ==",
+        },
+        "delta": 0.012,
+        "expires_at": time.time() + 300,
+    }
+
+
+def _report(name: str, codec: CacheCodec | _PlainJson, listing: dict, runs: int):
+    data = codec.encode(listing)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        codec.encode(listing)
+    encode = (time.perf_counter() - start) * 1000 / runs
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        codec.decode(data)
+    decode = (time.perf_counter() - start) * 1000 / runs
+
+    print("{:<20} {:>10} {:>12.3f} {:>12.3f}".format(name, len(data), encode, decode))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""prints query plans and timings of the hot queries with and without the
+indexes added in 0b9e7d3f1a64
+
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --database-url postgresql+psycopg2://...
+
+runs against an in-memory sqlite database by default. a postgres url must
+point at an empty scratch database, tables are created and dropped
+"""
+
+# builtin imports
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# external imports
+from sqlalchemy import Index, insert, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine, select
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# internal imports
+from rss_reader.database.models import (  # noqa: E402
+    Feeds as FeedModel,
+    Posts as PostModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+    Users as UserModel,
+)
+
+# indexes added by the migration, they are dropped for the "before" run
+_INDEX_NAMES = [
+    "ix_feeds_url",
+    "ix_users_email",
+    "ix_users_uuid",
+    "ix_posts_feed_id_published_at",
+    "ix_user_feed_post_link_user_id_feed_id_is_read",
+    "ix_user_feed_post_link_feed_id_post_id",
+]
+
+_RUNS = 50
+
+
+def main():
+    args = _parse_args()
+
+    engine = _create_engine(args.database_url)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+    try:
+        with engine.begin() as conn:
+            _seed(conn, args.users, args.feeds, args.posts, args.follows)
+
+        queries = _hot_queries(args.feeds)
+
+        with engine.begin() as conn:
+            for index in _indexes():
+                index.drop(conn)
+            _analyze(conn)
+
+        before = _run(engine, queries)
+
+        with engine.begin() as conn:
+            for index in _indexes():
+                index.create(conn)
+            _analyze(conn)
+
+        after = _run(engine, queries)
+
+    finally:
+        SQLModel.metadata.drop_all(engine)
+
+    for name in queries:
+        print("== {} ==".format(name))
+        for label, results in (("before", before), ("after", after)):
+            plan, elapsed = results[name]
+            print("-- {} ({:.3f} ms)".format(label, elapsed))
+            print(plan)
+        print()
+
+
+#### add helper functions here ####
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--feeds", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=50, help="posts per feed")
+    parser.add_argument("--follows", type=int, default=10, help="feeds per user")
+
+    return parser.parse_args()
+
+
+def _create_engine(url: str) -> Engine:
+    if url.startswith("sqlite"):
+        return create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+
+    return create_engine(url)
+
+
+def _indexes() -> list[Index]:
+    indexes = []
+    for table in SQLModel.metadata.tables.values():
+        indexes.extend(i for i in table.indexes if i.name in _INDEX_NAMES)
+
+    return indexes
+
+
+def _seed(conn: Connection, users: int, feeds: int, posts: int, follows: int):
+    now = datetime.now()
+
+    conn.execute(
+        insert(UserModel),
+        [
+            {
+                "uuid": str(uuid.uuid4()),
+                "email": "user{}@example.com".format(i),
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(users)
+        ],
+    )
+    conn.execute(
+        insert(FeedModel),
+        [
+            {
+                "uuid": str(uuid.uuid4()),
+                "url": "https://example.com/{}/feed.xml".format(i),
+                "is_active": True,
+                "has_sync_failed": False,
+                "sync_failures": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(feeds)
+        ],
+    )
+    conn.execute(
+        insert(PostModel),
+        [
+            {
+                "uuid": str(uuid.uuid4()),
+                "guid": "{}-{}".format(feed_id, i),
+                "url": "https://example.com/{}/{}".format(feed_id, i),
+                "title": "post {}".format(i),
+                "published_at": now - timedelta(hours=i),
+                "feed_id": feed_id,
+            }
+            for feed_id in range(1, feeds + 1)
+            for i in range(posts)
+        ],
+    )
+
+    # every user follows a window of feeds, linked to all of their posts
+    for user_id in range(1, users + 1):
+        feed_ids = [(user_id * 7 + i) % feeds + 1 for i in range(follows)]
+        rows = conn.execute(
+            select(PostModel.id, PostModel.feed_id, PostModel.published_at).where(
+                PostModel.feed_id.in_(feed_ids)
+            )
+        ).all()
+
+        conn.execute(
+            insert(UserFeedPostLink),
+            [
+                {
+                    "user_id": user_id,
+                    "feed_id": feed_id,
+                    "post_id": post_id,
+                    "published_at": published_at,
+                    "is_read": post_id % 3 == 0,
+                    "read_at": datetime.min,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for post_id, feed_id, published_at in rows
+            ],
+        )
+
+
+def _hot_queries(feeds: int) -> dict:
+    feed_id = feeds // 2
+
+    return {
+        # create_feed looks up every url it is given
+        "feed by url": select(FeedModel).where(
+            FeedModel.url == "https://example.com/{}/feed.xml".format(feed_id)
+        ),
+        "user by email": select(UserModel).where(
+            UserModel.email == "user42@example.com"
+        ),
+        "user by uuid": select(UserModel).where(
+            UserModel.uuid == "00000000-0000-0000-0000-000000000000"
+        ),
+        # first page of get_feed_and_posts_for_feed
+        "posts of feed": select(PostModel)
+        .where(PostModel.feed_id == feed_id)
+        .order_by(PostModel.published_at.desc(), PostModel.id.desc())
+        .limit(51),
+        # get_all_feed_posts_by_feed_and_user with is_read=false
+        "unread links of user feed": select(UserFeedPostLink)
+        .where(UserFeedPostLink.user_id == 42)
+        .where(UserFeedPostLink.feed_id == (42 * 7) % feeds + 1)
+        .where(UserFeedPostLink.is_read == False),
+        # retention deletes the links of a feed's expired posts
+        "links of feed posts": select(UserFeedPostLink)
+        .where(UserFeedPostLink.feed_id == feed_id)
+        .where(UserFeedPostLink.post_id.in_([1, 2, 3])),
+    }
+
+
+def _analyze(conn: Connection):
+    conn.execute(text("ANALYZE"))
+
+
+def _run(engine: Engine, queries: dict) -> dict:
+    explain = "EXPLAIN QUERY PLAN" if engine.dialect.name == "sqlite" else "EXPLAIN"
+
+    results = {}
+    with engine.connect() as conn:
+        for name, q in queries.items():
+            sql = str(
+                q.compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                )
+            )
+
+            plan_rows = conn.execute(text("{} {}".format(explain, sql))).all()
+            plan = "\n".join(str(row[-1]) for row in plan_rows)
+
+            start = time.perf_counter()
+            for _ in range(_RUNS):
+                conn.execute(q).all()
+            elapsed = (time.perf_counter() - start) * 1000 / _RUNS
+
+            results[name] = (plan, elapsed)
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 # external imports
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, status
 from fastapi import __version__ as fastapi_version
 
 # builtin imports
 import git 
 import os 
 
+# internal imports
+from ...utils.response_cache import ResponseCache, get_response_cache
+
 # data model to represent the application level metadata such as
 # app_name, app_version, framework_version, etc.
 class AppMetadata:
@@ -55,3 +58,13 @@ def version():
 
     return version_data
 
+
+@root_router.get(
+    path="/cache/stats",
+    name="cache stats",
+    summary="describes response cache usage",
+    description="returns hits, misses and evictions of this process by cache tier",
+    status_code=status.HTTP_200_OK
+)
+def cache_stats(cache: ResponseCache = Depends(get_response_cache)):
+    return cache.stats()
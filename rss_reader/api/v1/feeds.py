@@ -1,12 +1,14 @@
 from ast import Tuple
+from collections import Counter
 from datetime import datetime
-from typing import Sequence
+from typing import Annotated, Sequence
 import uuid
 
 # external imports
+from annotated_types import Ge, Le
 from fastapi import APIRouter, HTTPException, status, Depends
 from pydantic import BaseModel, HttpUrl
-from sqlmodel import Session, select
+from sqlmodel import Session, delete, not_, select, update
 from rq import Queue
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
@@ -14,14 +16,36 @@ from rss_reader.utils.cache import get_cache, Cache
 from rss_reader.utils.database import get_db_connection
 from rss_reader.database.models import (
     User_Feed_Post_Link as UserFeedPostLink,
-    Users as UserModel,
     Feeds as FeedModel,
     Posts as PostModel,
+    Subscriptions as SubscriptionModel,
 )
+from rss_reader.api.v1.lookups import check_if_user_exists
 from rss_reader.utils.message_queue import get_queue_conn
+from rss_reader.utils.pagination import MAX_PAGE_SIZE, Cursor, page, paginate
+from rss_reader.utils.response_cache import (
+    ResponseCache,
+    feed_posts_scope,
+    feed_scope,
+    get_response_cache,
+    user_feed_scope,
+)
+from rss_reader.utils.read_state import (
+    READ_STATE_SUBSCRIPTIONS,
+    count_unread_subscriptions,
+    get_exception_published_at,
+    get_read_state_mode,
+    is_read as is_post_read,
+    mark_post,
+    mark_read_until,
+    unread_clause,
+)
+from rss_reader.utils.unread_counters import UnreadCounters, get_unread_counters
 
 feeds_router = APIRouter(prefix="/v1/feeds", tags=["rss-feeds"])
 
+_DEFAULT_PAGE_SIZE = 50
+
 
 class CreateFeed(BaseModel):
     user_id: int
@@ -39,6 +63,12 @@ class DeleteFeed(BaseModel):
         from_attributes = True
 
 
+class MarkFeedsRead(BaseModel):
+    user_id: int
+    feed_ids: list[int]
+    before: datetime | None = None
+
+
 class MarkPost(BaseModel):
     user_id: int
     feed_id: int
@@ -59,12 +89,13 @@ def create_feed(
     feed_payload: CreateFeed,
     conn: Session = Depends(get_db_connection),
     mq: Queue = Depends(get_queue_conn),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """creates multiple feeds for the user"""
     now = datetime.now()
 
     # check if user exists
-    _check_if_user_exists(conn, feed_payload.user_id)
+    check_if_user_exists(conn, cache, feed_payload.user_id)
 
     # check if feed exists
     feeds: list[FeedModel] = []
@@ -98,6 +129,9 @@ def create_feed(
                 conn.commit()
                 conn.refresh(feed)
 
+                # a lookup of the new id may have been cached as missing
+                cache.invalidate(feed_scope(feed.id))
+
             finally:
                 conn.close()
 
@@ -133,38 +167,81 @@ def create_feed(
 def delete_feed_link(
     feed_payload: DeleteFeed,
     conn: Session = Depends(get_db_connection),
+    counters: UnreadCounters = Depends(get_unread_counters),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """unfollow multiple feeds for the user"""
-    _check_if_user_exists(conn, feed_payload.user_id)
+    check_if_user_exists(conn, cache, feed_payload.user_id)
 
     for feed_id in feed_payload.feed_ids:
-        _check_if_feeds_exists(conn=conn, feed_id=feed_id)
+        _check_if_feeds_exists(conn=conn, cache=cache, feed_id=feed_id)
 
-        q = (
-            select(UserFeedPostLink)
-            .where(UserFeedPostLink.user_id == feed_payload.user_id)
-            .where(UserFeedPostLink.feed_id == feed_id)
+    # the subscription and the links of every feed go with one statement
+    # each, subscriptions are kept in every read state mode
+    qs = [
+        delete(model)
+        .where(model.user_id == feed_payload.user_id)
+        .where(model.feed_id.in_(feed_payload.feed_ids))
+        for model in (SubscriptionModel, UserFeedPostLink)
+    ]
+
+    try:
+        for q in qs:
+            conn.exec(q)
+
+    except Exception as exc:
+        conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="failed to unfollow feeds {feed_ids} for user {user_id} with {exc}".format(
+                feed_ids=feed_payload.feed_ids,
+                user_id=feed_payload.user_id,
+                exc=exc,
+            ),
         )
 
-        links: list[UserFeedPostLink] = []
-        try:
-            links = conn.exec(q).all()
-        except Exception:
-            conn.rollback()
+    else:
+        conn.commit()
+        counters.remove(user_id=feed_payload.user_id, feed_ids=feed_payload.feed_ids)
+        cache.invalidate(
+            *[
+                user_feed_scope(feed_payload.user_id, feed_id)
+                for feed_id in feed_payload.feed_ids
+            ]
+        )
 
-        # delete the links
-        for link in links:
-            try:
-                conn.delete(link)
+    finally:
+        conn.close()
 
-            except:
-                conn.rollback()
 
-            else:
-                conn.commit()
+@feeds_router.post(
+    path="/mark-read",
+    description="marks all posts of multiple feeds for the given user as read",
+    status_code=status.HTTP_200_OK,
+)
+def mark_posts_as_read_for_user_feeds(
+    payload: MarkFeedsRead,
+    conn: Session = Depends(get_db_connection),
+    counters: UnreadCounters = Depends(get_unread_counters),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    check_if_user_exists(conn, cache, payload.user_id)
 
-            finally:
-                conn.close()
+    for feed_id in payload.feed_ids:
+        _check_if_feeds_exists(conn=conn, cache=cache, feed_id=feed_id)
+
+    updated = _mark_feeds_as_read(
+        conn=conn,
+        counters=counters,
+        user_id=payload.user_id,
+        feed_ids=payload.feed_ids,
+        before=payload.before,
+    )
+    cache.invalidate(
+        *[user_feed_scope(payload.user_id, feed_id) for feed_id in payload.feed_ids]
+    )
+
+    return {"updated": updated}
 
 
 @feeds_router.post(
@@ -176,7 +253,20 @@ def mark_post_as_read_or_unread(
     post_id: int,
     payload: MarkPost,
     conn: Session = Depends(get_db_connection),
+    counters: UnreadCounters = Depends(get_unread_counters),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
+    if get_read_state_mode() == READ_STATE_SUBSCRIPTIONS:
+        link = _flip_subscription_post(conn=conn, post_id=post_id, payload=payload)
+        counters.incr(
+            user_id=payload.user_id,
+            feed_id=payload.feed_id,
+            amount=-1 if link.is_read else 1,
+        )
+        cache.invalidate(user_feed_scope(payload.user_id, payload.feed_id))
+
+        return {"link": link}
+
     q = (
         select(UserFeedPostLink)
         .where(UserFeedPostLink.post_id == post_id)
@@ -219,6 +309,12 @@ def mark_post_as_read_or_unread(
     else:
         conn.commit()
         conn.refresh(link)
+        counters.incr(
+            user_id=payload.user_id,
+            feed_id=payload.feed_id,
+            amount=-1 if link.is_read else 1,
+        )
+        cache.invalidate(user_feed_scope(payload.user_id, payload.feed_id))
 
     finally:
         conn.close()
@@ -234,52 +330,21 @@ def mark_post_as_read_or_unread(
 def mark_all_posts_as_read_for_user_feed(
     feed_id: int,
     user_id: int,
+    before: datetime | None = None,
     conn: Session = Depends(get_db_connection),
+    counters: UnreadCounters = Depends(get_unread_counters),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
-    _check_if_feeds_exists(conn=conn, feed_id=feed_id)
-
-    q = (
-        select(UserFeedPostLink)
-        .where(UserFeedPostLink.user_id == user_id)
-        .where(UserFeedPostLink.feed_id == feed_id)
+    _check_if_feeds_exists(conn=conn, cache=cache, feed_id=feed_id)
+
+    _mark_feeds_as_read(
+        conn=conn,
+        counters=counters,
+        user_id=user_id,
+        feed_ids=[feed_id],
+        before=before,
     )
-
-    try:
-        links = conn.exec(q).all()
-
-    except Exception:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="failed to retrieve posts related to feed {feed_id} for the user {user_id}".format(
-                feed_id=feed_id, user_id=user_id
-            ),
-        )
-
-    finally:
-        conn.close()
-
-    for link in links:
-        link.is_read = True
-        link.read_at = datetime.now()
-
-        try:
-            conn.add(link)
-
-        except Exception as exc:
-            conn.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="failed to mark all posts as read related to feed {feed_id} for user {user_id} with {exc}".format(
-                    feed_id=feed_id,
-                    user_id=user_id,
-                    exc=exc,
-                ),
-            )
-
-        else:
-            conn.commit()
-
-    conn.close()
+    cache.invalidate(user_feed_scope(user_id, feed_id))
 
 
 @feeds_router.get(
@@ -289,28 +354,23 @@ def mark_all_posts_as_read_for_user_feed(
 )
 def get_feed_and_posts_for_feed(
     feed_id: int,
+    cursor: str | None = None,
+    limit: Annotated[int, Ge(1), Le(MAX_PAGE_SIZE)] = _DEFAULT_PAGE_SIZE,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
-    f = _check_if_feeds_exists(conn=conn, feed_id=feed_id)
-    q = (
-        select(PostModel, UserFeedPostLink)
-        .join(PostModel)
-        .where(UserFeedPostLink.feed_id == f.id)
+    f = _check_if_feeds_exists(conn=conn, cache=cache, feed_id=feed_id)
+    after = _decode_cursor(cursor)
+
+    posts_page = cache.get_or_load(
+        key="feed-posts:{}:{}:{}".format(feed_id, cursor, limit),
+        scopes=[feed_posts_scope(feed_id)],
+        loader=lambda: _get_feed_posts(
+            conn=conn, feed_id=feed_id, cursor=after, limit=limit
+        ),
     )
 
-    try:
-        post_n_links = conn.exec(q).all()
-    except Exception as exc:
-        raise HTTPException(
-            detail=exc,
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
-
-    posts: list[PostModel] = []
-    for post_n_link in post_n_links:
-        posts.append(post_n_link[0])
-
-    return {"feed": f, "posts": posts}
+    return {"feed": f, **posts_page}
 
 
 @feeds_router.get(
@@ -322,10 +382,120 @@ def get_all_feed_posts_by_feed_and_user(
     feed_id: int,
     user_id: int,
     is_read: bool = None,
+    cursor: str | None = None,
+    limit: Annotated[int, Ge(1), Le(MAX_PAGE_SIZE)] = _DEFAULT_PAGE_SIZE,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
 
-    _check_if_feeds_exists(conn=conn, feed_id=feed_id)
+    _check_if_feeds_exists(conn=conn, cache=cache, feed_id=feed_id)
+    after = _decode_cursor(cursor)
+
+    return cache.get_or_load(
+        key="user-feed-posts:{}:{}:{}:{}:{}".format(
+            user_id, feed_id, is_read, cursor, limit
+        ),
+        scopes=[feed_posts_scope(feed_id), user_feed_scope(user_id, feed_id)],
+        loader=lambda: _get_feed_posts_for_user(
+            conn=conn,
+            feed_id=feed_id,
+            user_id=user_id,
+            is_read=is_read,
+            cursor=after,
+            limit=limit,
+        ),
+    )
+
+
+@feeds_router.post(
+    path="/{feed_id}/force-refresh",
+    description="forces a feed refresh",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def force_refresh_feed(
+    feed_id: int,
+    conn: Session = Depends(get_db_connection),
+    mq: Queue = Depends(get_queue_conn),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    f = _check_if_feeds_exists(conn=conn, cache=cache, feed_id=feed_id)
+
+    mq.enqueue(
+        "rss_reader.utils.feed_parser.requeue_jobs_for_user_feed",
+        f["id"],
+    )
+
+
+#### add helper functions here
+def _check_if_feeds_exists(conn: Session, cache: ResponseCache, feed_id: int) -> dict:
+    f = cache.get_or_load(
+        key="feed:{}".format(feed_id),
+        scopes=[feed_scope(feed_id)],
+        loader=lambda: conn.exec(
+            select(FeedModel).where(FeedModel.id == feed_id)
+        ).one_or_none(),
+    )
+
+    if f is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="feed with {id} not found".format(id=feed_id),
+        )
+
+    return f
+
+
+def _get_feed_posts(
+    conn: Session,
+    feed_id: int,
+    cursor: Cursor | None,
+    limit: int,
+) -> dict:
+    # posts are read from the posts table, every post once regardless of
+    # how many users follow the feed
+    q = paginate(
+        query=select(PostModel).where(PostModel.feed_id == feed_id),
+        published_at=PostModel.published_at,
+        id=PostModel.id,
+        cursor=cursor,
+        limit=limit,
+    )
+
+    try:
+        posts = conn.exec(q).all()
+    except Exception as exc:
+        raise HTTPException(
+            detail=str(exc),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    finally:
+        conn.close()
+
+    posts, next_cursor = page(
+        rows=posts, limit=limit, key=lambda post: (post.published_at, post.id)
+    )
+
+    return {"posts": posts, "next_cursor": next_cursor}
+
+
+def _get_feed_posts_for_user(
+    conn: Session,
+    feed_id: int,
+    user_id: int,
+    is_read: bool | None,
+    cursor: Cursor | None,
+    limit: int,
+) -> dict:
+    if get_read_state_mode() == READ_STATE_SUBSCRIPTIONS:
+        return _get_feed_posts_for_subscription(
+            conn=conn,
+            feed_id=feed_id,
+            user_id=user_id,
+            is_read=is_read,
+            cursor=cursor,
+            limit=limit,
+        )
 
     q = (
         select(PostModel, UserFeedPostLink)
@@ -338,15 +508,31 @@ def get_all_feed_posts_by_feed_and_user(
     if is_read is not None:
         q = q.where(UserFeedPostLink.is_read == is_read)
 
+    # newest posts first, ordered and paged by the database
+    q = paginate(
+        query=q,
+        published_at=UserFeedPostLink.published_at,
+        id=UserFeedPostLink.post_id,
+        cursor=cursor,
+        limit=limit,
+    )
+
     try:
         posts_n_links = conn.exec(q).all()
 
     except Exception as exc:
-        raise HTTPException(detail=exc)
+        raise HTTPException(
+            detail=str(exc),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    finally:
+        conn.close()
 
-    # using item [1] as that is second element of the data returned
-    posts_n_links = sorted(
-        posts_n_links, key=lambda item: item[1].read_at, reverse=True
+    posts_n_links, next_cursor = page(
+        rows=posts_n_links,
+        limit=limit,
+        key=lambda item: (item[1].published_at, item[1].post_id),
     )
 
     resp: list[UserFeedPostResponse] = []
@@ -360,52 +546,257 @@ def get_all_feed_posts_by_feed_and_user(
             )
         )
 
-    return {"posts": resp}
+    return {"posts": resp, "next_cursor": next_cursor}
 
 
-@feeds_router.post(
-    path="/{feed_id}/force-refresh",
-    description="forces a feed refresh",
-    status_code=status.HTTP_202_ACCEPTED,
-)
-def force_refresh_feed(
-    feed_id: int,
-    conn: Session = Depends(get_db_connection),
-    mq: Queue = Depends(get_queue_conn),
-):
-    f = _check_if_feeds_exists(conn=conn, feed_id=feed_id)
+def _mark_feeds_as_read(
+    conn: Session,
+    counters: UnreadCounters,
+    user_id: int,
+    feed_ids: list[int],
+    before: datetime | None,
+) -> int:
+    now = datetime.now()
 
-    mq.enqueue(
-        "rss_reader.utils.feed_parser.requeue_jobs_for_user_feed",
-        f.id,
+    if get_read_state_mode() == READ_STATE_SUBSCRIPTIONS:
+        return _mark_subscriptions_as_read(
+            conn=conn,
+            counters=counters,
+            user_id=user_id,
+            feed_ids=feed_ids,
+            until=before or now,
+        )
+
+    # one UPDATE for all the feeds, posts published after before are
+    # left unread
+    q = (
+        update(UserFeedPostLink)
+        .where(UserFeedPostLink.user_id == user_id)
+        .where(UserFeedPostLink.feed_id.in_(feed_ids))
+        .where(UserFeedPostLink.is_read == False)
+        .values(is_read=True, read_at=now, updated_at=now)
     )
 
+    if before is not None:
+        q = q.where(UserFeedPostLink.published_at <= before)
+
+    # the feed of every updated link is returned to move the counters
+    q = q.returning(UserFeedPostLink.feed_id)
 
-#### add helper functions here
-def _check_if_user_exists(conn: Session, user_id: int) -> UserModel:
-    q = select(UserModel).where(UserModel.id == user_id)
     try:
-        u = conn.exec(q).one()
+        read = Counter((user_id, feed_id) for feed_id in conn.exec(q).scalars().all())
 
-    except NoResultFound:
+    except Exception as exc:
+        conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="failed to mark all posts as read related to feeds {feed_ids} for user {user_id} with {exc}".format(
+                feed_ids=feed_ids,
+                user_id=user_id,
+                exc=exc,
+            ),
+        )
+
+    else:
+        conn.commit()
+        counters.incr_many(Counter({k: -v for k, v in read.items()}))
+
+    finally:
+        conn.close()
+
+    return read.total()
+
+
+def _get_subscription(
+    conn: Session,
+    user_id: int,
+    feed_id: int,
+) -> SubscriptionModel | None:
+    q = (
+        select(SubscriptionModel)
+        .where(SubscriptionModel.user_id == user_id)
+        .where(SubscriptionModel.feed_id == feed_id)
+    )
+
+    return conn.exec(q).one_or_none()
+
+
+def _flip_subscription_post(
+    conn: Session,
+    post_id: int,
+    payload: MarkPost,
+) -> UserFeedPostLink:
+    sub = _get_subscription(conn=conn, user_id=payload.user_id, feed_id=payload.feed_id)
+    post = conn.exec(
+        select(PostModel)
+        .where(PostModel.id == post_id)
+        .where(PostModel.feed_id == payload.feed_id)
+    ).one_or_none()
+
+    if sub is None or post is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="user with {id} not found".format(id=id),
+            detail="post with {post_id} in feed {feed_id} for user {user_id} not found".format(
+                post_id=post_id,
+                feed_id=payload.feed_id,
+                user_id=payload.user_id,
+            ),
+        )
+
+    # flip, keeping the post's fields as the session expires it on commit
+    post_id, published_at = post.id, post.published_at
+    read = not is_post_read(sub, post_id, published_at)
+    mark_post(sub, post_id, published_at, read)
+
+    try:
+        conn.add(sub)
+
+    except Exception:
+        conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="failed to update read status for the post {id}".format(id=post_id),
         )
 
     else:
-        return u
+        conn.commit()
+        conn.refresh(sub)
+
+    finally:
+        conn.close()
 
+    # answer in the shape of a link, read times are not kept per post
+    return UserFeedPostLink(
+        user_id=sub.user_id,
+        feed_id=sub.feed_id,
+        post_id=post_id,
+        published_at=published_at,
+        is_read=read,
+        read_at=sub.updated_at if read else None,
+        created_at=sub.created_at,
+        updated_at=sub.updated_at,
+    )
+
+
+def _get_feed_posts_for_subscription(
+    conn: Session,
+    feed_id: int,
+    user_id: int,
+    is_read: bool | None,
+    cursor: Cursor | None,
+    limit: int,
+) -> dict:
+    sub = _get_subscription(conn=conn, user_id=user_id, feed_id=feed_id)
+    if sub is None:
+        conn.close()
+        return {"posts": [], "next_cursor": None}
+
+    q = select(PostModel).where(PostModel.feed_id == feed_id)
+
+    # only list read / unread posts
+    if is_read is not None:
+        unread = unread_clause(sub)
+        q = q.where(not_(unread) if is_read else unread)
+
+    q = paginate(
+        query=q,
+        published_at=PostModel.published_at,
+        id=PostModel.id,
+        cursor=cursor,
+        limit=limit,
+    )
 
-def _check_if_feeds_exists(conn: Session, feed_id: int) -> FeedModel:
-    q = select(FeedModel).where(FeedModel.id == feed_id)
     try:
-        f = conn.exec(q).one()
-    except NoResultFound:
+        posts = conn.exec(q).all()
+
+    except Exception as exc:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="feed with {id} not found".format(id=feed_id),
+            detail=str(exc),
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+    finally:
+        conn.close()
+
+    posts, next_cursor = page(
+        rows=posts, limit=limit, key=lambda post: (post.published_at, post.id)
+    )
+
+    # read times are not kept per post in this mode
+    resp = [
+        UserFeedPostResponse(
+            post=post,
+            is_read=is_post_read(sub, post.id, post.published_at),
+            read_at=datetime.min,
+        )
+        for post in posts
+    ]
+
+    return {"posts": resp, "next_cursor": next_cursor}
+
+
+def _mark_subscriptions_as_read(
+    conn: Session,
+    counters: UnreadCounters,
+    user_id: int,
+    feed_ids: list[int],
+    until: datetime,
+) -> int:
+    q = (
+        select(SubscriptionModel)
+        .where(SubscriptionModel.user_id == user_id)
+        .where(SubscriptionModel.feed_id.in_(feed_ids))
+    )
+
+    try:
+        subs = conn.exec(q).all()
+        published_at = get_exception_published_at(conn=conn, subs=subs)
+
+        # moving the watermark is a single row write per feed, the posts
+        # that became read are counted for the response and the counters
+        unread_before = count_unread_subscriptions(conn=conn, subs=subs)
+        for sub in subs:
+            mark_read_until(sub, until, published_at)
+            conn.add(sub)
+
+        unread_after = count_unread_subscriptions(conn=conn, subs=subs)
+
+    except Exception as exc:
+        conn.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="failed to mark all posts as read related to feeds {feed_ids} for user {user_id} with {exc}".format(
+                feed_ids=feed_ids,
+                user_id=user_id,
+                exc=exc,
+            ),
         )
 
     else:
-        return f
+        conn.commit()
+
+    finally:
+        conn.close()
+
+    read = Counter(
+        {
+            (user_id, feed_id): unread - unread_after[feed_id]
+            for feed_id, unread in unread_before.items()
+        }
+    )
+    counters.incr_many(Counter({k: -v for k, v in read.items()}))
+
+    return read.total()
+
+
+def _decode_cursor(cursor: str | None) -> Cursor | None:
+    if cursor is None:
+        return None
+
+    try:
+        return Cursor.decode(cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid cursor {cursor}".format(cursor=cursor),
+        )
@@ -0,0 +1,28 @@
+# external imports
+from fastapi import HTTPException, status
+from sqlmodel import Session, select
+
+# internal imports
+from ...database.models import Users as UserModel
+from ...utils.response_cache import ResponseCache, user_scope
+
+
+def check_if_user_exists(conn: Session, cache: ResponseCache, user_id: int) -> dict:
+    """user with user_id, read through the response cache. raises a 404
+    when the user does not exist
+    """
+    u = cache.get_or_load(
+        key="user:{}".format(user_id),
+        scopes=[user_scope(user_id)],
+        loader=lambda: conn.exec(
+            select(UserModel).where(UserModel.id == user_id)
+        ).one_or_none(),
+    )
+
+    if u is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="user with {id} not found".format(id=user_id),
+        )
+
+    return u
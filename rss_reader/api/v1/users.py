@@ -4,15 +4,36 @@ import uuid
 from datetime import datetime
 
 # external imports
-from annotated_types import Ge, Lt
+from annotated_types import Ge, Le, Lt
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
-from sqlmodel import select, Session
+from sqlmodel import not_, or_, select, Session
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 # internal imports
-from ...database.models import Users as UserModel
+from .lookups import check_if_user_exists
+from ...database.models import (
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+    Users as UserModel,
+)
 from ...utils.database import get_db_connection
+from ...utils.pagination import MAX_PAGE_SIZE, Cursor, page, paginate
+from ...utils.read_state import (
+    READ_STATE_SUBSCRIPTIONS,
+    count_unread,
+    get_read_state_mode,
+    is_read as is_post_read,
+    unread_clause,
+)
+from ...utils.response_cache import (
+    USERS_SCOPE,
+    ResponseCache,
+    get_response_cache,
+    user_scope,
+)
+from ...utils.unread_counters import UnreadCounters, get_unread_counters
 
 # defines user router
 users_router = APIRouter(prefix="/v1/users", tags=["users"])
@@ -20,6 +41,13 @@ users_router = APIRouter(prefix="/v1/users", tags=["users"])
 _MAX_QUERY_LIMIT = 50
 
 
+class TimelinePost(BaseModel):
+    post: PostModel
+    feed_id: int
+    is_read: bool
+    read_at: datetime | None
+
+
 class CreateUser(BaseModel):
     email: EmailStr
 
@@ -35,6 +63,7 @@ class CreateUser(BaseModel):
 def create_user(
     user: CreateUser,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     now = datetime.now()
 
@@ -69,6 +98,9 @@ def create_user(
         conn.commit()
         conn.refresh(user)
 
+        # lookups of the new user may have been cached as missing
+        cache.invalidate(USERS_SCOPE, user_scope(user.id))
+
     finally:
         conn.close()
 
@@ -84,6 +116,7 @@ def get_user_by_id(
     uuid: uuid.UUID | None = None,
     email: EmailStr | None = None,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     query = select(UserModel)
     if uuid is not None:
@@ -92,11 +125,10 @@ def get_user_by_id(
         query = query.where(UserModel.email == email)
 
     try:
-        user = conn.exec(query).one()
-    except NoResultFound:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="user with {uuid} not found".format(uuid=uuid),
+        user = cache.get_or_load(
+            key="user-by:{}:{}".format(uuid, email),
+            scopes=[USERS_SCOPE],
+            loader=lambda: conn.exec(query).one_or_none(),
         )
     except MultipleResultsFound:
         raise HTTPException(
@@ -108,6 +140,12 @@ def get_user_by_id(
     finally:
         conn.close()
 
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="user with {uuid} not found".format(uuid=uuid),
+        )
+
     return user
 
 
@@ -119,6 +157,7 @@ def get_user_by_id(
 def activate_user(
     uuid: str,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     query = select(UserModel).where(UserModel.uuid == str(uuid))
     try:
@@ -146,6 +185,7 @@ def activate_user(
     else:
         conn.commit()
         conn.refresh(user)
+        cache.invalidate(USERS_SCOPE, user_scope(user.id))
     finally:
         conn.close()
 
@@ -160,6 +200,7 @@ def activate_user(
 def deactivate_user(
     uuid: str,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     query = select(UserModel).where(UserModel.uuid == str(uuid))
     try:
@@ -187,6 +228,7 @@ def deactivate_user(
     else:
         conn.commit()
         conn.refresh(user)
+        cache.invalidate(USERS_SCOPE, user_scope(user.id))
     finally:
         conn.close()
 
@@ -201,10 +243,12 @@ def deactivate_user(
 def delete_user(
     uuid: str,
     conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     query = select(UserModel).where(UserModel.uuid == str(uuid))
     try:
         user = conn.exec(query).one()
+        user_id = user.id
 
         # delete user
         conn.delete(user)
@@ -221,6 +265,7 @@ def delete_user(
         )
     else:
         conn.commit()
+        cache.invalidate(USERS_SCOPE, user_scope(user_id))
     finally:
         conn.close()
 
@@ -260,3 +305,187 @@ def get_all_active_users(
         conn.close()
 
     return {"users": users}
+
+
+@users_router.get(
+    path="/{user_id}/timeline",
+    description="lists posts from all feeds followed by the user, newest first",
+    status_code=status.HTTP_200_OK,
+)
+def get_user_timeline(
+    user_id: int,
+    cursor: str | None = None,
+    is_read: bool | None = None,
+    limit: Annotated[int, Ge(1), Le(MAX_PAGE_SIZE)] = _MAX_QUERY_LIMIT,
+    conn: Session = Depends(get_db_connection),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    check_if_user_exists(conn=conn, cache=cache, user_id=user_id)
+
+    try:
+        after = Cursor.decode(cursor) if cursor is not None else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid cursor {cursor}".format(cursor=cursor),
+        )
+
+    if get_read_state_mode() == READ_STATE_SUBSCRIPTIONS:
+        return _get_subscriptions_timeline(
+            conn=conn, user_id=user_id, is_read=is_read, cursor=after, limit=limit
+        )
+
+    # the page is picked from the link table alone, posts are joined in
+    # for the rows of the page only
+    q = select(UserFeedPostLink).where(UserFeedPostLink.user_id == user_id)
+
+    # only list read / unread posts
+    if is_read is not None:
+        q = q.where(UserFeedPostLink.is_read == is_read)
+
+    links_page = paginate(
+        query=q,
+        published_at=UserFeedPostLink.published_at,
+        id=UserFeedPostLink.post_id,
+        cursor=after,
+        limit=limit,
+    ).subquery()
+
+    q = (
+        select(
+            PostModel, links_page.c.feed_id, links_page.c.is_read, links_page.c.read_at
+        )
+        .join(links_page, links_page.c.post_id == PostModel.id)
+        .order_by(links_page.c.published_at.desc(), links_page.c.post_id.desc())
+    )
+
+    try:
+        rows = conn.exec(q).all()
+
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="failed to get timeline for user {user_id} {exc}".format(
+                user_id=user_id, exc=str(exc)
+            ),
+        )
+
+    finally:
+        conn.close()
+
+    rows, next_cursor = page(
+        rows=rows, limit=limit, key=lambda row: (row[0].published_at, row[0].id)
+    )
+
+    posts = [
+        TimelinePost(post=post, feed_id=feed_id, is_read=read, read_at=read_at)
+        for post, feed_id, read, read_at in rows
+    ]
+
+    return {"posts": posts, "next_cursor": next_cursor}
+
+
+@users_router.get(
+    path="/{user_id}/unread-counts",
+    description="unread post counts for every feed followed by the user",
+    status_code=status.HTTP_200_OK,
+)
+def get_user_unread_counts(
+    user_id: int,
+    conn: Session = Depends(get_db_connection),
+    counters: UnreadCounters = Depends(get_unread_counters),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    check_if_user_exists(conn=conn, cache=cache, user_id=user_id)
+
+    counts = counters.get(user_id)
+
+    # counters of this user were never filled (or were evicted), count
+    # once from the links and keep the result
+    if counts is None:
+        try:
+            counts = count_unread(conn=conn, user_ids=[user_id])[user_id]
+        except Exception as exc:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="failed to count unread posts for user {user_id} {exc}".format(
+                    user_id=user_id, exc=str(exc)
+                ),
+            )
+        finally:
+            conn.close()
+
+        counters.replace({user_id: counts})
+
+    return {"counts": counts, "total": sum(counts.values())}
+
+
+#### add helper functions here ####
+
+
+def _get_subscriptions_timeline(
+    conn: Session,
+    user_id: int,
+    is_read: bool | None,
+    cursor: Cursor | None,
+    limit: int,
+) -> dict:
+    q = select(SubscriptionModel).where(SubscriptionModel.user_id == user_id)
+
+    try:
+        subs = {sub.feed_id: sub for sub in conn.exec(q).all()}
+    except Exception:
+        conn.close()
+        raise
+
+    if len(subs) == 0:
+        conn.close()
+        return {"posts": [], "next_cursor": None}
+
+    # posts of the followed feeds are read directly, read state is applied
+    # from the subscription of each feed
+    q = select(PostModel).where(PostModel.feed_id.in_(list(subs.keys())))
+
+    # only list read / unread posts
+    if is_read is not None:
+        unread = or_(*[unread_clause(sub) for sub in subs.values()])
+        q = q.where(not_(unread) if is_read else unread)
+
+    q = paginate(
+        query=q,
+        published_at=PostModel.published_at,
+        id=PostModel.id,
+        cursor=cursor,
+        limit=limit,
+    )
+
+    try:
+        posts = conn.exec(q).all()
+
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="failed to get timeline for user {user_id} {exc}".format(
+                user_id=user_id, exc=str(exc)
+            ),
+        )
+
+    finally:
+        conn.close()
+
+    posts, next_cursor = page(
+        rows=posts, limit=limit, key=lambda post: (post.published_at, post.id)
+    )
+
+    # read times are not kept per post in this mode
+    resp = [
+        TimelinePost(
+            post=post,
+            feed_id=post.feed_id,
+            is_read=is_post_read(subs[post.feed_id], post.id, post.published_at),
+            read_at=None,
+        )
+        for post in posts
+    ]
+
+    return {"posts": resp, "next_cursor": next_cursor}
@@ -36,12 +36,18 @@ class CacheConfig(metaclass=Singleton):
     port: int
     dbno: int
     pswd: str
+    codec: str
+    compression: str
+    compress_min_bytes: int
 
     def __init__(self, config: any, mode: str) -> None:
         self.host = config["host"] or "localhost"
         self.port = config["port"] or 6379
         self.dbno = config["dbno"]
         self.pswd = config["pswd"]
+        self.codec = config["codec"]
+        self.compression = config["compression"]
+        self.compress_min_bytes = config["compress_min_bytes"]
 
         # to ensure we don't leak the secrets in the public
         # these secrets will be set in fly.io dashboard
@@ -56,10 +62,130 @@ class CacheConfig(metaclass=Singleton):
             self.port = int(os.getenv("REDIS_PORT"))
 
 
+class FetchConfig(metaclass=Singleton):
+    timeout: float
+    concurrency: int
+    max_connections: int
+    max_keepalive: int
+    per_host_concurrency: int
+    per_host_rate: float
+    per_host_burst: int
+    max_body_size: int
+
+    def __init__(self, config: any) -> None:
+        self.timeout = config["timeout"]
+        self.concurrency = config["concurrency"]
+        self.max_connections = config["max_connections"]
+        self.max_keepalive = config["max_keepalive"]
+        self.per_host_concurrency = config["per_host_concurrency"]
+        self.per_host_rate = config["per_host_rate"]
+        self.per_host_burst = config["per_host_burst"]
+        self.max_body_size = config["max_body_size"]
+
+
+class SyncConfig(metaclass=Singleton):
+    batch_size: int
+    mode: str
+    dispatch_interval: int
+    shard_size: int
+    shards_per_tick: int
+    job_timeout: int
+    parse_workers: int
+
+    def __init__(self, config: any) -> None:
+        self.batch_size = config["batch_size"]
+        self.mode = config["mode"]
+        self.dispatch_interval = config["dispatch_interval"]
+        self.shard_size = config["shard_size"]
+        self.shards_per_tick = config["shards_per_tick"]
+        self.job_timeout = config["job_timeout"]
+        self.parse_workers = config["parse_workers"]
+
+
+class PollConfig(metaclass=Singleton):
+    default_interval: int
+    min_interval: int
+    max_interval: int
+
+    def __init__(self, config: any) -> None:
+        self.default_interval = config["default_interval"]
+        self.min_interval = config["min_interval"]
+        self.max_interval = config["max_interval"]
+
+
+class CountersConfig(metaclass=Singleton):
+    reconcile_interval: int
+
+    def __init__(self, config: any) -> None:
+        self.reconcile_interval = config["reconcile_interval"]
+
+
+class ReadStateConfig(metaclass=Singleton):
+    mode: str
+
+    def __init__(self, config: any) -> None:
+        self.mode = config["mode"]
+
+
+class RetentionConfig(metaclass=Singleton):
+    enabled: bool
+    max_age_days: int
+    max_posts: int
+    batch_size: int
+    interval: int
+    archive_dir: str
+
+    def __init__(self, config: any) -> None:
+        self.enabled = config["enabled"]
+        self.max_age_days = config["max_age_days"]
+        self.max_posts = config["max_posts"]
+        self.batch_size = config["batch_size"]
+        self.interval = config["interval"]
+        self.archive_dir = config["archive_dir"]
+
+
+class PartitionConfig(metaclass=Singleton):
+    months_ahead: int
+    interval: int
+
+    def __init__(self, config: any) -> None:
+        self.months_ahead = config["months_ahead"]
+        self.interval = config["interval"]
+
+
+class ResponseCacheConfig(metaclass=Singleton):
+    enabled: bool
+    ttl: int
+    negative_ttl: int
+    local_max_entries: int
+    local_ttl: int
+    stale_ttl: int
+    lock_timeout: float
+    lock_wait: float
+
+    def __init__(self, config: any) -> None:
+        self.enabled = config["enabled"]
+        self.ttl = config["ttl"]
+        self.negative_ttl = config["negative_ttl"]
+        self.local_max_entries = config["local_max_entries"]
+        self.local_ttl = config["local_ttl"]
+        self.stale_ttl = config["stale_ttl"]
+        self.lock_timeout = config["lock_timeout"]
+        self.lock_wait = config["lock_wait"]
+
+
 class Config(metaclass=Singleton):
     app_config: AppConfig
     db_config: DBConfig
     cache_config: CacheConfig
+    fetch_config: FetchConfig
+    sync_config: SyncConfig
+    poll_config: PollConfig
+    counters_config: CountersConfig
+    read_state_config: ReadStateConfig
+    retention_config: RetentionConfig
+    partition_config: PartitionConfig
+    response_cache_config: ResponseCacheConfig
 
     def __init__(self, mode: str = "dev") -> None:
         # path to config file
@@ -92,3 +218,27 @@ class Config(metaclass=Singleton):
 
             # init cache config
             self.cache_config = CacheConfig(config["cache"], mode)
+
+            # init feed fetch config
+            self.fetch_config = FetchConfig(config["fetch"])
+
+            # init feed sync config
+            self.sync_config = SyncConfig(config["sync"])
+
+            # init feed polling interval config
+            self.poll_config = PollConfig(config["poll"])
+
+            # init unread counters config
+            self.counters_config = CountersConfig(config["counters"])
+
+            # init read state storage config
+            self.read_state_config = ReadStateConfig(config["read_state"])
+
+            # init post retention config
+            self.retention_config = RetentionConfig(config["retention"])
+
+            # init link table partitions config
+            self.partition_config = PartitionConfig(config["partitions"])
+
+            # init api response cache config
+            self.response_cache_config = ResponseCacheConfig(config["response_cache"])
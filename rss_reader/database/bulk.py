@@ -0,0 +1,137 @@
+# builtin imports
+from datetime import datetime
+from typing import Iterable, Iterator, TypeVar
+
+# external imports
+from sqlalchemy import Insert, Table, insert, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+# internal imports
+from .models import (
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+)
+
+T = TypeVar("T")
+
+# column order of links created with INSERT ... SELECT
+LINK_COLUMNS = [
+    "user_id",
+    "feed_id",
+    "post_id",
+    "published_at",
+    "is_read",
+    "read_at",
+    "created_at",
+    "updated_at",
+]
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """yields lists of at most size items"""
+    batch: list[T] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if len(batch) != 0:
+        yield batch
+
+
+def insert_posts(conn: Session, rows: list[dict]) -> list[int]:
+    """inserts posts with one multi-row INSERT and returns generated ids
+
+    posts already stored for the feed (same feed_id and guid) are skipped
+    by the unique index, only ids of newly inserted posts are returned.
+    commit is left to the caller, so that a batch of posts and its links
+    can share one transaction
+    """
+    if len(rows) == 0:
+        return []
+
+    q = (
+        insert_ignore_conflicts(conn, PostModel.__table__)
+        .values(rows)
+        .returning(PostModel.id)
+    )
+    return list(conn.exec(q).scalars().all())
+
+
+def insert_ignore_conflicts(conn: Session, table: Table) -> Insert:
+    """builds INSERT ... ON CONFLICT DO NOTHING for the session's dialect"""
+    dialect = conn.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+
+    return insert(table)
+
+
+def insert_links(
+    conn: Session,
+    user_ids: list[int],
+    feed_id: int,
+    post_ids: list[int],
+) -> int:
+    """links every user to every post with one INSERT ... SELECT per user
+
+    the posts are read in the same statement, so that their published_at
+    is copied onto the links. returns the number of links created
+    """
+    if len(user_ids) == 0 or len(post_ids) == 0:
+        return 0
+
+    now = datetime.now()
+    created = 0
+    for user_id in user_ids:
+        q = select(
+            literal(user_id),
+            literal(feed_id),
+            PostModel.id,
+            PostModel.published_at,
+            literal(False),
+            literal(datetime.min),
+            literal(now),
+            literal(now),
+        ).where(PostModel.id.in_(post_ids))
+
+        created += conn.exec(
+            insert(UserFeedPostLink).from_select(LINK_COLUMNS, q)
+        ).rowcount
+
+    return created
+
+
+def insert_subscriptions(conn: Session, pairs: list[tuple[int, int]]) -> int:
+    """subscribes every (user_id, feed_id) pair with nothing read yet
+
+    pairs that are already subscribed keep their read state. returns the
+    number of subscriptions created, commit is left to the caller
+    """
+    if len(pairs) == 0:
+        return 0
+
+    now = datetime.now()
+    q = insert_ignore_conflicts(conn, SubscriptionModel.__table__).values(
+        [
+            {
+                "user_id": user_id,
+                "feed_id": feed_id,
+                "read_until": None,
+                "read_post_ids": [],
+                "unread_post_ids": [],
+                "created_at": now,
+                "updated_at": now,
+            }
+            for user_id, feed_id in pairs
+        ]
+    )
+
+    return conn.exec(q).rowcount
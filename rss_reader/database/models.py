@@ -2,17 +2,44 @@ import uuid
 from datetime import datetime
 
 from pydantic import HttpUrl
-from sqlalchemy import null
+from sqlalchemy import JSON, Column, Index, UniqueConstraint, null
 from sqlmodel import Field, Relationship, SQLModel
 
 
 class User_Feed_Post_Link(SQLModel, table=True):
+    # timeline reads are served from this index alone, newest first
+    __table_args__ = (
+        Index(
+            "ix_user_feed_post_link_timeline",
+            "user_id",
+            "published_at",
+            "post_id",
+            postgresql_include=["feed_id", "is_read", "read_at"],
+        ),
+        Index(
+            "ix_user_feed_post_link_user_id_feed_id_is_read",
+            "user_id",
+            "feed_id",
+            "is_read",
+        ),
+        # sync and retention work feed by feed
+        Index("ix_user_feed_post_link_feed_id_post_id", "feed_id", "post_id"),
+        # on postgres the table can be range partitioned by month on this
+        # column, see rss_reader/database/partitions.py
+        {"info": {"partition_key": "published_at"}},
+    )
+
     user_id: int | None = Field(default=None, foreign_key="users.id", primary_key=True)
     feed_id: int | None = Field(default=None, foreign_key="feeds.id", primary_key=True)
     post_id: int | None = Field(default=None, foreign_key="posts.id", primary_key=True)
 
     is_read: bool = Field(default=False, nullable=True)
     read_at: datetime = Field(default=datetime.min, nullable=True)
+
+    # copy of the post's published_at, so a timeline is read off the link
+    # table without joining posts. it is the partition key, so it is never
+    # left empty for new links
+    published_at: datetime | None = Field(default=None, nullable=True)
     created_at: datetime = Field(default=datetime.now())
     updated_at: datetime = Field(default=datetime.now())
 
@@ -21,9 +48,38 @@ class User_Feed_Post_Link(SQLModel, table=True):
     post: "Posts" = Relationship(back_populates="post_links")
 
 
+class Subscriptions(SQLModel, table=True):
+    """a feed followed by a user, kept in every read_state.mode. its read
+    state is used instead of per post links when read_state.mode is
+    subscriptions, and only kept up to date in that mode
+
+    posts published at or before read_until are read, except the ones
+    in unread_post_ids; later posts are unread, except the ones in
+    read_post_ids. both lists are kept sorted
+    """
+
+    # sync fans new posts out to the subscribers of a feed
+    __table_args__ = (Index("ix_subscriptions_feed_id", "feed_id"),)
+
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    feed_id: int = Field(foreign_key="feeds.id", primary_key=True)
+
+    read_until: datetime | None = Field(default=None, nullable=True)
+    read_post_ids: list[int] = Field(default_factory=list, sa_column=Column(JSON))
+    unread_post_ids: list[int] = Field(default_factory=list, sa_column=Column(JSON))
+
+    created_at: datetime = Field(default=datetime.now())
+    updated_at: datetime = Field(default=datetime.now())
+
+
 class Users(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_users_email", "email", unique=True),
+        Index("ix_users_uuid", "uuid", unique=True),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
-    uuid: str = Field(default=str(uuid.uuid4()), max_length=36)
+    uuid: str = Field(default_factory=lambda: str(uuid.uuid4()), max_length=36)
     email: str = Field(max_length=320)
     is_active: bool = Field(default=True)
     created_at: datetime = Field(default=datetime.now())
@@ -33,25 +89,48 @@ class Users(SQLModel, table=True):
 
 
 class Feeds(SQLModel, table=True):
+    __table_args__ = (Index("ix_feeds_url", "url", unique=True),)
+
     id: int | None = Field(default=None, primary_key=True)
-    uuid: str = Field(default=str(uuid.uuid4()), max_length=36)
+    uuid: str = Field(default_factory=lambda: str(uuid.uuid4()), max_length=36)
     url: str
     is_active: bool = Field(default=True)
     has_sync_failed: bool = Field(default=False)
+    sync_failures: int = Field(default=0)
     created_at: datetime = Field(default=datetime.now())
     updated_at: datetime = Field(default=datetime.now())
     last_successful_sync: datetime = Field(default=None, nullable=True)
 
+    # validators from the last fetch, used for conditional requests
+    etag: str | None = Field(default=None, nullable=True)
+    last_modified: str | None = Field(default=None, nullable=True)
+    content_hash: str | None = Field(default=None, max_length=64, nullable=True)
+
+    # adaptive polling, seconds between fetches and when the feed is due
+    poll_interval: int | None = Field(default=None, nullable=True)
+    next_sync_at: datetime | None = Field(default=None, nullable=True)
+
+    # retention overrides, None falls back to retention config, 0 keeps
+    # posts forever
+    retention_days: int | None = Field(default=None, nullable=True)
+    retention_max_posts: int | None = Field(default=None, nullable=True)
+
     feed_links: list[User_Feed_Post_Link] = Relationship(back_populates="feed")
 
     posts: list["Posts"] = Relationship(back_populates="feed")
 
 
 class Posts(SQLModel, table=True):
+    __table_args__ = (
+        UniqueConstraint("feed_id", "guid", name="uq_posts_feed_id_guid"),
+        Index("ix_posts_feed_id_published_at", "feed_id", "published_at", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     title: str
     url: str
-    uuid: str = Field(default=str(uuid.uuid4()), max_length=36)
+    guid: str
+    uuid: str = Field(default_factory=lambda: str(uuid.uuid4()), max_length=36)
     published_at: datetime
     feed_id: int = Field(default=None, foreign_key="feeds.id")
 
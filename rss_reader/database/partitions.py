@@ -0,0 +1,111 @@
+# builtin imports
+import re
+from datetime import date, datetime
+from typing import Iterator
+
+# external imports
+from sqlalchemy import text
+from sqlmodel import Session
+
+# internal imports
+from .models import User_Feed_Post_Link as UserFeedPostLink
+
+# postgres only: user_feed_post_link can be range partitioned by month on
+# its partition key, see the 8a3e5f7c9d21 revision. partitions are named
+# <table>_pYYYY_MM and rows outside of every month land in <table>_default
+
+LINK_TABLE: str = UserFeedPostLink.__table__.name
+LINK_PARTITION_KEY: str = UserFeedPostLink.__table__.info["partition_key"]
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def is_partitioned(conn: Session, table: str) -> bool:
+    if conn.get_bind().dialect.name != "postgresql":
+        return False
+
+    q = text("""
+        SELECT 1
+        FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :table
+        """).bindparams(table=table)
+
+    return conn.exec(q).first() is not None
+
+
+def month_start(d: date | datetime) -> date:
+    return date(d.year, d.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return "{}_p{:%Y_%m}".format(table, month)
+
+
+def create_partitions(conn: Session, table: str, start: date, end: date) -> list[str]:
+    """creates the monthly partitions from start up to and including end,
+    existing partitions are left alone. commit is left to the caller
+    """
+    created: list[str] = []
+
+    month = month_start(start)
+    while month <= end:
+        name = partition_name(table, month)
+        conn.exec(
+            text(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF {} "
+                "FOR VALUES FROM ('{}') TO ('{}')".format(
+                    name, table, month, add_months(month, 1)
+                )
+            )
+        )
+        created.append(name)
+        month = add_months(month, 1)
+
+    return created
+
+
+def list_partitions(conn: Session, table: str) -> dict[str, date]:
+    """monthly partitions of the table by name, oldest first"""
+    q = text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :table
+        """).bindparams(table=table)
+
+    partitions: dict[str, date] = {}
+    for (name,) in conn.exec(q).all():
+        match = _PARTITION_SUFFIX.search(name)
+        if match is not None:
+            partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+
+    return dict(sorted(partitions.items(), key=lambda item: item[1]))
+
+
+def expired_partitions(conn: Session, table: str, cutoff: datetime) -> list[str]:
+    """partitions that only hold rows older than cutoff"""
+    return [
+        name
+        for name, month in list_partitions(conn, table).items()
+        if add_months(month, 1) <= cutoff.date()
+    ]
+
+
+def stream_partition(conn: Session, name: str, batch_size: int) -> Iterator[list[dict]]:
+    """yields the rows of a partition in lists of at most batch_size"""
+    q = text("SELECT * FROM {}".format(name)).execution_options(yield_per=batch_size)
+
+    for rows in conn.exec(q).mappings().partitions(batch_size):
+        yield [dict(row) for row in rows]
+
+
+def drop_partition(conn: Session, name: str):
+    """drops a partition and its rows, commit is left to the caller"""
+    conn.exec(text("DROP TABLE IF EXISTS {}".format(name)))
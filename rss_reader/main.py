@@ -12,6 +12,8 @@ from .config.config import Config
 from .utils.cache import Cache
 from .utils.message_queue import MessageQueue
 from .utils.database import Database
+from .utils.response_cache import ResponseCache
+from .utils.unread_counters import UnreadCounters
 
 # import all routers here
 from .api.v1.app_data import root_router
@@ -42,8 +44,8 @@ class RSSReaderApplication:
         self._setup_message_queue()
         self._setup_feed_parser()
 
-        # requeue all jobs
-        self._parser.requeue_jobs()
+        # schedule sync jobs for new feeds, drop jobs of inactive ones
+        self._parser.reconcile_jobs()
 
     def _setup_middleware(self):
         origins = ["*"]
@@ -66,6 +68,8 @@ class RSSReaderApplication:
     def _setup_application(self):
         self._cache = Cache()
         self._cache.setup(self._config.cache_config)
+        UnreadCounters().setup(self._cache.get_redis_connection())
+        ResponseCache().setup(self._cache, self._config.response_cache_config)
 
         self._database = Database()
         self._database.setup(self._config.db_config)
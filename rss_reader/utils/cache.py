@@ -1,14 +1,21 @@
 # builtin imports
 import os
 import signal
-import json
+import math
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator
 
 # external imports
 from redis import Redis
 from redis import exceptions as redis_exceptions
+from redis.client import Pipeline
 
 
 # internal imports
+from .cache_codec import CacheCodec
 from .singleton import Singleton
 from ..config.config import CacheConfig
 
@@ -20,11 +27,17 @@ def get_cache():
 
 class Cache(metaclass=Singleton):
     _redis: Redis
+    _codec: CacheCodec = CacheCodec()
+    _lock_prefix: str = "rss_reader:lock:"
 
     def __init__(self):
         pass
 
     def setup(self, config: CacheConfig):
+        self._codec = CacheCodec(
+            config.codec, config.compression, config.compress_min_bytes
+        )
+
         try:
             self._redis = Redis(
                 host=config.host,
@@ -48,12 +61,161 @@ class Cache(metaclass=Singleton):
         if val is None:
             return ""
 
-        return json.loads(val)
+        return self._codec.decode(val)
 
     def set(self, key: str, val: any, ttl: int = 0) -> bool:
-        val_str = json.dumps(val)
+        data = self._codec.encode(val)
 
         if not ttl:
-            return self._redis.set(name=key, value=val_str)
+            return self._redis.set(name=key, value=data)
+
+        return self._redis.set(name=key, value=data, ex=ttl)
+
+    def get_many(self, keys: list[str]) -> dict[str, any]:
+        """values of keys in a single round trip, missing keys map to an
+        empty string like get
+        """
+        if len(keys) == 0:
+            return {}
+
+        vals = self._redis.mget(keys)
+        return {
+            key: self._codec.decode(val) if val is not None else ""
+            for key, val in zip(keys, vals)
+        }
+
+    def set_many(
+        self,
+        vals: dict[str, any],
+        ttl: int = 0,
+        pipeline: Pipeline | None = None,
+    ) -> None:
+        """sets every key in a single round trip, or queues the writes on
+        pipeline for the caller to execute
+        """
+        if len(vals) == 0:
+            return
+
+        data = {key: self._codec.encode(val) for key, val in vals.items()}
+
+        if not ttl and pipeline is None:
+            self._redis.mset(data)
+            return
+
+        with self.pipeline(pipeline) as pipe:
+            for key, val in data.items():
+                pipe.set(name=key, value=val, ex=ttl or None)
+
+    def delete_many(self, keys: list[str], pipeline: Pipeline | None = None) -> None:
+        if len(keys) == 0:
+            return
+
+        conn = pipeline if pipeline is not None else self._redis
+        conn.delete(*keys)
+
+    @contextmanager
+    def pipeline(
+        self,
+        pipeline: Pipeline | None = None,
+        transaction: bool = False,
+    ) -> Iterator[Pipeline]:
+        """batches the commands issued in the block into one round trip
+
+        the pipeline is executed when the block exits without raising.
+        given a pipeline it is yielded as is and left to its owner to
+        execute, so helpers can take an optional pipeline and batch their
+        writes either way
+        """
+        if pipeline is not None:
+            yield pipeline
+            return
+
+        with self._redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            pipe.execute()
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], any],
+        ttl: int | Callable[[any], int],
+        stale_ttl: int = 0,
+        lock_timeout: float = 10,
+        lock_wait: float = 2,
+        beta: float = 1.0,
+    ) -> any:
+        """value of key, computed by a single caller when it is missing
+
+        values are kept for ttl seconds, ttl may be a function of the
+        value. a value is recomputed early with a probability that grows
+        as its expiry gets closer and with the time compute took, so hot
+        keys are refreshed before they expire. only the caller holding the
+        lock of the key recomputes it, the others get the current value
+        for up to stale_ttl seconds past its expiry. when there is no
+        value they wait up to lock_wait seconds for it and then compute it
+        themselves
+        """
+        entry = self.get(key)
+        if entry != "" and not self._should_refresh(entry, beta):
+            return entry["value"]
+
+        token = uuid.uuid4().hex
+        lock_key = "{}{}".format(self._lock_prefix, key)
+        if self._redis.set(lock_key, token, nx=True, px=int(lock_timeout * 1000)):
+            try:
+                return self._compute(key, compute, ttl, stale_ttl)
+            finally:
+                self._release_lock(lock_key, token)
+
+        if entry != "":
+            return entry["value"]
+
+        deadline = time.monotonic() + lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = self.get(key)
+            if entry != "":
+                return entry["value"]
+
+        return self._compute(key, compute, ttl, stale_ttl)
+
+    def _should_refresh(self, entry: dict, beta: float) -> bool:
+        # xfetch, log of (0, 1] is negative and grows with the compute time
+        early = entry["delta"] * beta * math.log(1.0 - random.random())
+        return time.time() - early >= entry["expires_at"]
+
+    def _compute(
+        self,
+        key: str,
+        compute: Callable[[], any],
+        ttl: int | Callable[[any], int],
+        stale_ttl: int,
+    ) -> any:
+        start = time.time()
+        value = compute()
+        end = time.time()
+
+        if callable(ttl):
+            ttl = ttl(value)
+
+        entry = {"value": value, "delta": end - start, "expires_at": end + ttl}
+        try:
+            self.set(key, entry, ttl=ttl + stale_ttl)
+        except redis_exceptions.RedisError:
+            # the value is still returned, the next caller computes it again
+            pass
 
-        return self._redis.set(name=key, value=val_str, ex=ttl)
+        return value
+
+    def _release_lock(self, lock_key: str, token: str) -> None:
+        # only delete the lock if it was not taken over after timing out
+        try:
+            with self._redis.pipeline() as pipe:
+                pipe.watch(lock_key)
+                if pipe.get(lock_key) == token.encode("utf-8"):
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+        except redis_exceptions.RedisError:
+            # watch errors included, the lock expires after lock_timeout
+            pass
@@ -0,0 +1,153 @@
+# builtin imports
+import json
+import zlib
+from datetime import date, datetime
+
+# external imports, both are optional and only needed when configured
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# encoded values start with a marker byte that json text never starts
+# with, followed by the ids of the codec and of the compression used.
+# values without the marker were written before codecs existed and are
+# plain json, values are always decoded with the ids they were written
+# with so the configured codec can change without flushing redis
+_MARKER = b"\x00"
+
+CODECS: dict[str, int] = {"json": 1, "msgpack": 2}
+COMPRESSIONS: dict[str, int] = {"none": 0, "zlib": 1, "lz4": 2}
+
+_MSGPACK_DATETIME = 1
+_MSGPACK_DATE = 2
+
+
+class CacheCodec:
+    """encodes cache values to bytes and back, datetime and date values
+    round trip with every codec. encoded values of at least
+    compress_min_bytes are compressed
+    """
+
+    _codec: int
+    _compression: int
+    _compress_min_bytes: int
+
+    def __init__(
+        self,
+        codec: str = "json",
+        compression: str = "none",
+        compress_min_bytes: int = 1024,
+    ) -> None:
+        if codec not in CODECS:
+            raise ValueError("unknown cache codec {}".format(codec))
+        if compression not in COMPRESSIONS:
+            raise ValueError("unknown cache compression {}".format(compression))
+
+        if codec == "msgpack" and msgpack is None:
+            raise ValueError("cache codec msgpack needs the msgpack package")
+        if compression == "lz4" and lz4_frame is None:
+            raise ValueError("cache compression lz4 needs the lz4 package")
+
+        self._codec = CODECS[codec]
+        self._compression = COMPRESSIONS[compression]
+        self._compress_min_bytes = compress_min_bytes
+
+    def encode(self, val: any) -> bytes:
+        data = _serialize(self._codec, val)
+
+        compression = COMPRESSIONS["none"]
+        if self._compression and len(data) >= self._compress_min_bytes:
+            compression = self._compression
+            data = _compress(compression, data)
+
+        return _MARKER + bytes([self._codec, compression]) + data
+
+    def decode(self, data: bytes) -> any:
+        if data[:1] != _MARKER:
+            return json.loads(data)
+
+        codec, compression = data[1], data[2]
+        data = data[3:]
+        if compression:
+            data = _decompress(compression, data)
+
+        return _deserialize(codec, data)
+
+
+#### add helper functions here ####
+
+
+def _serialize(codec: int, val: any) -> bytes:
+    if codec == CODECS["msgpack"]:
+        return msgpack.packb(val, default=_msgpack_default, use_bin_type=True)
+
+    return json.dumps(val, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def _deserialize(codec: int, data: bytes) -> any:
+    if codec == CODECS["msgpack"]:
+        return msgpack.unpackb(
+            data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False
+        )
+
+    return json.loads(data, object_hook=_json_object_hook)
+
+
+def _compress(compression: int, data: bytes) -> bytes:
+    if compression == COMPRESSIONS["lz4"]:
+        return lz4_frame.compress(data)
+
+    return zlib.compress(data)
+
+
+def _decompress(compression: int, data: bytes) -> bytes:
+    if compression == COMPRESSIONS["lz4"]:
+        return lz4_frame.decompress(data)
+
+    return zlib.decompress(data)
+
+
+def _json_default(val: any) -> any:
+    # datetime is a subclass of date, check it first
+    if isinstance(val, datetime):
+        return {"__datetime__": val.isoformat()}
+    if isinstance(val, date):
+        return {"__date__": val.isoformat()}
+
+    raise TypeError("{} is not json serializable".format(type(val).__name__))
+
+
+def _json_object_hook(obj: dict) -> any:
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+
+    return obj
+
+
+def _msgpack_default(val: any) -> any:
+    # naive datetimes are stored as iso text, msgpack's timestamp type
+    # only supports aware ones
+    if isinstance(val, datetime):
+        return msgpack.ExtType(_MSGPACK_DATETIME, val.isoformat().encode("utf-8"))
+    if isinstance(val, date):
+        return msgpack.ExtType(_MSGPACK_DATE, val.isoformat().encode("utf-8"))
+
+    raise TypeError("{} is not msgpack serializable".format(type(val).__name__))
+
+
+def _msgpack_ext_hook(code: int, data: bytes) -> any:
+    if code == _MSGPACK_DATETIME:
+        return datetime.fromisoformat(data.decode("utf-8"))
+    if code == _MSGPACK_DATE:
+        return date.fromisoformat(data.decode("utf-8"))
+
+    return msgpack.ExtType(code, data)
@@ -0,0 +1,62 @@
+# builtin imports
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# external imports
+import feedparser
+from feedparser import FeedParserDict
+
+# internal imports
+from .polling import parse_ttl
+
+# this module runs inside parse worker processes, keep it free of
+# database, redis and queue imports so that it is cheap to load there
+
+
+def parse_feed(
+    content: bytes,
+    headers: dict[str, str],
+) -> tuple[list[dict], int | None]:
+    """parses a feed body into the entry fields that are stored
+
+    returns plain dicts so that results are cheap to send back from a
+    worker process, along with the channel ttl in minutes
+    """
+    f = feedparser.parse(content, response_headers=headers)
+
+    entries: list[dict] = []
+    for item in f.get("entries", []):
+        entry = _slim_entry(item)
+        if entry is not None:
+            entries.append(entry)
+
+    return (entries, parse_ttl(f.get("feed", {}).get("ttl")))
+
+
+def get_parse_pool(workers: int, pending: int) -> ProcessPoolExecutor:
+    """pool for the parse stage, sized to the cores unless configured"""
+    max_workers = workers or os.cpu_count() or 1
+
+    return ProcessPoolExecutor(max_workers=max(1, min(max_workers, pending)))
+
+
+#### add helper functions here ####
+
+
+def _slim_entry(item: FeedParserDict) -> dict | None:
+    # entries are identified by their guid, falling back to the link
+    guid = item.get("id") or item.get("link")
+    if not guid:
+        return None
+
+    # published as time struct, undated entries are left for the caller
+    # to stamp with the time they were first seen
+    p_ts = item.get("published_parsed") or item.get("updated_parsed")
+
+    return {
+        "guid": guid,
+        "url": item.get("link") or guid,
+        "title": item.get("title", ""),
+        "published_at": datetime(*p_ts[:6]) if p_ts else None,
+    }
@@ -0,0 +1,664 @@
+# builtin imports
+import asyncio
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# external imports
+import httpx
+from fastapi import status
+from redis import Redis
+
+# internal imports
+from .singleton import Singleton
+from ..config.config import FetchConfig
+
+# rq kills jobs after 10 seconds (see MessageQueue), keep the download
+# well within that budget so a slow origin fails the fetch, not the job
+_FETCH_TIMEOUT = 8.0
+
+# largest decoded body accepted by fetch_feed, bulk fetches use the
+# configured fetch.max_body_size
+_MAX_BODY_SIZE = 5 * 1024 * 1024  # in bytes ~ 5 MiB
+
+# longest a single feed fetch waits for its host's rate limit, a longer
+# wait fails the fetch as rate limited so the sync is retried later
+_MAX_THROTTLE_WAIT = 1.0
+
+_http_client: httpx.Client | None = None
+
+
+class FeedRateLimited(Exception):
+    """origin answered 429, retry_after is in seconds when it sent one"""
+
+    url: str
+    retry_after: int | None
+
+    def __init__(self, url: str, retry_after: int | None = None) -> None:
+        super().__init__("rate limited by {}, retry after {}s".format(url, retry_after))
+        self.url = url
+        self.retry_after = retry_after
+
+
+class FetchRequest:
+    feed_id: int
+    url: str
+    etag: str | None
+    last_modified: str | None
+    content_hash: str | None
+
+    def __init__(
+        self,
+        feed_id: int,
+        url: str,
+        etag: str | None = None,
+        last_modified: str | None = None,
+        content_hash: str | None = None,
+    ) -> None:
+        self.feed_id = feed_id
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+
+
+class FetchResult:
+    url: str
+    status_code: int
+    content: bytes
+    headers: dict[str, str]
+    etag: str | None
+    last_modified: str | None
+    content_hash: str | None
+    not_modified: bool
+    feed_id: int | None
+    error: Exception | None
+
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        content: bytes,
+        headers: dict[str, str],
+        etag: str | None,
+        last_modified: str | None,
+        content_hash: str | None,
+        not_modified: bool,
+        feed_id: int | None = None,
+        error: Exception | None = None,
+    ) -> None:
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.not_modified = not_modified
+        self.feed_id = feed_id
+        self.error = error
+
+    def is_gone(self) -> bool:
+        return self.status_code == status.HTTP_410_GONE
+
+    def has_failed(self) -> bool:
+        return self.error is not None
+
+    def retry_after(self) -> int | None:
+        if isinstance(self.error, FeedRateLimited):
+            return self.error.retry_after
+
+        return None
+
+
+class FeedTooLarge(Exception):
+    """feed body is larger than the configured limit"""
+
+    url: str
+    max_body_size: int
+
+    def __init__(self, url: str, max_body_size: int) -> None:
+        super().__init__("feed {} is larger than {} bytes".format(url, max_body_size))
+        self.url = url
+        self.max_body_size = max_body_size
+
+
+class HostThrottle(metaclass=Singleton):
+    """request rate and 429 pauses per host, shared through redis by every
+    worker and by both the per feed and the bulk fetches
+
+    the rate is a token bucket refilled at per_host_rate tokens per second
+    holding up to per_host_burst tokens
+    """
+
+    _redis: Redis
+    _config: FetchConfig
+    _key_prefix: str = "rss_reader:hosts:"
+
+    # returns the seconds to wait for a token, 0 when one was taken. the
+    # wait is returned as text, redis truncates lua numbers to integers
+    _take_script = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self):
+        pass
+
+    def setup(self, redis_conn: Redis, config: FetchConfig) -> None:
+        self._redis = redis_conn
+        self._config = config
+        self._take = redis_conn.register_script(self._take_script)
+
+    def take(self, host: str) -> float:
+        """takes a token of the host, returns the seconds to wait before
+        trying again when there is none
+        """
+        wait = self._take(
+            keys=[self._bucket_key(host)],
+            args=[self._config.per_host_rate, self._config.per_host_burst, time.time()],
+        )
+        return float(wait)
+
+    def wait(self, url: str, max_wait: float = _MAX_THROTTLE_WAIT) -> None:
+        """blocks until a request to the url's host may be sent, raises
+        FeedRateLimited when the host is paused or busy for longer than
+        max_wait seconds
+        """
+        host = httpx.URL(url).host
+
+        paused = self.paused_for(host)
+        if paused != 0:
+            raise FeedRateLimited(url, paused)
+
+        waited = 0.0
+        while (delay := self.take(host)) != 0:
+            if waited + delay > max_wait:
+                raise FeedRateLimited(url, math.ceil(delay))
+
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, host: str, seconds: int) -> None:
+        if seconds > self.paused_for(host):
+            self._redis.set(self._pause_key(host), 1, ex=seconds)
+
+    def paused_for(self, host: str) -> int:
+        return max(0, self._redis.ttl(self._pause_key(host)))
+
+    def _bucket_key(self, host: str) -> str:
+        return "{}{}:bucket".format(self._key_prefix, host)
+
+    def _pause_key(self, host: str) -> str:
+        return "{}{}:paused".format(self._key_prefix, host)
+
+
+class HostLimiter:
+    """caps concurrent requests and request rate for a single host
+
+    the rate is a token bucket refilled at rate tokens per second, a 429
+    from the host pauses it until its retry after has passed. with a
+    throttle the rate and pauses are shared with every other worker,
+    otherwise they only hold within this limiter
+    """
+
+    _host: str
+    _throttle: HostThrottle | None
+    _semaphore: asyncio.Semaphore
+    _lock: asyncio.Lock
+    _rate: float
+    _burst: int
+    _tokens: float
+    _updated_at: float
+    _paused_until: float
+
+    def __init__(
+        self,
+        concurrency: int,
+        rate: float,
+        burst: int,
+        host: str = "",
+        throttle: HostThrottle | None = None,
+    ) -> None:
+        self._host = host
+        self._throttle = throttle
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._lock = asyncio.Lock()
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    async def __aenter__(self) -> "HostLimiter":
+        await self._semaphore.acquire()
+
+        try:
+            await self._take_token()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self._semaphore.release()
+
+    def pause(self, seconds: int) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self._throttle is not None:
+            self._throttle.pause(self._host, seconds)
+
+    def paused_for(self) -> int:
+        paused = max(0, round(self._paused_until - time.monotonic()))
+        if self._throttle is not None:
+            paused = max(paused, self._throttle.paused_for(self._host))
+
+        return paused
+
+    async def _take_token(self) -> None:
+        async with self._lock:
+            while self._throttle is not None:
+                delay = self._throttle.take(self._host)
+                if delay == 0:
+                    return
+
+                await asyncio.sleep(delay)
+
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._burst, self._tokens + (now - self._updated_at) * self._rate
+                )
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class HostLimiters:
+    """hands out one HostLimiter per host
+
+    limiters live as long as the bulk fetch that built them, so per host
+    concurrency only holds within one batch. rate and pauses are shared
+    across batches and workers when a throttle is given
+    """
+
+    _config: FetchConfig
+    _throttle: HostThrottle | None
+    _limiters: dict[str, HostLimiter]
+
+    def __init__(
+        self,
+        config: FetchConfig,
+        throttle: HostThrottle | None = None,
+    ) -> None:
+        self._config = config
+        self._throttle = throttle
+        self._limiters = {}
+
+    def get(self, url: str) -> HostLimiter:
+        host = httpx.URL(url).host
+
+        if host not in self._limiters:
+            self._limiters[host] = HostLimiter(
+                concurrency=self._config.per_host_concurrency,
+                rate=self._config.per_host_rate,
+                burst=self._config.per_host_burst,
+                host=host,
+                throttle=self._throttle,
+            )
+
+        return self._limiters[host]
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+
+    # reuse a single client so that connections are kept alive between
+    # fetches made by the same worker process
+    if _http_client is None:
+        _http_client = httpx.Client(
+            follow_redirects=True,
+            timeout=_FETCH_TIMEOUT,
+        )
+
+    return _http_client
+
+
+def fetch_feed(
+    url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    content_hash: str | None = None,
+    max_body_size: int = _MAX_BODY_SIZE,
+    throttle: HostThrottle | None = None,
+) -> FetchResult:
+    """fetches feed body, using validators from the previous fetch
+
+    the body is streamed and the download aborted with FeedTooLarge once
+    it grows past max_body_size. with a throttle the fetch waits for the
+    host's rate limit and a 429 pauses the host for every worker
+    """
+    headers = _conditional_headers(etag, last_modified)
+
+    if throttle is not None:
+        throttle.wait(url)
+
+    with get_http_client().stream("GET", url, headers=headers) as resp:
+        content = b""
+        if resp.is_success:
+            _check_content_length(url, resp, max_body_size)
+
+            chunks: list[bytes] = []
+            size = 0
+            for chunk in resp.iter_bytes():
+                size = _append_chunk(url, chunks, size, chunk, max_body_size)
+
+            content = b"".join(chunks)
+
+    try:
+        return _build_fetch_result(
+            url=url,
+            resp=resp,
+            content=content,
+            etag=etag,
+            last_modified=last_modified,
+            content_hash=content_hash,
+        )
+
+    except FeedRateLimited as exc:
+        if throttle is not None and exc.retry_after is not None:
+            throttle.pause(httpx.URL(url).host, exc.retry_after)
+
+        raise
+
+
+def fetch_feeds_bulk(
+    requests: list[FetchRequest],
+    config: FetchConfig,
+    transport: httpx.AsyncBaseTransport | None = None,
+    throttle: HostThrottle | None = None,
+) -> list[FetchResult]:
+    """fetches all feeds concurrently, blocks until every fetch is done"""
+    return asyncio.run(
+        fetch_feeds(requests, config, transport=transport, throttle=throttle)
+    )
+
+
+async def fetch_feeds(
+    requests: list[FetchRequest],
+    config: FetchConfig,
+    transport: httpx.AsyncBaseTransport | None = None,
+    throttle: HostThrottle | None = None,
+) -> list[FetchResult]:
+    """fetches all feeds concurrently over a pooled async client
+
+    results are returned in the same order as the requests. a failed
+    fetch does not fail the batch, its exception is kept on the result.
+    requests to the same host share its connections and are throttled by
+    the per host limits
+
+    the client is bound to the event loop of this call, so connections
+    and per host concurrency are only shared within one batch
+    """
+    limits = httpx.Limits(
+        max_connections=config.max_connections,
+        max_keepalive_connections=config.max_keepalive,
+    )
+    semaphore = asyncio.Semaphore(config.concurrency)
+    hosts = HostLimiters(config, throttle=throttle)
+
+    async with httpx.AsyncClient(
+        follow_redirects=True,
+        limits=limits,
+        timeout=config.timeout,
+        transport=transport,
+    ) as client:
+        results = await asyncio.gather(
+            *[
+                _fetch_feed_async(client, semaphore, hosts, request, config)
+                for request in requests
+            ],
+            return_exceptions=True,
+        )
+
+    # an unexpected error of one fetch fails only that feed, the rest of
+    # the batch still gets synced
+    for i, (request, result) in enumerate(zip(requests, results)):
+        if isinstance(result, Exception):
+            results[i] = _failed_fetch_result(request, result)
+        elif isinstance(result, BaseException):
+            raise result
+
+    return results
+
+
+#### add helper functions here ####
+
+
+async def _fetch_feed_async(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    hosts: HostLimiters,
+    request: FetchRequest,
+    config: FetchConfig,
+) -> FetchResult:
+    host = hosts.get(request.url)
+
+    try:
+        # the host asked us to back off earlier, do not spend a request
+        # only to be told the same
+        if host.paused_for() != 0:
+            raise FeedRateLimited(request.url, host.paused_for())
+
+        # wait for the host before taking a global slot, so requests
+        # queued behind a slow or throttled host do not hold slots that
+        # requests to other hosts could use
+        async with host:
+            # the host may have throttled another request while this one
+            # queued for it
+            if host.paused_for() != 0:
+                raise FeedRateLimited(request.url, host.paused_for())
+
+            async with semaphore:
+                # httpx timeouts apply per read, bound the whole request
+                # so a slowly trickling origin cannot hold a slot forever
+                resp, content = await asyncio.wait_for(
+                    _stream_feed_async(client, request, config.max_body_size),
+                    timeout=config.timeout,
+                )
+
+        result = _build_fetch_result(
+            url=request.url,
+            resp=resp,
+            content=content,
+            etag=request.etag,
+            last_modified=request.last_modified,
+            content_hash=request.content_hash,
+        )
+
+    except FeedRateLimited as exc:
+        if exc.retry_after is not None:
+            host.pause(exc.retry_after)
+
+        result = _failed_fetch_result(request, exc)
+
+    except (httpx.HTTPError, asyncio.TimeoutError, FeedTooLarge) as exc:
+        result = _failed_fetch_result(request, exc)
+
+    result.feed_id = request.feed_id
+    return result
+
+
+async def _stream_feed_async(
+    client: httpx.AsyncClient,
+    request: FetchRequest,
+    max_body_size: int,
+) -> tuple[httpx.Response, bytes]:
+    headers = _conditional_headers(request.etag, request.last_modified)
+
+    async with client.stream("GET", request.url, headers=headers) as resp:
+        # only successful responses carry a feed worth reading
+        if not resp.is_success:
+            return (resp, b"")
+
+        _check_content_length(request.url, resp, max_body_size)
+
+        chunks: list[bytes] = []
+        size = 0
+        async for chunk in resp.aiter_bytes():
+            size = _append_chunk(request.url, chunks, size, chunk, max_body_size)
+
+    return (resp, b"".join(chunks))
+
+
+def _check_content_length(url: str, resp: httpx.Response, max_body_size: int):
+    # content length is the encoded size, a compressed body that passes
+    # here is still checked chunk by chunk once decoded
+    length = resp.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_body_size:
+        raise FeedTooLarge(url, max_body_size)
+
+
+def _append_chunk(
+    url: str,
+    chunks: list[bytes],
+    size: int,
+    chunk: bytes,
+    max_body_size: int,
+) -> int:
+    # chunks are decoded by httpx (gzip, deflate and br when brotli is
+    # installed), abort as soon as the decoded body is too large. they
+    # are joined once at the end, feedparser only takes bytes so growing
+    # a buffer would cost a copy more
+    size += len(chunk)
+    if size > max_body_size:
+        raise FeedTooLarge(url, max_body_size)
+
+    chunks.append(chunk)
+    return size
+
+
+def _failed_fetch_result(request: FetchRequest, exc: Exception) -> FetchResult:
+    return FetchResult(
+        url=request.url,
+        status_code=0,
+        content=b"",
+        headers={},
+        etag=request.etag,
+        last_modified=request.last_modified,
+        content_hash=request.content_hash,
+        not_modified=False,
+        feed_id=request.feed_id,
+        error=exc,
+    )
+
+
+def _parse_retry_after(value: str | None) -> int | None:
+    if value is None:
+        return None
+
+    # retry after is either a number of seconds or an http date
+    if value.strip().isdigit():
+        return int(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0, round((retry_at - datetime.now(tz=timezone.utc)).total_seconds()))
+
+
+def _conditional_headers(etag: str | None, last_modified: str | None) -> dict:
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    return headers
+
+
+def _build_fetch_result(
+    url: str,
+    resp: httpx.Response,
+    content: bytes,
+    etag: str | None,
+    last_modified: str | None,
+    content_hash: str | None,
+) -> FetchResult:
+    headers = dict(resp.headers)
+
+    # origin confirmed that nothing changed since the last fetch
+    if resp.status_code == status.HTTP_304_NOT_MODIFIED:
+        return FetchResult(
+            url=url,
+            status_code=resp.status_code,
+            content=b"",
+            headers=headers,
+            etag=resp.headers.get("etag", etag),
+            last_modified=resp.headers.get("last-modified", last_modified),
+            content_hash=content_hash,
+            not_modified=True,
+        )
+
+    # feed is permanently gone or discontinued, nothing to sync
+    if resp.status_code == status.HTTP_410_GONE:
+        return FetchResult(
+            url=url,
+            status_code=resp.status_code,
+            content=b"",
+            headers=headers,
+            etag=None,
+            last_modified=None,
+            content_hash=None,
+            not_modified=False,
+        )
+
+    # origin is throttling us, surface it so the sync backs off for as
+    # long as it asked
+    if resp.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+        raise FeedRateLimited(url, _parse_retry_after(resp.headers.get("retry-after")))
+
+    # handle everything else here, wrong url, server exception
+    resp.raise_for_status()
+
+    # origins without validator support still send the same body when
+    # nothing changed, compare the digest to detect that case
+    digest = hashlib.sha256(content).hexdigest()
+
+    return FetchResult(
+        url=url,
+        status_code=resp.status_code,
+        content=content,
+        headers=headers,
+        etag=resp.headers.get("etag"),
+        last_modified=resp.headers.get("last-modified"),
+        content_hash=digest,
+        not_modified=(content_hash is not None and digest == content_hash),
+    )
@@ -2,31 +2,128 @@ from calendar import c
 import os
 from datetime import datetime, timezone, timedelta
 import uuid
+from collections import Counter
+from concurrent.futures import Future, as_completed
 
 # external imports
-import feedparser
-from feedparser import FeedParserDict
 from rq import Queue
+from rq import get_current_job
 from rq.job import Job
+from redis import Redis
+from redis.client import Pipeline
+from redis.exceptions import LockError
 from rq_scheduler import Scheduler
-from sqlalchemy import Engine
+from rq_scheduler.utils import to_unix
+from sqlalchemy import Engine, func, insert, literal, or_, true, update
 from sqlmodel import Session, select
-from fastapi import status
 
+from rss_reader.database.bulk import (
+    LINK_COLUMNS,
+    batched,
+    insert_links,
+    insert_posts,
+    insert_subscriptions,
+)
+from rss_reader.database.partitions import (
+    LINK_TABLE,
+    add_months,
+    create_partitions,
+    is_partitioned,
+    month_start,
+)
 from rss_reader.utils.cache import Cache
 from rss_reader.utils.database import Database
+from rss_reader.utils.feed_entries import get_parse_pool, parse_feed
+from rss_reader.utils.feed_fetcher import (
+    FeedRateLimited,
+    FetchRequest,
+    FetchResult,
+    HostThrottle,
+    fetch_feed,
+    fetch_feeds_bulk,
+)
 from rss_reader.database.models import (
     Posts as PostModel,
     Feeds as FeedModel,
+    Subscriptions as SubscriptionModel,
     Users as UserModel,
     User_Feed_Post_Link as UserFeedPostLink,
 )
-from rss_reader.utils.message_queue import BackgroundScheduler, MessageQueue
+from rss_reader.utils.message_queue import BackgroundScheduler, DueQueue, MessageQueue
 from rss_reader.utils.singleton import Singleton
-from rss_reader.config.config import Config
+from rss_reader.utils.read_state import (
+    READ_STATE_SUBSCRIPTIONS,
+    count_unread,
+    get_read_state_mode,
+)
+from rss_reader.utils.response_cache import (
+    ResponseCache,
+    feed_posts_scope,
+    feed_scope,
+    user_feed_scope,
+)
+from rss_reader.utils.retention import (
+    PostArchive,
+    delete_posts,
+    drop_expired_partitions,
+    drop_expired_rows,
+    find_expired_posts,
+    get_partition_cutoff,
+    get_retention_limits,
+    restore_archive,
+)
+from rss_reader.utils.unread_counters import UnreadCounters
+from rss_reader.utils.polling import (
+    PUBLISH_HISTORY_SIZE,
+    compute_poll_interval,
+    parse_max_age,
+)
+from rss_reader.config.config import (
+    Config,
+    CountersConfig,
+    PartitionConfig,
+    PollConfig,
+    RetentionConfig,
+    SyncConfig,
+)
+
+_SYNC_JOB_FUNC = "rss_reader.utils.feed_parser.scheduled_sync"
+_SYNC_JOB_ID_PREFIX = "rss_reader.feeds.sync:"
+
+_BULK_SYNC_JOB_FUNC = "rss_reader.utils.feed_parser.scheduled_bulk_sync"
+_DISPATCH_JOB_FUNC = "rss_reader.utils.feed_parser.dispatch_due_feeds"
+_DISPATCH_JOB_ID = "rss_reader.feeds.dispatch"
+
+# sync.mode values, per_feed schedules one rq job per feed while batch
+# has a single dispatcher job claim due feeds and sync them in shards.
+# due_queue dispatches the same way but claims from a redis sorted set
+# instead of scanning the feeds table
+_SYNC_MODE_PER_FEED = "per_feed"
+_SYNC_MODE_BATCH = "batch"
+_SYNC_MODE_DUE_QUEUE = "due_queue"
+
+# backoff intervals in seconds, applied after consecutive sync failures
+_SYNC_BACKOFF_INTERVALS = [
+    (2 * 60),  # 2 mins
+    (5 * 60),  # 5 mins
+    (8 * 60),  # 8 mins
+]
+
+_UNREAD_RECONCILE_JOB_FUNC = "rss_reader.utils.feed_parser.reconcile_unread_counters"
+_UNREAD_RECONCILE_JOB_ID = "rss_reader.unread.reconcile"
+
+_RETENTION_JOB_FUNC = "rss_reader.utils.feed_parser.prune_expired_posts"
+_RETENTION_JOB_ID = "rss_reader.posts.prune"
+
+_PARTITION_JOB_FUNC = "rss_reader.utils.feed_parser.create_link_partitions"
+_PARTITION_JOB_ID = "rss_reader.links.partitions"
+
+_RECONCILE_LOCK_KEY = "rss_reader:lock:reconcile_jobs"
+_RECONCILE_LOCK_TIMEOUT = 5 * 60  # in seconds ~ 5 mins
 
 
 class Parser(metaclass=Singleton):
+    _config: Config
     _session: Session
     _cache: Cache
     _queue: Queue
@@ -43,6 +140,7 @@ class Parser(metaclass=Singleton):
 
         # get config
         _c: Config = Config(mode=app_mode)
+        self._config = _c
 
         # setup database
         d: Database = Database()
@@ -63,6 +161,16 @@ class Parser(metaclass=Singleton):
         scheduler.setup(mq.get_queue(), c.get_redis_connection())
         self._scheduler = scheduler.get_scheduler()
 
+        # setup due queue, unread counters, the host throttle shared by
+        # every fetch and the response cache that syncs invalidate
+        DueQueue().setup(c.get_redis_connection())
+        HostThrottle().setup(c.get_redis_connection(), _c.fetch_config)
+        UnreadCounters().setup(c.get_redis_connection())
+        ResponseCache().setup(c, _c.response_cache_config, subscribe=False)
+
+    def get_config(self) -> Config:
+        return self._config
+
     def get_session(self) -> Engine:
         return self._session
 
@@ -78,6 +186,9 @@ class Parser(metaclass=Singleton):
     def requeue_jobs(self):
         requeue_all_jobs()
 
+    def reconcile_jobs(self):
+        reconcile_all_jobs()
+
 
 def with_db_q_connection(func):
     p: Parser = Parser()
@@ -100,14 +211,8 @@ def scheduled_sync_failure_handler(job: Job, queue_conn, _, value, traceback):
     # we encountered our first failure for the job, we will need to set the
     # backoff intervals and number of retries on the job
     if job.retries_left is None and job.retry_intervals is None:
-        backoff_intervals = [
-            (2 * 60),  # 2 mins
-            (5 * 60),  # 5 mins
-            (8 * 60),  # 8 mins
-        ]  # backoff intervals in seconds
-
-        job.retry_intervals = backoff_intervals
-        job.retries_left = len(backoff_intervals)
+        job.retry_intervals = _SYNC_BACKOFF_INTERVALS
+        job.retries_left = len(_SYNC_BACKOFF_INTERVALS)
         job.save(include_meta=True)
 
     # if there retries left then utilize the backoff computed by the
@@ -116,7 +221,8 @@ def scheduled_sync_failure_handler(job: Job, queue_conn, _, value, traceback):
     if job.retries_left != 0:
         d = job.ended_at.replace(tzinfo=timezone.utc)
         scheduler.change_execution_time(
-            job, d + timedelta(seconds=job.get_retry_interval())
+            job,
+            d + timedelta(seconds=_get_retry_delay(job.get_retry_interval(), value)),
         )
         job.save(include_meta=True)
 
@@ -144,6 +250,233 @@ def scheduled_sync_success_handler(job: Job, connection, result, *args, **kwargs
 
 
 #### Add queue handlers in here ####
+@with_db_q_connection
+def reconcile_all_jobs(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+) -> dict | None:
+    """schedules missing and removes stale feed sync jobs"""
+    # every web process reconciles on boot, the lock makes sure only one
+    # of them does the work while the others skip it
+    lock = cache.get_redis_connection().lock(
+        _RECONCILE_LOCK_KEY, timeout=_RECONCILE_LOCK_TIMEOUT
+    )
+    if not lock.acquire(blocking=False):
+        return None
+
+    try:
+        _schedule_unread_reconciliation(scheduler=scheduler)
+        _schedule_retention(scheduler=scheduler)
+        _schedule_partition_maintenance(conn=conn, scheduler=scheduler)
+
+        return _reconcile_feed_jobs(conn=conn, scheduler=scheduler)
+
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # lock expired while reconciling, nothing to release
+            pass
+
+
+@with_db_q_connection
+def reconcile_unread_counters(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+) -> int:
+    """recounts unread posts of every active user from the links"""
+    q = select(UserModel.id).where(UserModel.is_active == True)
+
+    try:
+        user_ids = conn.exec(q).all()
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+
+    counters: UnreadCounters = UnreadCounters()
+    for batch in batched(user_ids, _get_batch_size()):
+        try:
+            counts = count_unread(conn=conn, user_ids=batch)
+        except Exception as exc:
+            conn.rollback()
+            raise exc
+        finally:
+            conn.close()
+
+        counters.replace(counts)
+
+    return len(user_ids)
+
+
+@with_db_q_connection
+def prune_expired_posts(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+) -> dict:
+    """deletes posts past their feed's retention and their links, one
+    transaction per batch so that the tables are never locked for long
+    """
+    config: RetentionConfig = _get_retention_config()
+    q = select(
+        FeedModel.id, FeedModel.retention_days, FeedModel.retention_max_posts
+    ).order_by(FeedModel.id)
+
+    try:
+        feeds = conn.exec(q).all()
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+
+    archive: PostArchive | None = None
+    if config.archive_dir != "":
+        archive = PostArchive(config.archive_dir)
+
+    counters: UnreadCounters = UnreadCounters()
+    pruned = 0
+    pruned_feed_ids: set[int] = set()
+    dropped: list[str] = []
+    try:
+        # whole link partitions are dropped first, the batches below then
+        # only have posts and the links of recent partitions left to delete
+        cutoff = get_partition_cutoff(config, [feed[1] for feed in feeds])
+        if cutoff is not None:
+            try:
+                dropped = drop_expired_partitions(
+                    conn=conn,
+                    cutoff=cutoff,
+                    archive=archive,
+                    batch_size=config.batch_size,
+                )
+            except Exception as exc:
+                conn.rollback()
+                raise exc
+            finally:
+                conn.close()
+
+        for feed_id, retention_days, retention_max_posts in feeds:
+            max_age_days, max_posts = get_retention_limits(
+                config, retention_days, retention_max_posts
+            )
+            if max_age_days == 0 and max_posts == 0:
+                continue
+
+            while True:
+                try:
+                    post_ids = find_expired_posts(
+                        conn=conn,
+                        feed_id=feed_id,
+                        max_age_days=max_age_days,
+                        max_posts=max_posts,
+                        limit=config.batch_size,
+                    )
+                    unread = delete_posts(conn=conn, post_ids=post_ids, archive=archive)
+                except Exception as exc:
+                    conn.rollback()
+                    raise exc
+                else:
+                    conn.commit()
+                finally:
+                    conn.close()
+
+                counters.incr_many(unread)
+                pruned += len(post_ids)
+                if len(post_ids) != 0:
+                    pruned_feed_ids.add(feed_id)
+
+                if len(post_ids) < config.batch_size:
+                    break
+
+    finally:
+        if archive is not None:
+            archive.close()
+
+    # unread links of dropped partitions were not counted, recount them.
+    # dropped partitions may have held links of any feed
+    if len(dropped) != 0:
+        mq.enqueue(
+            _UNREAD_RECONCILE_JOB_FUNC,
+            job_timeout=_get_sync_config().job_timeout,
+            result_ttl=(10 * 60),
+        )
+        pruned_feed_ids = {feed[0] for feed in feeds}
+
+    ResponseCache().invalidate(
+        *[feed_posts_scope(feed_id) for feed_id in pruned_feed_ids]
+    )
+
+    return {
+        "pruned": pruned,
+        "dropped": dropped,
+        "archive": archive.path if archive else None,
+    }
+
+
+@with_db_q_connection
+def create_link_partitions(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+) -> list[str]:
+    """creates the link partitions of the current and coming months"""
+    config: PartitionConfig = Parser().get_config().partition_config
+    this_month = month_start(datetime.now())
+
+    try:
+        created = create_partitions(
+            conn=conn,
+            table=LINK_TABLE,
+            start=this_month,
+            end=add_months(this_month, config.months_ahead),
+        )
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+    else:
+        conn.commit()
+    finally:
+        conn.close()
+
+    return created
+
+
+@with_db_q_connection
+def restore_archived_posts(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+    path: str,
+) -> dict:
+    """puts the posts and links of an archive written by
+    prune_expired_posts back, enqueue it with the archive's path
+    """
+    try:
+        restored = restore_archive(
+            conn=conn, path=path, batch_size=_get_retention_config().batch_size
+        )
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+    finally:
+        conn.close()
+
+    # restored links come back unread as they were, recount them
+    mq.enqueue(
+        _UNREAD_RECONCILE_JOB_FUNC,
+        job_timeout=_get_sync_config().job_timeout,
+        result_ttl=(10 * 60),
+    )
+
+    return restored
+
+
 @with_db_q_connection
 def requeue_all_jobs(
     conn: Session,
@@ -184,57 +517,184 @@ def scheduled_sync(
     scheduler: Scheduler,
     url: str,
     feed_id: int,
-    latest_item_published: datetime,
+    latest_item_published: datetime | None = None,
 ) -> bool:
+    # latest_item_published is only accepted for jobs scheduled before
+    # posts were de-duplicated by guid, it is no longer used
+
+    feed = _get_feed(conn=conn, feed_id=feed_id)
+    result = fetch_feed(
+        url,
+        etag=feed.etag,
+        last_modified=feed.last_modified,
+        content_hash=feed.content_hash,
+        max_body_size=Parser().get_config().fetch_config.max_body_size,
+        throttle=HostThrottle(),
+    )
 
-    posts_in_feed, _ = _parse_feed_and_last_published_date(url)
-    filtered_posts = [
-        post
-        for post in posts_in_feed
-        if datetime(*post.get("published_parsed")[:6]) > latest_item_published
-    ]
+    # nothing changed since the last sync, skip parsing and only move
+    # the feed's next due time
+    if result.not_modified:
+        poll_interval = _update_feed_last_successful_sync(
+            conn=conn, feed_id=feed_id, result=result
+        )
 
-    posts: list[PostModel] = []
-    for item in filtered_posts:
-        # published as time struct
-        p_ts = item.get("published_parsed")
-        published = datetime(*p_ts[:6])
-
-        post = PostModel(
-            uuid=uuid.uuid4(),
-            url=item.get("link"),
-            title=item.get("title"),
-            published_at=published,
-            feed_id=feed_id,
+    else:
+        # a single feed is parsed inline, rq already runs the job in its
+        # own work horse process and a parse pool would only add its start
+        # up. the pool pays off in scheduled_bulk_sync, parsing many feeds
+        poll_interval = _sync_feed_from_result(
+            conn=conn, feed_id=feed_id, result=result
         )
-        posts.append(post)
+
+    _apply_poll_interval_to_job(scheduler=scheduler, poll_interval=poll_interval)
+
+    return True
+
+
+@with_db_q_connection
+def scheduled_bulk_sync(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+    feed_ids: list[int],
+) -> dict:
+    """syncs many feeds in one job, downloading them concurrently"""
 
     q = (
-        select(UserFeedPostLink.user_id)
-        .distinct(UserFeedPostLink.user_id)
-        .where(UserFeedPostLink.feed_id == feed_id)
+        select(FeedModel)
+        .where(FeedModel.id.in_(feed_ids))
+        .where(FeedModel.is_active == True)
     )
 
     try:
-        user_ids = conn.exec(q).all()
+        feeds: list[FeedModel] = conn.exec(q).all()
     except Exception as exc:
         conn.rollback()
-        raise exc.with_traceback()
-
-    if len(user_ids) != 0:
-        for user_id in user_ids:
-            _create_posts_add_links(
-                conn=conn,
-                posts=posts,
-                user_id=user_id,
-                feed_id=feed_id,
-                only_link=False,
+        raise exc
+
+    requests = [
+        FetchRequest(
+            feed_id=feed.id,
+            url=feed.url,
+            etag=feed.etag,
+            last_modified=feed.last_modified,
+            content_hash=feed.content_hash,
+        )
+        for feed in feeds
+    ]
+
+    # fetch stage, every download in the shard runs concurrently
+    config: Config = Parser().get_config()
+    results = fetch_feeds_bulk(requests, config.fetch_config, throttle=HostThrottle())
+
+    synced: list[int] = []
+    failed: dict[int, str] = {}
+    changed: list[FetchResult] = []
+    for result in results:
+        if result.has_failed():
+            failed[result.feed_id] = repr(result.error)
+            _record_feed_sync_failure(
+                conn=conn, feed_id=result.feed_id, error=result.error
             )
+            continue
 
-    # update last successful sync date
-    _update_feed_last_successful_sync(conn=conn, feed_id=feed_id)
+        if not result.not_modified and not result.is_gone():
+            changed.append(result)
+            continue
 
-    return True
+        # nothing changed since the last sync or nothing left to sync,
+        # skip parsing
+        try:
+            if result.is_gone():
+                _sync_feed_from_result(conn=conn, feed_id=result.feed_id, result=result)
+
+            else:
+                _update_feed_last_successful_sync(
+                    conn=conn, feed_id=result.feed_id, result=result
+                )
+
+        except Exception as exc:
+            conn.rollback()
+            failed[result.feed_id] = repr(exc)
+            _record_feed_sync_failure(conn=conn, feed_id=result.feed_id, error=exc)
+            continue
+
+        synced.append(result.feed_id)
+
+    # parse and persist stages, feeds are parsed in worker processes and
+    # persisted here as soon as each one is parsed
+    if len(changed) != 0:
+        with get_parse_pool(
+            workers=config.sync_config.parse_workers, pending=len(changed)
+        ) as pool:
+            futures: dict[Future, FetchResult] = {
+                pool.submit(parse_feed, result.content, result.headers): result
+                for result in changed
+            }
+
+            # raw bodies are no longer needed once they are handed over
+            for result in changed:
+                result.content = b""
+
+            for future in as_completed(futures):
+                result = futures[future]
+
+                try:
+                    entries, ttl = future.result()
+                    _persist_feed_entries(
+                        conn=conn,
+                        feed_id=result.feed_id,
+                        result=result,
+                        entries=entries,
+                        ttl=ttl,
+                    )
+
+                except Exception as exc:
+                    conn.rollback()
+                    failed[result.feed_id] = repr(exc)
+                    _record_feed_sync_failure(
+                        conn=conn, feed_id=result.feed_id, error=exc
+                    )
+                    continue
+
+                synced.append(result.feed_id)
+
+    if _get_sync_config().mode == _SYNC_MODE_DUE_QUEUE:
+        _reschedule_due_feeds(conn=conn, feed_ids=feed_ids)
+
+    return {"synced": synced, "failed": failed}
+
+
+@with_db_q_connection
+def dispatch_due_feeds(
+    conn: Session,
+    cache: Cache,
+    mq: Queue,
+    scheduler: Scheduler,
+) -> list[list[int]]:
+    """claims feeds that are due and enqueues them in shards"""
+    sync_config: SyncConfig = _get_sync_config()
+    limit = sync_config.shard_size * sync_config.shards_per_tick
+
+    if sync_config.mode == _SYNC_MODE_DUE_QUEUE:
+        feed_ids = DueQueue().claim(limit=limit, lease=sync_config.job_timeout)
+    else:
+        feed_ids = _claim_due_feeds(
+            conn=conn, limit=limit, lease=sync_config.job_timeout
+        )
+
+    shards = list(batched(feed_ids, sync_config.shard_size))
+    for shard in shards:
+        mq.enqueue(
+            _BULK_SYNC_JOB_FUNC,
+            shard,
+            job_timeout=sync_config.job_timeout,
+            result_ttl=(10 * 60),  # in seconds ~ 10 mins
+        )
+
+    return shards
 
 
 @with_db_q_connection
@@ -249,72 +709,72 @@ def parse(
     should_parse: bool,
 ) -> bool:
 
-    posts: list[PostModel] = []
-    only_link: bool = False
-    latest_item_published: datetime = None
+    post_rows: list[dict] = []
+    post_ids: list[int] = []
+    result: FetchResult | None = None
+    ttl: int | None = None
 
     if should_parse:
-        fd, latest_item_published = _parse_feed_and_last_published_date(url)
-        for item in fd:
-            # published as time struct
-            p_ts = item.get("published_parsed")
-            published = datetime(*p_ts[:6])
-
-            post = PostModel(
-                uuid=uuid.uuid4(),
-                url=item.get("link"),
-                title=item.get("title"),
-                published_at=published,
+        result = fetch_feed(
+            url, max_body_size=Parser().get_config().fetch_config.max_body_size
+        )
+        entries, ttl = _parse_feed_entries(result)
+        post_rows = _build_post_rows(entries=entries, feed_id=feed_id)
+        post_rows = _drop_expired_post_rows(
+            conn=conn, feed_id=feed_id, post_rows=post_rows
+        )
+
+        # schedule the job, in batch mode the dispatcher picks the feed
+        # up once it is due
+        mode = _get_sync_config().mode
+        first_run_time = datetime.now(tz=timezone.utc) + timedelta(seconds=5)
+        if mode == _SYNC_MODE_PER_FEED:
+            _ = _schedule_feed_sync(
+                scheduler=scheduler,
                 feed_id=feed_id,
+                url=url,
+                interval=_get_poll_config().default_interval,
+                scheduled_time=first_run_time,
             )
-            posts.append(post)
 
-        # schedule the job
-        first_run_time = datetime.now(tz=timezone.utc) + timedelta(seconds=5)
-        _ = scheduler.schedule(
-            scheduled_time=first_run_time,
-            description="synchronizes feed in scheduled fashion for {feed_url}".format(
-                feed_url=url
-            ),
-            func="rss_reader.utils.feed_parser.scheduled_sync",
-            interval=(5 * 60),  # in seconds ~ 5 mins
-            queue_name="rss_reader.feeds.sync",
-            kwargs={
-                "url": url,
-                "feed_id": feed_id,
-                "latest_item_published": latest_item_published,
-            },
-            result_ttl=(10 * 60),  # in seconds ~ 10 mins
-            on_success="rss_reader.utils.feed_parser.scheduled_sync_success_handler",
-            on_failure="rss_reader.utils.feed_parser.scheduled_sync_failure_handler",
-        )
+        elif mode == _SYNC_MODE_DUE_QUEUE:
+            DueQueue().schedule(feed_id=feed_id, due_at=first_run_time)
 
-    # feed and posts exists; collect and create link
-    else:
-        only_link = True
-        q = select(PostModel).join(FeedModel).where(PostModel.feed_id == feed_id)
+    # feed and posts exists; collect and create link, subscriptions do
+    # not need the post ids
+    elif get_read_state_mode() != READ_STATE_SUBSCRIPTIONS:
+        q = select(PostModel.id).where(PostModel.feed_id == feed_id)
 
         try:
-            posts = conn.exec(q).all()
+            post_ids = conn.exec(q).all()
         except Exception:
             conn.rollback()
 
-        sorted_posts = sorted(posts, key=lambda p: p.published_at, reverse=True)
-        latest_item_published = (
-            datetime.now() if len(sorted_posts) == 0 else sorted_posts[0].published_at
+    if get_read_state_mode() == READ_STATE_SUBSCRIPTIONS:
+        _create_posts_add_subscription(
+            conn=conn, post_rows=post_rows, user_id=user_id, feed_id=feed_id
         )
 
-    _create_posts_add_links(
+    else:
+        _create_posts_add_links(
+            conn=conn,
+            post_rows=post_rows,
+            post_ids=post_ids,
+            user_id=user_id,
+            feed_id=feed_id,
+        )
+
+    ResponseCache().invalidate(user_feed_scope(user_id, feed_id))
+
+    # update last successful sync date
+    _update_feed_last_successful_sync(
         conn=conn,
-        posts=posts,
-        user_id=user_id,
         feed_id=feed_id,
-        only_link=only_link,
+        result=result,
+        has_new_posts=len(post_rows) != 0,
+        ttl=ttl,
     )
 
-    # update last successful sync date
-    _update_feed_last_successful_sync(conn=conn, feed_id=feed_id)
-
     return True
 
 
@@ -326,7 +786,22 @@ def _requeue_feeds(
     scheduler: Scheduler,
     feed_id: int | None,
 ):
-    q = select(FeedModel.id, FeedModel.url).where(FeedModel.is_active == True)
+    # in batch mode there are no per feed jobs, make the feeds due so
+    # that the next dispatcher tick syncs them
+    mode = _get_sync_config().mode
+    if mode != _SYNC_MODE_PER_FEED:
+        _mark_feeds_due(conn=conn, feed_id=feed_id)
+        if mode == _SYNC_MODE_DUE_QUEUE:
+            _reschedule_due_feeds(conn=conn, feed_ids=None)
+
+        if feed_id is None:
+            _schedule_dispatcher(scheduler=scheduler)
+
+        return
+
+    q = select(FeedModel.id, FeedModel.url, FeedModel.poll_interval).where(
+        FeedModel.is_active == True
+    )
 
     if feed_id is not None:
         q = q.where(FeedModel.id == feed_id)
@@ -341,29 +816,537 @@ def _requeue_feeds(
         for feed in feeds:
             # schedule the job
             first_run_time = datetime.now(tz=timezone.utc)
-            _ = scheduler.schedule(
+            _ = _schedule_feed_sync(
+                scheduler=scheduler,
+                feed_id=feed.id,
+                url=feed.url,
+                interval=feed.poll_interval or _get_poll_config().default_interval,
                 scheduled_time=first_run_time,
-                description="synchronizes feed in scheduled fashion for {feed_url}".format(
-                    feed_url=feed.url
-                ),
-                func="rss_reader.utils.feed_parser.scheduled_sync",
-                interval=(5 * 60),  # in seconds ~ 5 mins
-                queue_name="rss_reader.feeds.sync",
-                kwargs={
-                    "url": feed.url,
-                    "feed_id": feed.id,
-                    "latest_item_published": datetime.now(),
-                },
-                result_ttl=(10 * 60),  # in seconds ~ 10 mins
-                on_success="rss_reader.utils.feed_parser.scheduled_sync_success_handler",
-                on_failure="rss_reader.utils.feed_parser.scheduled_sync_failure_handler",
             )
 
     finally:
         conn.close()
 
 
-def _update_feed_last_successful_sync(conn: Session, feed_id: int):
+def _sync_job_id(feed_id: int) -> str:
+    return "{prefix}{feed_id}".format(prefix=_SYNC_JOB_ID_PREFIX, feed_id=feed_id)
+
+
+def _feed_id_from_sync_job_id(job_id: str) -> int | None:
+    if not job_id.startswith(_SYNC_JOB_ID_PREFIX):
+        return None
+
+    try:
+        return int(job_id[len(_SYNC_JOB_ID_PREFIX) :])
+    except ValueError:
+        return None
+
+
+def _schedule_feed_sync(
+    scheduler: Scheduler,
+    feed_id: int,
+    url: str,
+    interval: int,
+    scheduled_time: datetime,
+    pipeline: Pipeline | None = None,
+) -> Job:
+    # same as scheduler.schedule(), but the job id is derived from the
+    # feed so re-scheduling replaces the job instead of duplicating it,
+    # and the writes can go through a pipeline
+    job = Job.create(
+        _SYNC_JOB_FUNC,
+        kwargs={"url": url, "feed_id": feed_id},
+        connection=scheduler.connection,
+        id=_sync_job_id(feed_id),
+        description="synchronizes feed in scheduled fashion for {feed_url}".format(
+            feed_url=url
+        ),
+        origin="rss_reader.feeds.sync",
+        meta={"interval": interval},
+        result_ttl=(10 * 60),  # in seconds ~ 10 mins
+        on_success="rss_reader.utils.feed_parser.scheduled_sync_success_handler",
+        on_failure="rss_reader.utils.feed_parser.scheduled_sync_failure_handler",
+    )
+
+    conn = pipeline if pipeline is not None else scheduler.connection
+    job.save(pipeline=pipeline)
+    conn.zadd(scheduler.scheduled_jobs_key, {job.id: to_unix(scheduled_time)})
+
+    return job
+
+
+def _reconcile_feed_jobs(conn: Session, scheduler: Scheduler) -> dict:
+    q = select(
+        FeedModel.id,
+        FeedModel.url,
+        FeedModel.poll_interval,
+        FeedModel.next_sync_at,
+        FeedModel.sync_failures,
+    ).where(FeedModel.is_active == True)
+
+    try:
+        feeds = conn.exec(q).all()
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+    finally:
+        conn.close()
+
+    mode = _get_sync_config().mode
+    redis_conn: Redis = scheduler.connection
+    cache: Cache = Cache()
+
+    # in batch mode feeds are synced by the dispatcher, all per feed jobs
+    # are stale
+    active = {}
+    if mode == _SYNC_MODE_PER_FEED:
+        active = {feed.id: feed for feed in feeds}
+
+    # diff on job ids alone, they are derived from the feed id
+    scheduled_feed_ids: set[int] = set()
+    stale_job_ids: list[str] = []
+    unknown_job_ids: list[str] = []
+    for raw_job_id in redis_conn.zrange(scheduler.scheduled_jobs_key, 0, -1):
+        job_id = raw_job_id.decode("utf-8")
+        feed_id = _feed_id_from_sync_job_id(job_id)
+
+        if feed_id is None:
+            unknown_job_ids.append(job_id)
+        elif feed_id in active:
+            scheduled_feed_ids.add(feed_id)
+        else:
+            stale_job_ids.append(job_id)
+
+    # sync jobs scheduled before job ids were derived from the feed are
+    # replaced; jobs that are not feed syncs are left alone
+    unknown_jobs = Job.fetch_many(unknown_job_ids, connection=redis_conn)
+    for job_id, job in zip(unknown_job_ids, unknown_jobs):
+        if job is None or job.func_name == _SYNC_JOB_FUNC:
+            stale_job_ids.append(job_id)
+
+    missing = [
+        feed for feed_id, feed in active.items() if feed_id not in scheduled_feed_ids
+    ]
+
+    batch_size = _get_batch_size()
+    for batch in batched(stale_job_ids, batch_size):
+        with cache.pipeline(transaction=True) as pipe:
+            pipe.zrem(scheduler.scheduled_jobs_key, *batch)
+            cache.delete_many([Job.key_for(job_id) for job_id in batch], pipe)
+
+    first_run_time = datetime.now(tz=timezone.utc)
+    for batch in batched(missing, batch_size):
+        with cache.pipeline(transaction=True) as pipe:
+            for feed in batch:
+                _schedule_feed_sync(
+                    scheduler=scheduler,
+                    feed_id=feed.id,
+                    url=feed.url,
+                    interval=feed.poll_interval or _get_poll_config().default_interval,
+                    scheduled_time=first_run_time,
+                    pipeline=pipe,
+                )
+
+    if mode == _SYNC_MODE_PER_FEED:
+        scheduler.cancel(_DISPATCH_JOB_ID)
+    elif _DISPATCH_JOB_ID not in scheduler:
+        _schedule_dispatcher(scheduler=scheduler)
+
+    # only the due_queue mode keeps feeds in the sorted set
+    due_feeds = feeds if mode == _SYNC_MODE_DUE_QUEUE else []
+    due_added, due_removed = _reconcile_due_queue(feeds=due_feeds)
+
+    return {
+        "added": len(missing) + due_added,
+        "removed": len(stale_job_ids) + due_removed,
+    }
+
+
+def _reconcile_due_queue(feeds: list) -> tuple[int, int]:
+    due_queue: DueQueue = DueQueue()
+    now = datetime.now()
+
+    # feeds that used up every retry stay out of the queue, the same as
+    # their cancelled per feed jobs
+    active = {
+        feed.id: feed
+        for feed in feeds
+        if feed.sync_failures <= len(_SYNC_BACKOFF_INTERVALS)
+    }
+
+    queued = due_queue.feed_ids()
+    stale = [feed_id for feed_id in queued if feed_id not in active]
+    missing = {
+        feed.id: feed.next_sync_at or now
+        for feed_id, feed in active.items()
+        if feed_id not in queued
+    }
+
+    with Cache().pipeline() as pipe:
+        due_queue.remove(stale, pipeline=pipe)
+        due_queue.schedule_many(missing, pipeline=pipe)
+
+    return len(missing), len(stale)
+
+
+def _reschedule_due_feeds(conn: Session, feed_ids: list[int] | None):
+    q = select(
+        FeedModel.id,
+        FeedModel.is_active,
+        FeedModel.next_sync_at,
+        FeedModel.sync_failures,
+    )
+
+    if feed_ids is not None:
+        q = q.where(FeedModel.id.in_(feed_ids))
+    else:
+        q = q.where(FeedModel.is_active == True)
+
+    try:
+        feeds = conn.exec(q).all()
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+    finally:
+        conn.close()
+
+    # the feeds table holds the next due time after a sync, mirror it in
+    # the queue and drop feeds that are gone, inactive or out of retries
+    due: dict[int, datetime] = {}
+    for feed in feeds:
+        if (
+            feed.is_active
+            and feed.next_sync_at is not None
+            and feed.sync_failures <= len(_SYNC_BACKOFF_INTERVALS)
+        ):
+            due[feed.id] = feed.next_sync_at
+
+    due_queue: DueQueue = DueQueue()
+    with Cache().pipeline() as pipe:
+        if feed_ids is not None:
+            due_queue.remove(
+                [feed_id for feed_id in feed_ids if feed_id not in due], pipeline=pipe
+            )
+
+        for batch in batched(list(due.items()), _get_batch_size()):
+            due_queue.schedule_many(dict(batch), pipeline=pipe)
+
+
+def _schedule_unread_reconciliation(scheduler: Scheduler):
+    if _UNREAD_RECONCILE_JOB_ID in scheduler:
+        return
+
+    counters_config: CountersConfig = Parser().get_config().counters_config
+    scheduler.schedule(
+        scheduled_time=datetime.now(tz=timezone.utc),
+        description="recounts unread posts to correct counter drift",
+        func=_UNREAD_RECONCILE_JOB_FUNC,
+        interval=counters_config.reconcile_interval,
+        queue_name="rss_reader.feeds.sync",
+        id=_UNREAD_RECONCILE_JOB_ID,
+        timeout=_get_sync_config().job_timeout,
+        result_ttl=(10 * 60),  # in seconds ~ 10 mins
+    )
+
+
+def _schedule_retention(scheduler: Scheduler):
+    config: RetentionConfig = _get_retention_config()
+    if not config.enabled:
+        scheduler.cancel(_RETENTION_JOB_ID)
+        return
+
+    if _RETENTION_JOB_ID in scheduler:
+        return
+
+    scheduler.schedule(
+        scheduled_time=datetime.now(tz=timezone.utc),
+        description="prunes posts past their retention",
+        func=_RETENTION_JOB_FUNC,
+        interval=config.interval,
+        queue_name="rss_reader.feeds.sync",
+        id=_RETENTION_JOB_ID,
+        timeout=_get_sync_config().job_timeout,
+        result_ttl=(10 * 60),  # in seconds ~ 10 mins
+    )
+
+
+def _schedule_partition_maintenance(conn: Session, scheduler: Scheduler):
+    try:
+        partitioned = is_partitioned(conn=conn, table=LINK_TABLE)
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+    finally:
+        conn.close()
+
+    if not partitioned:
+        scheduler.cancel(_PARTITION_JOB_ID)
+        return
+
+    if _PARTITION_JOB_ID in scheduler:
+        return
+
+    scheduler.schedule(
+        scheduled_time=datetime.now(tz=timezone.utc),
+        description="creates link partitions of the coming months",
+        func=_PARTITION_JOB_FUNC,
+        interval=Parser().get_config().partition_config.interval,
+        queue_name="rss_reader.feeds.sync",
+        id=_PARTITION_JOB_ID,
+        timeout=_get_sync_config().job_timeout,
+        result_ttl=(10 * 60),  # in seconds ~ 10 mins
+    )
+
+
+def _schedule_dispatcher(scheduler: Scheduler) -> Job:
+    return scheduler.schedule(
+        scheduled_time=datetime.now(tz=timezone.utc),
+        description="claims due feeds and syncs them in batches",
+        func=_DISPATCH_JOB_FUNC,
+        interval=_get_sync_config().dispatch_interval,
+        queue_name="rss_reader.feeds.sync",
+        id=_DISPATCH_JOB_ID,
+        result_ttl=(10 * 60),  # in seconds ~ 10 mins
+    )
+
+
+def _claim_due_feeds(conn: Session, limit: int, lease: int) -> list[int]:
+    now = datetime.now()
+
+    # feeds that were never synced are due right away, feeds that used up
+    # every retry are left alone like cancelled jobs in per feed mode
+    q = (
+        select(FeedModel.id)
+        .where(FeedModel.is_active == True)
+        .where(FeedModel.sync_failures <= len(_SYNC_BACKOFF_INTERVALS))
+        .where(or_(FeedModel.next_sync_at == None, FeedModel.next_sync_at <= now))
+        .order_by(FeedModel.next_sync_at.asc().nulls_first())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+    try:
+        feed_ids = list(conn.exec(q).all())
+
+        # push the due time past the job timeout so that the next tick
+        # does not claim the same feeds while they are being synced
+        if len(feed_ids) != 0:
+            conn.exec(
+                update(FeedModel)
+                .where(FeedModel.id.in_(feed_ids))
+                .values(next_sync_at=now + timedelta(seconds=lease))
+            )
+
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+
+    else:
+        conn.commit()
+
+    finally:
+        conn.close()
+
+    return feed_ids
+
+
+def _mark_feeds_due(conn: Session, feed_id: int | None):
+    q = (
+        update(FeedModel)
+        .where(FeedModel.is_active == True)
+        .values(next_sync_at=datetime.now(), sync_failures=0)
+    )
+
+    if feed_id is not None:
+        q = q.where(FeedModel.id == feed_id)
+
+    try:
+        conn.exec(q)
+
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+
+    else:
+        conn.commit()
+
+    finally:
+        conn.close()
+
+
+def _get_retry_delay(backoff: int, error: Exception | None) -> int:
+    # a rate limited origin told us how long to stay away, never retry
+    # earlier than that
+    if isinstance(error, FeedRateLimited) and error.retry_after is not None:
+        return max(backoff, error.retry_after)
+
+    return backoff
+
+
+def _record_feed_sync_failure(
+    conn: Session,
+    feed_id: int,
+    error: Exception | None = None,
+):
+    q = select(FeedModel).where(FeedModel.id == feed_id)
+
+    try:
+        f = conn.exec(q).one()
+
+        # same backoff as scheduled_sync_failure_handler, once every
+        # retry is used up the feed is no longer claimed
+        f.has_sync_failed = True
+        f.sync_failures += 1
+        if f.sync_failures <= len(_SYNC_BACKOFF_INTERVALS):
+            backoff = _SYNC_BACKOFF_INTERVALS[f.sync_failures - 1]
+            f.next_sync_at = datetime.now() + timedelta(
+                seconds=_get_retry_delay(backoff, error)
+            )
+
+        conn.add(f)
+
+    except Exception:
+        conn.rollback()
+
+    else:
+        conn.commit()
+        ResponseCache().invalidate(feed_scope(feed_id))
+
+    finally:
+        conn.close()
+
+
+def _sync_feed_from_result(
+    conn: Session,
+    feed_id: int,
+    result: FetchResult,
+) -> int:
+    entries, ttl = _parse_feed_entries(result)
+
+    # only the slim entries are kept past parsing
+    result.content = b""
+
+    return _persist_feed_entries(
+        conn=conn, feed_id=feed_id, result=result, entries=entries, ttl=ttl
+    )
+
+
+def _persist_feed_entries(
+    conn: Session,
+    feed_id: int,
+    result: FetchResult,
+    entries: list[dict],
+    ttl: int | None,
+) -> int:
+    # every entry is offered to the db, the unique (feed_id, guid) key
+    # drops the ones that were ingested on an earlier sync
+    post_rows = _build_post_rows(entries=entries, feed_id=feed_id)
+    post_rows = _drop_expired_post_rows(conn=conn, feed_id=feed_id, post_rows=post_rows)
+    new_posts = _create_posts_fan_out_links(
+        conn=conn, post_rows=post_rows, feed_id=feed_id
+    )
+
+    # update last successful sync date
+    return _update_feed_last_successful_sync(
+        conn=conn,
+        feed_id=feed_id,
+        result=result,
+        has_new_posts=new_posts != 0,
+        ttl=ttl,
+    )
+
+
+def _get_poll_config() -> PollConfig:
+    return Parser().get_config().poll_config
+
+
+def _get_sync_config() -> SyncConfig:
+    return Parser().get_config().sync_config
+
+
+def _get_retention_config() -> RetentionConfig:
+    return Parser().get_config().retention_config
+
+
+def _drop_expired_post_rows(
+    conn: Session,
+    feed_id: int,
+    post_rows: list[dict],
+) -> list[dict]:
+    config: RetentionConfig = _get_retention_config()
+    if not config.enabled or len(post_rows) == 0:
+        return post_rows
+
+    q = select(FeedModel.retention_days).where(FeedModel.id == feed_id)
+
+    try:
+        retention_days = conn.exec(q).first()
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+
+    max_age_days, _ = get_retention_limits(config, retention_days, None)
+    return drop_expired_rows(post_rows, max_age_days)
+
+
+def _apply_poll_interval_to_job(scheduler: Scheduler, poll_interval: int | None):
+    job = get_current_job()
+    if job is None or poll_interval is None or "interval" not in job.meta:
+        return
+
+    # rq-scheduler reads the interval from job meta every time it
+    # re-schedules the job, so storing it here adapts all later runs
+    job.meta["interval"] = poll_interval
+    job.save_meta()
+
+    # the job was already re-scheduled with the old interval when it was
+    # enqueued, move that run to the new due time as well
+    try:
+        scheduler.change_execution_time(
+            job, datetime.now(tz=timezone.utc) + timedelta(seconds=poll_interval)
+        )
+    except ValueError:
+        # job is not in the scheduled set, e.g. it was cancelled meanwhile
+        pass
+
+
+def _get_recent_published_at(conn: Session, feed_id: int) -> list[datetime]:
+    q = (
+        select(PostModel.published_at)
+        .where(PostModel.feed_id == feed_id)
+        .order_by(PostModel.published_at.desc())
+        .limit(PUBLISH_HISTORY_SIZE)
+    )
+
+    try:
+        published_at = conn.exec(q).all()
+    except Exception:
+        conn.rollback()
+        return []
+
+    return list(published_at)
+
+
+def _get_feed(conn: Session, feed_id: int) -> FeedModel:
+    q = select(FeedModel).where(FeedModel.id == feed_id)
+
+    try:
+        f = conn.exec(q).one()
+
+    except Exception as exc:
+        conn.rollback()
+        raise exc
+
+    return f
+
+
+def _update_feed_last_successful_sync(
+    conn: Session,
+    feed_id: int,
+    result: FetchResult | None = None,
+    has_new_posts: bool = False,
+    ttl: int | None = None,
+) -> int | None:
     q = select(FeedModel).where(FeedModel.id == feed_id)
 
     try:
@@ -374,6 +1357,28 @@ def _update_feed_last_successful_sync(conn: Session, feed_id: int):
 
     # update last successful sync for the feed
     f.last_successful_sync = datetime.now()
+    f.has_sync_failed = False
+    f.sync_failures = 0
+
+    # remember validators so the next sync can be a conditional request
+    if result is not None:
+        f.etag = result.etag
+        f.last_modified = result.last_modified
+        f.content_hash = result.content_hash
+
+        # adapt the polling interval to the fetch outcome and the
+        # feed's publish rate, and store when it is due next
+        f.poll_interval = compute_poll_interval(
+            config=_get_poll_config(),
+            current_interval=f.poll_interval,
+            published_at=_get_recent_published_at(conn=conn, feed_id=feed_id),
+            has_new_posts=has_new_posts,
+            ttl=ttl,
+            max_age=parse_max_age(result.headers),
+        )
+        f.next_sync_at = f.last_successful_sync + timedelta(seconds=f.poll_interval)
+
+    poll_interval = f.poll_interval
 
     try:
         conn.add(f)
@@ -381,82 +1386,231 @@ def _update_feed_last_successful_sync(conn: Session, feed_id: int):
     except Exception as exc:
         conn.rollback()
 
+    else:
+        conn.commit()
+
+        # new posts change every listing of the feed
+        scopes = [feed_scope(feed_id)]
+        if has_new_posts:
+            scopes.append(feed_posts_scope(feed_id))
+        ResponseCache().invalidate(*scopes)
+
     finally:
         conn.close()
 
+    return poll_interval
 
-def _parse_feed_and_last_published_date(url) -> tuple[FeedParserDict, datetime]:
-    f = feedparser.parse(url)
 
-    # check for exceptions in the feed and return early
-    if f.get("status") != status.HTTP_200_OK and f.get("bozo"):
+def _parse_feed_entries(result: FetchResult) -> tuple[list[dict], int | None]:
+    # feed is permanently gone or discontinued, nothing to parse
+    if result.is_gone():
+        return ([], None)
 
-        # check if feed is permanently moved to different URL or
-        if f.get("status") == status.HTTP_301_MOVED_PERMANENTLY:
-            pass
+    return parse_feed(result.content, result.headers)
 
-        # or check if feed is permanently gone or discontinued
-        elif f.get("status") == status.HTTP_410_GONE:
-            pass
 
-        # handle everything else here, wrong url, server exception
+def _build_post_rows(entries: list[dict], feed_id: int) -> list[dict]:
+    now = datetime.now()
+
+    # undated entries are stamped with the time they were first seen
+    return [
+        {
+            "uuid": str(uuid.uuid4()),
+            "guid": entry["guid"],
+            "url": entry["url"],
+            "title": entry["title"],
+            "published_at": entry["published_at"] or now,
+            "feed_id": feed_id,
+        }
+        for entry in entries
+    ]
+
+
+def _get_batch_size() -> int:
+    return _get_sync_config().batch_size
+
+
+def _create_posts_fan_out_links(
+    conn: Session,
+    post_rows: list[dict],
+    feed_id: int,
+) -> int:
+    new_posts = 0
+    subscriptions = get_read_state_mode() == READ_STATE_SUBSCRIPTIONS
+
+    # insert every new post exactly once, then link it to all the
+    # subscribers of the feed; each batch is its own transaction. with
+    # subscriptions there is nothing to link, posts are joined on read
+    for batch in batched(post_rows, _get_batch_size()):
+        try:
+            post_ids = insert_posts(conn=conn, rows=batch)
+            if subscriptions:
+                unread = _count_posts_for_subscribers(
+                    conn=conn, feed_id=feed_id, post_ids=post_ids
+                )
+            else:
+                unread = _create_links_for_subscribers(
+                    conn=conn, feed_id=feed_id, post_ids=post_ids
+                )
+
+        except Exception as exc:
+            conn.rollback()
+            raise exc
+
         else:
-            raise f.get("bozo_exception")
+            conn.commit()
+            new_posts += len(post_ids)
 
-    fd: list["FeedParserDict"] = f.get("entries")
+            # counters only move once the links are committed
+            UnreadCounters().incr_many(unread)
 
-    if len(fd) != 0:
-        # sort the feed with reverse chronological order
-        sorted_fd = sorted(fd, key=lambda i: i.get("published_parsed"), reverse=True)
+    return new_posts
 
-        parsed_published_latest = sorted_fd[0].get("published_parsed")
-        latest_item_pub_date = datetime(*parsed_published_latest[:6])
 
-        return (sorted_fd, latest_item_pub_date)
+def _create_links_for_subscribers(
+    conn: Session,
+    feed_id: int,
+    post_ids: list[int],
+) -> Counter:
+    if len(post_ids) == 0:
+        return Counter()
+
+    now = datetime.now()
+
+    # users following the feed, their subscriptions outlive the links
+    # that retention prunes
+    subscribers = (
+        select(SubscriptionModel.user_id)
+        .where(SubscriptionModel.feed_id == feed_id)
+        .subquery()
+    )
 
-    else:
-        return (fd, datetime.min)
+    # INSERT ... SELECT pairs every subscriber with every new post in a
+    # single statement, instead of one insert per (user, post)
+    q = (
+        select(
+            subscribers.c.user_id,
+            literal(feed_id),
+            PostModel.id,
+            PostModel.published_at,
+            literal(False),
+            literal(datetime.min),
+            literal(now),
+            literal(now),
+        )
+        .select_from(subscribers)
+        .join(PostModel, true())
+        .where(PostModel.id.in_(post_ids))
+    )
 
+    # every new link is an unread post for its user
+    user_ids = conn.exec(
+        insert(UserFeedPostLink)
+        .from_select(LINK_COLUMNS, q)
+        .returning(UserFeedPostLink.user_id)
+    ).scalars()
 
-def _create_posts_add_links(
+    return Counter((user_id, feed_id) for user_id in user_ids)
+
+
+def _count_posts_for_subscribers(
+    conn: Session,
+    feed_id: int,
+    post_ids: list[int],
+) -> Counter:
+    if len(post_ids) == 0:
+        return Counter()
+
+    q = select(SubscriptionModel.user_id).where(SubscriptionModel.feed_id == feed_id)
+
+    return Counter({(user_id, feed_id): len(post_ids) for user_id in conn.exec(q)})
+
+
+def _create_posts_add_subscription(
     conn: Session,
-    posts: list[PostModel],
+    post_rows: list[dict],
     user_id: int,
     feed_id: int,
-    only_link: bool,
 ):
-    for post in posts:
+    for batch in batched(post_rows, _get_batch_size()):
+        try:
+            insert_posts(conn=conn, rows=batch)
 
-        # create posts and then link
-        if not only_link:
-            try:
-                conn.add(post)
-            except Exception:
-                conn.rollback()
+        except Exception as exc:
+            conn.rollback()
+            raise exc
 
-            else:
-                conn.commit()
-                conn.refresh(post)
+        else:
+            conn.commit()
+
+    try:
+        subscribed = insert_subscriptions(conn=conn, pairs=[(user_id, feed_id)]) == 1
 
-        _create_links(conn, user_id=user_id, feed_id=feed_id, post_id=post.id)
+        # a new subscription starts with every post of the feed unread
+        unread = 0
+        if subscribed:
+            unread = conn.exec(
+                select(func.count()).where(PostModel.feed_id == feed_id)
+            ).one()
 
+    except Exception as exc:
+        conn.rollback()
+        raise exc
 
-def _create_links(
+    else:
+        conn.commit()
+        UnreadCounters().incr(user_id=user_id, feed_id=feed_id, amount=unread)
+
+
+def _create_posts_add_links(
     conn: Session,
+    post_rows: list[dict],
+    post_ids: list[int],
     user_id: int,
     feed_id: int,
-    post_id: int,
 ):
-    link = UserFeedPostLink(
-        user_id=user_id,
-        feed_id=feed_id,
-        post_id=post_id,
-    )
+    batch_size = _get_batch_size()
+    counters: UnreadCounters = UnreadCounters()
+
+    # posts already exist, only link them to the user
+    for batch in batched(post_ids, batch_size):
+        try:
+            created = insert_links(
+                conn=conn, user_ids=[user_id], feed_id=feed_id, post_ids=batch
+            )
+
+        except Exception as exc:
+            conn.rollback()
+            raise exc
+
+        else:
+            conn.commit()
+            counters.incr(user_id=user_id, feed_id=feed_id, amount=created)
 
+    # create posts and then link
+    for batch in batched(post_rows, batch_size):
+        try:
+            ids = insert_posts(conn=conn, rows=batch)
+            created = insert_links(
+                conn=conn, user_ids=[user_id], feed_id=feed_id, post_ids=ids
+            )
+
+        except Exception as exc:
+            conn.rollback()
+            raise exc
+
+        else:
+            conn.commit()
+            counters.incr(user_id=user_id, feed_id=feed_id, amount=created)
+
+    # the subscription is what sync fans new posts out to, it outlives the
+    # links that retention prunes
     try:
-        conn.add(link)
-    except Exception:
+        insert_subscriptions(conn=conn, pairs=[(user_id, feed_id)])
+
+    except Exception as exc:
         conn.rollback()
+        raise exc
 
     else:
         conn.commit()
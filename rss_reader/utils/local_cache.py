@@ -0,0 +1,83 @@
+# builtin imports
+import threading
+import time
+from collections import OrderedDict
+
+# returned by LocalCache.get for keys that are not cached, None is a
+# value that can be cached
+MISSING = object()
+
+
+class LocalCache:
+    """size bounded in process cache
+
+    entries expire ttl seconds after they were set and the least recently
+    used entry is evicted once max_entries are cached. safe to share
+    between the threads of a process
+    """
+
+    _max_entries: int
+    _ttl: float
+    _entries: OrderedDict
+    _lock: threading.Lock
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str) -> any:
+        """cached value of key, MISSING if it is not cached or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return MISSING
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return MISSING
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: any, ttl: float | None = None) -> None:
+        if self._max_entries == 0:
+            return
+
+        expires_at = time.monotonic() + (self._ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
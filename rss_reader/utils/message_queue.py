@@ -1,5 +1,9 @@
+# builtin imports
+from datetime import datetime
+
 # externa imports
 from redis import Redis
+from redis.client import Pipeline
 from rq import Queue
 from rq_scheduler import Scheduler
 
@@ -57,3 +61,69 @@ class BackgroundScheduler(metaclass=Singleton):
 
     def get_scheduler(self) -> Scheduler:
         return self._scheduler
+
+
+class DueQueue(metaclass=Singleton):
+    """feeds scored by the unix timestamp at which they are next due
+
+    idle feeds are a single sorted set member, workers only ever touch
+    the members that are due
+    """
+
+    _redis: Redis
+    _key: str = "rss_reader:feeds:due"
+
+    # moves due members forward by the lease instead of popping them, a
+    # worker that dies mid sync leaves its feeds to be claimed again once
+    # the lease runs out
+    _claim_script = """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+    for _, member in ipairs(due) do
+        redis.call('ZADD', KEYS[1], ARGV[3], member)
+    end
+    return due
+    """
+
+    def __init__(self):
+        pass
+
+    def setup(self, redis_conn: Redis) -> None:
+        self._redis = redis_conn
+        self._claim = redis_conn.register_script(self._claim_script)
+
+    def get_key(self) -> str:
+        return self._key
+
+    def schedule(self, feed_id: int, due_at: datetime) -> None:
+        self.schedule_many({feed_id: due_at})
+
+    def schedule_many(
+        self,
+        due: dict[int, datetime],
+        pipeline: Pipeline | None = None,
+    ) -> None:
+        if len(due) == 0:
+            return
+
+        conn = pipeline if pipeline is not None else self._redis
+        conn.zadd(self._key, {str(k): v.timestamp() for k, v in due.items()})
+
+    def remove(self, feed_ids: list[int], pipeline: Pipeline | None = None) -> None:
+        if len(feed_ids) == 0:
+            return
+
+        conn = pipeline if pipeline is not None else self._redis
+        conn.zrem(self._key, *[str(feed_id) for feed_id in feed_ids])
+
+    def claim(self, limit: int, lease: int) -> list[int]:
+        """atomically claims up to limit due feeds for lease seconds"""
+        now = datetime.now().timestamp()
+
+        feed_ids = self._claim(keys=[self._key], args=[now, limit, now + lease])
+        return [int(feed_id) for feed_id in feed_ids]
+
+    def feed_ids(self) -> set[int]:
+        return {int(feed_id) for feed_id in self._redis.zrange(self._key, 0, -1)}
+
+    def size(self) -> int:
+        return self._redis.zcard(self._key)
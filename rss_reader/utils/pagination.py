@@ -0,0 +1,76 @@
+# builtin imports
+import base64
+import json
+from datetime import datetime
+
+# external imports
+from sqlalchemy import ColumnElement, tuple_
+from sqlmodel.sql.expression import SelectOfScalar, Select
+
+# keyset pagination: pages are ordered newest first by (published_at, id)
+# and a cursor holds the sort key of the last row of the previous page,
+# so every page is an index range scan no matter how deep it is
+
+MAX_PAGE_SIZE = 100
+
+
+class Cursor:
+    published_at: datetime
+    id: int
+
+    def __init__(self, published_at: datetime, id: int) -> None:
+        self.published_at = published_at
+        self.id = id
+
+    def encode(self) -> str:
+        raw = json.dumps([self.published_at.isoformat(), self.id])
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @classmethod
+    def decode(cls, cursor: str) -> "Cursor":
+        """raises ValueError if cursor was not created by encode"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii"))
+            published_at, id = json.loads(raw)
+            return cls(datetime.fromisoformat(published_at), int(id))
+
+        except (TypeError, ValueError, UnicodeError) as exc:
+            raise ValueError("invalid cursor {}".format(cursor)) from exc
+
+
+def paginate(
+    query: Select | SelectOfScalar,
+    published_at: ColumnElement,
+    id: ColumnElement,
+    cursor: Cursor | None,
+    limit: int,
+) -> Select | SelectOfScalar:
+    """orders query newest first and applies the page after cursor
+
+    one row more than limit is selected, pass the rows to page() to know
+    if there is a next page
+    """
+    # a row value comparison lets the database seek straight to the
+    # cursor in an index on (..., published_at, id). the plain bound on
+    # published_at is redundant but lets postgres skip partitions newer
+    # than the cursor, it cannot prune on a row value comparison
+    if cursor is not None:
+        query = query.where(
+            tuple_(published_at, id) < tuple_(cursor.published_at, cursor.id)
+        ).where(published_at <= cursor.published_at)
+
+    return query.order_by(published_at.desc(), id.desc()).limit(limit + 1)
+
+
+def page(rows: list, limit: int, key) -> tuple[list, str | None]:
+    """trims rows selected by paginate() and returns the next cursor
+
+    key maps a row to the (published_at, id) that it was ordered by
+    """
+    if len(rows) <= limit:
+        return (rows, None)
+
+    rows = rows[:limit]
+    published_at, id = key(rows[-1])
+
+    return (rows, Cursor(published_at, id).encode())
@@ -0,0 +1,100 @@
+# builtin imports
+import re
+from datetime import datetime
+from statistics import median
+
+# internal imports
+from ..config.config import PollConfig
+
+# how much the interval moves after a fetch with / without new posts
+_NARROW_FACTOR = 0.5
+_WIDEN_FACTOR = 1.5
+
+# number of recent posts used to estimate how often a feed publishes
+PUBLISH_HISTORY_SIZE = 10
+
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*(\d+)", re.IGNORECASE)
+
+
+def compute_poll_interval(
+    config: PollConfig,
+    current_interval: int | None,
+    published_at: list[datetime],
+    has_new_posts: bool,
+    ttl: int | None = None,
+    max_age: int | None = None,
+) -> int:
+    """computes seconds to wait before the next fetch of a feed
+
+    the previous interval is narrowed when the fetch found new posts and
+    widened otherwise, then blended with the publish rate learned from
+    the most recent posts. the feed's <ttl> (minutes) and the response
+    max-age (seconds) are honored as a lower bound, and the result is
+    kept within the configured bounds
+    """
+    interval = float(current_interval or config.default_interval)
+
+    if has_new_posts:
+        interval *= _NARROW_FACTOR
+    else:
+        interval *= _WIDEN_FACTOR
+
+    # poll about twice per expected post
+    publish_gap = _median_publish_gap(published_at)
+    if publish_gap is not None:
+        interval = (interval + publish_gap / 2) / 2
+
+    floor = config.min_interval
+    if ttl:
+        floor = max(floor, ttl * 60)
+
+    if max_age:
+        floor = max(floor, max_age)
+
+    # the configured maximum always wins, so a feed is never forgotten
+    floor = min(floor, config.max_interval)
+
+    return int(min(max(interval, floor), config.max_interval))
+
+
+def parse_ttl(value: str | None) -> int | None:
+    """parses the rss <ttl> element, minutes the feed may be cached"""
+    try:
+        ttl = int(value)
+    except (TypeError, ValueError):
+        return None
+
+    return ttl if ttl > 0 else None
+
+
+def parse_max_age(headers: dict[str, str]) -> int | None:
+    """parses max-age seconds from the Cache-Control response header"""
+    cache_control = headers.get("cache-control")
+    if not cache_control:
+        return None
+
+    match = _MAX_AGE_RE.search(cache_control)
+    if match is None:
+        return None
+
+    return int(match.group(1))
+
+
+#### add helper functions here ####
+
+
+def _median_publish_gap(published_at: list[datetime]) -> float | None:
+    if len(published_at) < 2:
+        return None
+
+    ordered = sorted(published_at, reverse=True)
+    gaps = [
+        (newer - older).total_seconds()
+        for newer, older in zip(ordered, ordered[1:])
+        if newer > older
+    ]
+
+    if len(gaps) == 0:
+        return None
+
+    return median(gaps)
@@ -0,0 +1,148 @@
+# builtin imports
+from bisect import insort
+from datetime import datetime
+
+# external imports
+from sqlalchemy import ColumnElement, and_, func, or_, true
+from sqlmodel import Session, select
+
+# internal imports
+from ..config.config import Config
+from ..database.models import (
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+)
+from .unread_counters import count_unread_links
+
+# read_state.mode values. links stores a row per (user, feed, post),
+# subscriptions stores a row per (user, feed) with a read watermark and
+# read / unread exceptions, posts are joined in when reading
+READ_STATE_LINKS = "links"
+READ_STATE_SUBSCRIPTIONS = "subscriptions"
+
+
+def get_read_state_mode() -> str:
+    return Config().read_state_config.mode
+
+
+def unread_clause(sub: SubscriptionModel) -> ColumnElement:
+    """condition matching posts that are unread for the subscription"""
+    after = true()
+    if sub.read_until is not None:
+        after = PostModel.published_at > sub.read_until
+
+    unread = and_(after, PostModel.id.not_in(sub.read_post_ids))
+    if len(sub.unread_post_ids) != 0:
+        unread = or_(unread, PostModel.id.in_(sub.unread_post_ids))
+
+    return and_(PostModel.feed_id == sub.feed_id, unread)
+
+
+def is_read(sub: SubscriptionModel, post_id: int, published_at: datetime) -> bool:
+    if post_id in sub.read_post_ids:
+        return True
+
+    if post_id in sub.unread_post_ids:
+        return False
+
+    return sub.read_until is not None and published_at <= sub.read_until
+
+
+def mark_post(
+    sub: SubscriptionModel,
+    post_id: int,
+    published_at: datetime,
+    read: bool,
+):
+    """records an explicit read or unread of a post"""
+    read_post_ids = [i for i in sub.read_post_ids if i != post_id]
+    unread_post_ids = [i for i in sub.unread_post_ids if i != post_id]
+
+    # an exception is only kept when it differs from the watermark
+    read_by_watermark = sub.read_until is not None and published_at <= sub.read_until
+    if read and not read_by_watermark:
+        insort(read_post_ids, post_id)
+    elif not read and read_by_watermark:
+        insort(unread_post_ids, post_id)
+
+    # lists are replaced, not mutated, so that the JSON columns are
+    # flagged as changed
+    sub.read_post_ids = read_post_ids
+    sub.unread_post_ids = unread_post_ids
+    sub.updated_at = datetime.now()
+
+
+def mark_read_until(
+    sub: SubscriptionModel,
+    until: datetime,
+    published_at: dict[int, datetime],
+):
+    """marks every post published at or before until as read
+
+    published_at maps the post ids in the exception lists to their publish
+    time, exceptions of posts that no longer exist are dropped
+    """
+    read_until = until
+    if sub.read_until is not None and sub.read_until > until:
+        read_until = sub.read_until
+
+    sub.unread_post_ids = [
+        i for i in sub.unread_post_ids if i in published_at and published_at[i] > until
+    ]
+    sub.read_post_ids = [
+        i
+        for i in sub.read_post_ids
+        if i in published_at and published_at[i] > read_until
+    ]
+    sub.read_until = read_until
+    sub.updated_at = datetime.now()
+
+
+def get_exception_published_at(
+    conn: Session,
+    subs: list[SubscriptionModel],
+) -> dict[int, datetime]:
+    post_ids = [i for sub in subs for i in sub.read_post_ids + sub.unread_post_ids]
+    if len(post_ids) == 0:
+        return {}
+
+    q = select(PostModel.id, PostModel.published_at).where(PostModel.id.in_(post_ids))
+    return {post_id: published_at for post_id, published_at in conn.exec(q).all()}
+
+
+def count_unread_subscriptions(
+    conn: Session,
+    subs: list[SubscriptionModel],
+) -> dict[int, int]:
+    """unread posts by feed id, for the subscriptions of a single user"""
+    counts: dict[int, int] = {sub.feed_id: 0 for sub in subs}
+    if len(subs) == 0:
+        return counts
+
+    q = (
+        select(PostModel.feed_id, func.count())
+        .where(or_(*[unread_clause(sub) for sub in subs]))
+        .group_by(PostModel.feed_id)
+    )
+
+    for feed_id, unread in conn.exec(q).all():
+        counts[feed_id] = unread
+
+    return counts
+
+
+def count_unread(conn: Session, user_ids: list[int]) -> dict[int, dict[int, int]]:
+    """unread posts of the users by feed id, in either read state mode"""
+    if get_read_state_mode() != READ_STATE_SUBSCRIPTIONS:
+        return count_unread_links(conn=conn, user_ids=user_ids)
+
+    q = select(SubscriptionModel).where(SubscriptionModel.user_id.in_(user_ids))
+
+    subs_by_user: dict[int, list[SubscriptionModel]] = {u: [] for u in user_ids}
+    for sub in conn.exec(q).all():
+        subs_by_user[sub.user_id].append(sub)
+
+    return {
+        user_id: count_unread_subscriptions(conn=conn, subs=subs)
+        for user_id, subs in subs_by_user.items()
+    }
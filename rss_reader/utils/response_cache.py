@@ -0,0 +1,254 @@
+# builtin imports
+import json
+import time
+import uuid
+from collections import Counter
+from typing import Callable
+
+# external imports
+from fastapi.encoders import jsonable_encoder
+from redis import exceptions as redis_exceptions
+from redis.client import PubSub, PubSubWorkerThread
+
+# internal imports
+from .cache import Cache
+from .local_cache import MISSING, LocalCache
+from .singleton import Singleton
+from ..config.config import ResponseCacheConfig
+
+# bump when the shape of cached values changes, so that a release never
+# reads values written by the previous one
+_KEY_VERSION = 2
+
+# scopes group cached reads by the rows they were read from, writes
+# invalidate the scopes of the rows they change
+USERS_SCOPE = "users"
+
+
+def user_scope(user_id: int) -> str:
+    return "user:{}".format(user_id)
+
+
+def feed_scope(feed_id: int) -> str:
+    return "feed:{}".format(feed_id)
+
+
+def feed_posts_scope(feed_id: int) -> str:
+    return "feed-posts:{}".format(feed_id)
+
+
+def user_feed_scope(user_id: int, feed_id: int) -> str:
+    return "user-feed:{}:{}".format(user_id, feed_id)
+
+
+def get_response_cache():
+    c: ResponseCache = ResponseCache()
+    yield c
+
+
+class ResponseCache(metaclass=Singleton):
+    """read through cache of api reads, kept in process and in redis
+
+    a value is stored under its key and the current generation of every
+    scope it depends on. invalidating a scope gives it a new random
+    generation, which moves all of its keys to new names, the old values
+    expire on their own. generations expire once they outlive every value
+    written under them, a scope without one is at generation 0 again. a
+    row that does not exist is cached as None for negative_ttl seconds.
+    redis errors are treated as a miss, so reads fall back to the
+    database when redis is unavailable. a missing or expiring value is
+    loaded by a single caller, see Cache.get_or_compute
+
+    versioned keys never change their value, so the in process tier can
+    keep them without invalidation. it also keeps scope generations for
+    up to local_ttl seconds, invalidations are published so that every
+    process drops the generations of the bumped scopes right away
+    """
+
+    _cache: Cache
+    _config: ResponseCacheConfig
+    _key_prefix: str = "rss_reader:rc:v{}:".format(_KEY_VERSION)
+    _generation_prefix: str = "rss_reader:rc:gen:"
+    _channel: str = "rss_reader:rc:invalidate"
+
+    _local: LocalCache
+    _generations: LocalCache
+    _redis_stats: Counter
+    _pubsub: PubSub | None = None
+    _listener: PubSubWorkerThread | None = None
+
+    # bumped on every invalidation seen by this process, a generation read
+    # from redis is only kept locally if no invalidation raced the read
+    _epoch: int = 0
+
+    def __init__(self):
+        pass
+
+    def setup(
+        self,
+        cache: Cache,
+        config: ResponseCacheConfig,
+        subscribe: bool = True,
+    ) -> None:
+        """subscribe starts a thread listening for invalidations, only
+        processes that read through the cache need it
+        """
+        self._cache = cache
+        self._config = config
+        self._local = LocalCache(config.local_max_entries, config.ttl)
+        self._generations = LocalCache(config.local_max_entries, config.local_ttl)
+        self._redis_stats = Counter()
+
+        if subscribe and config.enabled and config.local_max_entries != 0:
+            self._subscribe()
+
+    def get_or_load(
+        self,
+        key: str,
+        scopes: list[str],
+        loader: Callable[[], any],
+    ) -> any:
+        """cached value of key, loader is called on a miss
+
+        values are returned as json compatible data, loader may return
+        models. a loader returning None marks the row as missing
+        """
+        if not self._config.enabled:
+            return jsonable_encoder(loader())
+
+        try:
+            versioned_key = self._versioned_key(key, scopes)
+        except redis_exceptions.RedisError:
+            self._redis_stats["errors"] += 1
+            return jsonable_encoder(loader())
+
+        value = self._local.get(versioned_key)
+        if value is not MISSING:
+            return value
+
+        loads = 0
+
+        def load() -> any:
+            nonlocal loads
+            loads += 1
+            return jsonable_encoder(loader())
+
+        try:
+            value = self._cache.get_or_compute(
+                versioned_key,
+                load,
+                ttl=self._get_ttl,
+                stale_ttl=self._config.stale_ttl,
+                lock_timeout=self._config.lock_timeout,
+                lock_wait=self._config.lock_wait,
+            )
+        except redis_exceptions.RedisError:
+            # raised before loading, values that fail to be stored are
+            # still returned
+            self._redis_stats["errors"] += 1
+            value = load()
+
+        self._redis_stats["misses" if loads != 0 else "hits"] += 1
+        self._local.set(versioned_key, value, ttl=self._get_ttl(value))
+
+        return value
+
+    def invalidate(self, *scopes: str) -> None:
+        if not self._config.enabled or len(scopes) == 0:
+            return
+
+        self._drop_generations(scopes)
+
+        try:
+            with self._cache.pipeline() as pipe:
+                for scope in scopes:
+                    pipe.set(
+                        self._generation_key(scope),
+                        uuid.uuid4().hex[:16],
+                        ex=self._generation_ttl(),
+                    )
+                pipe.publish(self._channel, json.dumps(scopes))
+
+        except redis_exceptions.RedisError:
+            # values of the scopes stay visible until their ttl runs out
+            self._redis_stats["errors"] += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """hit, miss and eviction counts of this process, by tier"""
+        return {
+            "local": self._local.stats(),
+            "local_generations": self._generations.stats(),
+            "redis": {
+                "hits": self._redis_stats["hits"],
+                "misses": self._redis_stats["misses"],
+                "errors": self._redis_stats["errors"],
+            },
+        }
+
+    def _get_ttl(self, value: any) -> int:
+        return self._config.ttl if value is not None else self._config.negative_ttl
+
+    def _generation_ttl(self) -> int:
+        # a counter would start over once its key expired and hand out
+        # generations that values still in redis were written under,
+        # random generations never repeat. generation 0 does, so a
+        # generation has to outlive the values written before it was set
+        ttl = max(self._config.ttl, self._config.negative_ttl)
+        return 2 * (ttl + self._config.stale_ttl)
+
+    def _versioned_key(self, key: str, scopes: list[str]) -> str:
+        generations: dict[str, str] = {}
+        for scope in scopes:
+            generation = self._generations.get(scope)
+            if generation is not MISSING:
+                generations[scope] = generation
+
+        missing = [scope for scope in scopes if scope not in generations]
+        if len(missing) != 0:
+            epoch = self._epoch
+            values = self._cache.get_redis_connection().mget(
+                [self._generation_key(scope) for scope in missing]
+            )
+
+            for scope, value in zip(missing, values):
+                generations[scope] = value.decode("utf-8") if value else "0"
+                if self._epoch == epoch:
+                    self._generations.set(scope, generations[scope])
+
+        return "{}{}:{}".format(
+            self._key_prefix,
+            key,
+            ":".join(generations[scope] for scope in scopes),
+        )
+
+    def _drop_generations(self, scopes: list[str]) -> None:
+        self._epoch += 1
+        for scope in scopes:
+            self._generations.delete(scope)
+
+    def _subscribe(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()
+
+        self._pubsub = self._cache.get_redis_connection().pubsub(
+            ignore_subscribe_messages=True
+        )
+        self._pubsub.subscribe(**{self._channel: self._on_invalidate})
+        self._listener = self._pubsub.run_in_thread(
+            sleep_time=1, daemon=True, exception_handler=self._on_listener_error
+        )
+
+    def _on_invalidate(self, message: dict) -> None:
+        self._drop_generations(json.loads(message["data"]))
+
+    def _on_listener_error(
+        self, exc: Exception, pubsub: PubSub, thread: PubSubWorkerThread
+    ) -> None:
+        # invalidations may have been missed while disconnected, forget
+        # every generation and retry the connection after a pause
+        self._epoch += 1
+        self._generations.clear()
+        time.sleep(1)
+
+    def _generation_key(self, scope: str) -> str:
+        return "{}{}".format(self._generation_prefix, scope)
@@ -0,0 +1,342 @@
+# builtin imports
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import IO, Iterator
+
+# external imports
+from sqlalchemy import (
+    JSON,
+    ColumnElement,
+    DateTime,
+    Table,
+    delete,
+    literal,
+    null,
+    or_,
+    sql,
+    true,
+)
+from sqlmodel import Session, select
+
+# internal imports
+from ..config.config import RetentionConfig
+from ..database.bulk import batched, insert_ignore_conflicts
+from ..database.partitions import (
+    LINK_TABLE,
+    drop_partition,
+    expired_partitions,
+    is_partitioned,
+    stream_partition,
+)
+from ..database.models import (
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+)
+from .read_state import READ_STATE_SUBSCRIPTIONS, get_read_state_mode, is_read
+
+_POSTS_TABLE: Table = PostModel.__table__
+_LINKS_TABLE: Table = UserFeedPostLink.__table__
+
+
+class PostArchive:
+    """gzipped json lines file of pruned rows, one {"table", "row"} object
+    per line. the file is only created once the first rows are written
+    """
+
+    path: str | None = None
+    _archive_dir: str
+    _file: IO | None = None
+
+    def __init__(self, archive_dir: str) -> None:
+        self._archive_dir = archive_dir
+
+    def write(self, table: Table, rows: list[dict]) -> None:
+        if len(rows) == 0:
+            return
+
+        if self._file is None:
+            os.makedirs(self._archive_dir, exist_ok=True)
+            self.path = os.path.join(
+                self._archive_dir,
+                "posts-{:%Y%m%dT%H%M%S}.jsonl.gz".format(datetime.now()),
+            )
+            self._file = gzip.open(self.path, "at", encoding="utf-8")
+
+        for row in rows:
+            line = json.dumps({"table": table.name, "row": row}, default=_encode)
+            self._file.write(line + "\n")
+
+        # rows must be on disk before they are deleted
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_retention_limits(
+    config: RetentionConfig,
+    retention_days: int | None,
+    retention_max_posts: int | None,
+) -> tuple[int, int]:
+    """max age in days and max posts of a feed, 0 disables a limit"""
+    max_age_days = config.max_age_days if retention_days is None else retention_days
+    max_posts = config.max_posts if retention_max_posts is None else retention_max_posts
+
+    return (max_age_days, max_posts)
+
+
+def get_cutoff(max_age_days: int) -> datetime | None:
+    if max_age_days == 0:
+        return None
+
+    return datetime.now() - timedelta(days=max_age_days)
+
+
+def drop_expired_rows(post_rows: list[dict], max_age_days: int) -> list[dict]:
+    """drops post rows that would be pruned right away, so that entries a
+    feed keeps listing are not ingested again after they were pruned
+    """
+    cutoff = get_cutoff(max_age_days)
+    if cutoff is None:
+        return post_rows
+
+    return [row for row in post_rows if row["published_at"] >= cutoff]
+
+
+def find_expired_posts(
+    conn: Session,
+    feed_id: int,
+    max_age_days: int,
+    max_posts: int,
+    limit: int,
+) -> list[int]:
+    """ids of at most limit posts of the feed that are past retention"""
+    expired: list[ColumnElement] = []
+
+    cutoff = get_cutoff(max_age_days)
+    if cutoff is not None:
+        expired.append(PostModel.published_at < cutoff)
+
+    if max_posts != 0:
+        kept = (
+            select(PostModel.id)
+            .where(PostModel.feed_id == feed_id)
+            .order_by(PostModel.published_at.desc(), PostModel.id.desc())
+            .limit(max_posts)
+        )
+        expired.append(PostModel.id.not_in(kept))
+
+    if len(expired) == 0:
+        return []
+
+    q = (
+        select(PostModel.id)
+        .where(PostModel.feed_id == feed_id)
+        .where(or_(*expired))
+        .order_by(PostModel.published_at, PostModel.id)
+        .limit(limit)
+    )
+    return list(conn.exec(q).all())
+
+
+def delete_posts(
+    conn: Session,
+    post_ids: list[int],
+    archive: PostArchive | None = None,
+) -> Counter:
+    """deletes the posts and their links, writing them to the archive first
+
+    returns the change in unread posts by (user id, feed id). commit is
+    left to the caller
+    """
+    unread = Counter()
+    if len(post_ids) == 0:
+        return unread
+
+    posts = _select_rows(conn, _POSTS_TABLE, PostModel.id.in_(post_ids))
+    links = _select_rows(conn, _LINKS_TABLE, UserFeedPostLink.post_id.in_(post_ids))
+
+    if archive is not None:
+        archive.write(_POSTS_TABLE, posts)
+        archive.write(_LINKS_TABLE, links)
+
+    for link in links:
+        if not link["is_read"]:
+            unread[(link["user_id"], link["feed_id"])] -= 1
+
+    if get_read_state_mode() == READ_STATE_SUBSCRIPTIONS:
+        unread.update(_count_unread_for_subscriptions(conn, posts))
+
+    conn.exec(delete(UserFeedPostLink).where(UserFeedPostLink.post_id.in_(post_ids)))
+    conn.exec(delete(PostModel).where(PostModel.id.in_(post_ids)))
+
+    return unread
+
+
+def get_partition_cutoff(
+    config: RetentionConfig,
+    retention_days: list[int | None],
+) -> datetime | None:
+    """links older than the cutoff are past the max age of every feed, so
+    partitions holding only such links can be dropped whole
+    """
+    ages = [get_retention_limits(config, days, None)[0] for days in retention_days]
+    if len(ages) == 0 or 0 in ages:
+        return None
+
+    return get_cutoff(max(ages))
+
+
+def drop_expired_partitions(
+    conn: Session,
+    cutoff: datetime,
+    archive: PostArchive | None,
+    batch_size: int,
+) -> list[str]:
+    """drops the link partitions older than cutoff, writing their rows to
+    the archive first. commits after every partition
+
+    every (user, feed) pair linked in a partition is subscribed before it
+    is dropped, so that a feed whose last links go with it keeps its
+    followers
+    """
+    if not is_partitioned(conn, LINK_TABLE):
+        return []
+
+    dropped: list[str] = []
+    for name in expired_partitions(conn, LINK_TABLE, cutoff):
+        if archive is not None:
+            for rows in stream_partition(conn, name, batch_size):
+                archive.write(_LINKS_TABLE, rows)
+
+        _subscribe_partition_pairs(conn, name)
+        drop_partition(conn, name)
+        conn.commit()
+        dropped.append(name)
+
+    return dropped
+
+
+def restore_archive(conn: Session, path: str, batch_size: int) -> dict[str, int]:
+    """inserts the rows of an archive back, rows that exist are skipped
+
+    the archive is read once per table, so that every post is back before
+    its links. links of posts that could not be restored, because the feed
+    ingested the same entry again under a new id, are dropped
+    """
+    restored: dict[str, int] = {}
+
+    for table in (_POSTS_TABLE, _LINKS_TABLE):
+        restored[table.name] = 0
+
+        for rows in batched(_read_archive(path, table), batch_size):
+            if table is _LINKS_TABLE:
+                rows = _drop_orphan_links(conn, rows)
+
+            if len(rows) != 0:
+                q = insert_ignore_conflicts(conn, table).values(rows)
+                restored[table.name] += conn.exec(q).rowcount
+
+            conn.commit()
+
+    return restored
+
+
+#### add helper functions here ####
+
+
+def _subscribe_partition_pairs(conn: Session, name: str) -> int:
+    partition = sql.table(name, sql.column("user_id"), sql.column("feed_id"))
+    pairs = select(partition.c.user_id, partition.c.feed_id).distinct().subquery()
+    now = datetime.now()
+
+    q = insert_ignore_conflicts(conn, SubscriptionModel.__table__).from_select(
+        [
+            "user_id",
+            "feed_id",
+            "read_until",
+            "read_post_ids",
+            "unread_post_ids",
+            "created_at",
+            "updated_at",
+        ],
+        select(
+            pairs.c.user_id,
+            pairs.c.feed_id,
+            null(),
+            literal([], JSON),
+            literal([], JSON),
+            literal(now),
+            literal(now),
+        )
+        # sqlite only parses ON CONFLICT after a SELECT with a WHERE
+        .where(true()),
+    )
+
+    return conn.exec(q).rowcount
+
+
+def _select_rows(conn: Session, table: Table, where: ColumnElement) -> list[dict]:
+    return [
+        dict(row._mapping) for row in conn.exec(select(*table.columns).where(where))
+    ]
+
+
+def _count_unread_for_subscriptions(conn: Session, posts: list[dict]) -> Counter:
+    posts_by_feed: dict[int, list[dict]] = defaultdict(list)
+    for post in posts:
+        posts_by_feed[post["feed_id"]].append(post)
+
+    q = select(SubscriptionModel).where(
+        SubscriptionModel.feed_id.in_(posts_by_feed.keys())
+    )
+
+    # every subscription only looks at the posts of its own feed
+    unread = Counter()
+    for sub in conn.exec(q).all():
+        for post in posts_by_feed[sub.feed_id]:
+            if not is_read(sub, post["id"], post["published_at"]):
+                unread[(sub.user_id, sub.feed_id)] -= 1
+
+    return unread
+
+
+def _drop_orphan_links(conn: Session, rows: list[dict]) -> list[dict]:
+    post_ids = {row["post_id"] for row in rows}
+    if len(post_ids) == 0:
+        return rows
+
+    q = select(PostModel.id).where(PostModel.id.in_(post_ids))
+    existing = set(conn.exec(q).all())
+
+    return [row for row in rows if row["post_id"] in existing]
+
+
+def _read_archive(path: str, table: Table) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            record = json.loads(line)
+            if record["table"] == table.name:
+                yield _decode_row(table, record["row"])
+
+
+def _encode(value: any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    raise TypeError("{} is not serializable".format(type(value).__name__))
+
+
+def _decode_row(table: Table, row: dict) -> dict:
+    for column in table.columns:
+        value = row.get(column.name)
+        if isinstance(column.type, DateTime) and isinstance(value, str):
+            row[column.name] = datetime.fromisoformat(value)
+
+    return row
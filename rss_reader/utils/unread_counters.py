@@ -0,0 +1,133 @@
+# builtin imports
+from collections import Counter
+
+# external imports
+from redis import Redis
+from redis import exceptions as redis_exceptions
+from sqlalchemy import case, func
+from sqlmodel import Session, select
+
+# internal imports
+from .singleton import Singleton
+from ..database.models import (
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+)
+
+
+def get_unread_counters():
+    c: UnreadCounters = UnreadCounters()
+    yield c
+
+
+class UnreadCounters(metaclass=Singleton):
+    """unread post counts per user, one redis hash of feed id to count
+
+    counters are moved by the writes that change read state. a write that
+    fails to reach redis is dropped, the periodic reconciliation corrects
+    the drift. a hash is only trusted once it has been filled from the
+    database, which sets the _MATERIALIZED field
+    """
+
+    _redis: Redis
+    _key_prefix: str = "rss_reader:unread:"
+
+    _MATERIALIZED = "materialized"
+
+    def __init__(self):
+        pass
+
+    def setup(self, redis_conn: Redis) -> None:
+        self._redis = redis_conn
+
+    def get(self, user_id: int) -> dict[int, int] | None:
+        """counts by feed id, None if the user's counts were never filled
+        or redis is unavailable
+        """
+        try:
+            raw = self._redis.hgetall(self._key(user_id))
+        except redis_exceptions.RedisError:
+            return None
+
+        if self._MATERIALIZED.encode("utf-8") not in raw:
+            return None
+
+        # a decrement racing a reconciliation can dip below zero
+        return {
+            int(feed_id): max(0, int(count))
+            for feed_id, count in raw.items()
+            if feed_id.decode("utf-8") != self._MATERIALIZED
+        }
+
+    def replace(self, counts: dict[int, dict[int, int]]) -> None:
+        """overwrites the counts of every user in counts"""
+        try:
+            with self._redis.pipeline() as pipe:
+                for user_id, feeds in counts.items():
+                    key = self._key(user_id)
+                    pipe.delete(key)
+                    pipe.hset(key, mapping={self._MATERIALIZED: 1, **feeds})
+
+                pipe.execute()
+
+        except redis_exceptions.RedisError:
+            pass
+
+    def incr(self, user_id: int, feed_id: int, amount: int) -> None:
+        self.incr_many(Counter({(user_id, feed_id): amount}))
+
+    def incr_many(self, amounts: Counter) -> None:
+        """amounts maps (user id, feed id) to the change in unread posts"""
+        try:
+            with self._redis.pipeline(transaction=False) as pipe:
+                for (user_id, feed_id), amount in amounts.items():
+                    if amount != 0:
+                        pipe.hincrby(self._key(user_id), str(feed_id), amount)
+
+                pipe.execute()
+
+        except redis_exceptions.RedisError:
+            pass
+
+    def remove(self, user_id: int, feed_ids: list[int]) -> None:
+        if len(feed_ids) == 0:
+            return
+
+        try:
+            self._redis.hdel(self._key(user_id), *[str(f) for f in feed_ids])
+        except redis_exceptions.RedisError:
+            pass
+
+    def _key(self, user_id: int) -> str:
+        return "{}{}".format(self._key_prefix, user_id)
+
+
+def count_unread_links(
+    conn: Session,
+    user_ids: list[int],
+) -> dict[int, dict[int, int]]:
+    """counts unread links of the users by feed, feeds with every post read
+    or with every link pruned by retention are included with a count of
+    zero
+    """
+    subs = select(SubscriptionModel.user_id, SubscriptionModel.feed_id).where(
+        SubscriptionModel.user_id.in_(user_ids)
+    )
+    q = (
+        select(
+            UserFeedPostLink.user_id,
+            UserFeedPostLink.feed_id,
+            func.sum(case((UserFeedPostLink.is_read == False, 1), else_=0)),
+        )
+        .where(UserFeedPostLink.user_id.in_(user_ids))
+        .group_by(UserFeedPostLink.user_id, UserFeedPostLink.feed_id)
+    )
+
+    counts: dict[int, dict[int, int]] = {user_id: {} for user_id in user_ids}
+    for user_id, feed_id in conn.exec(subs).all():
+        counts[user_id][feed_id] = 0
+
+    for user_id, feed_id, unread in conn.exec(q).all():
+        counts[user_id][feed_id] = int(unread or 0)
+
+    return counts
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from rss_reader.utils.cache import Cache
+
+
+@pytest.fixture(name="cache")
+def cache_fixture():
+    c: Cache = Cache()
+    c._redis = fakeredis.FakeRedis()
+
+    yield c
+
+
+class SlowCompute:
+    def __init__(self, value, duration: float = 0):
+        self.value = value
+        self.duration = duration
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.duration)
+        return self.value
+
+
+def test_missing_key_is_computed_once(cache: Cache):
+    compute = SlowCompute({"id": 1}, duration=0.2)
+    results = []
+
+    def read():
+        results.append(cache.get_or_compute("posts", compute, ttl=60))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert compute.calls == 1
+    assert results == [{"id": 1}] * 8
+    assert not cache.get_redis_connection().exists("rss_reader:lock:posts")
+
+
+def test_expired_value_is_served_while_locked(cache: Cache):
+    cache.get_or_compute("posts", SlowCompute("old"), ttl=1, stale_ttl=60)
+    entry = cache.get("posts")
+    entry["expires_at"] = time.time() - 1
+    cache.set("posts", entry, ttl=60)
+
+    # another caller is recomputing the value
+    cache.get_redis_connection().set("rss_reader:lock:posts", "other")
+    compute = SlowCompute("new")
+    assert cache.get_or_compute("posts", compute, ttl=60) == "old"
+    assert compute.calls == 0
+
+    cache.get_redis_connection().delete("rss_reader:lock:posts")
+    assert cache.get_or_compute("posts", compute, ttl=60) == "new"
+    assert compute.calls == 1
+
+
+def test_slow_values_are_refreshed_early(cache: Cache):
+    cache.get_or_compute("posts", SlowCompute("old"), ttl=60)
+    entry = cache.get("posts")
+
+    # a value that took longer to compute than it has left to live
+    entry["delta"] = 1000
+    cache.set("posts", entry, ttl=60)
+
+    compute = SlowCompute("new")
+    assert cache.get_or_compute("posts", compute, ttl=60, beta=1000) == "new"
+    assert compute.calls == 1
+    assert cache.get_or_compute("posts", compute, ttl=60) == "new"
+    assert compute.calls == 1
+
+
+def test_gives_up_waiting_for_the_lock(cache: Cache):
+    cache.get_redis_connection().set("rss_reader:lock:posts", "other")
+
+    compute = SlowCompute({"id": 1})
+    assert cache.get_or_compute("posts", compute, ttl=60, lock_wait=0.1) == {"id": 1}
+    assert compute.calls == 1
+
+
+def test_batched_reads_and_writes(cache: Cache):
+    cache.set_many({"a": {"id": 1}, "b": [1, 2]})
+    cache.set_many({"c": "x"}, ttl=60)
+
+    assert cache.get_many(["a", "b", "c", "missing"]) == {
+        "a": {"id": 1},
+        "b": [1, 2],
+        "c": "x",
+        "missing": "",
+    }
+    assert cache.get_redis_connection().ttl("a") == -1
+    assert 0 < cache.get_redis_connection().ttl("c") <= 60
+
+    cache.delete_many(["a", "c"])
+    assert cache.get_many(["a", "b", "c"]) == {"a": "", "b": [1, 2], "c": ""}
+
+
+def test_pipeline_executes_on_exit(cache: Cache):
+    with cache.pipeline() as pipe:
+        cache.set_many({"a": 1, "b": 2}, pipeline=pipe)
+        cache.delete_many(["b"], pipeline=pipe)
+        pipe.incr("counter")
+
+        assert cache.get("a") == ""
+
+    assert cache.get_many(["a", "b"]) == {"a": 1, "b": ""}
+    assert cache.get_redis_connection().get("counter") == b"1"
+
+    # commands queued before an error are dropped
+    with pytest.raises(RuntimeError):
+        with cache.pipeline() as pipe:
+            pipe.incr("counter")
+            raise RuntimeError()
+
+    assert cache.get_redis_connection().get("counter") == b"1"
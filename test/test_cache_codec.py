@@ -0,0 +1,65 @@
+import json
+from datetime import date, datetime
+
+import pytest
+
+from rss_reader.utils import cache_codec
+from rss_reader.utils.cache_codec import CacheCodec
+
+POSTS = [
+    {
+        "id": i,
+        "title": "post {}".format(i),
+        "published_at": datetime(2024, 5, 1, 12, i),
+        "is_read": i % 2 == 0,
+        "read_at": None,
+        "day": date(2024, 5, 1),
+    }
+    for i in range(50)
+]
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_json_round_trips_datetimes(compression: str):
+    codec = CacheCodec("json", compression, compress_min_bytes=64)
+
+    assert codec.decode(codec.encode(POSTS)) == POSTS
+    assert codec.decode(codec.encode({"value": None})) == {"value": None}
+
+
+def test_compresses_above_threshold():
+    codec = CacheCodec("json", "zlib", compress_min_bytes=1024)
+
+    small = codec.encode({"id": 1})
+    large = codec.encode(POSTS)
+    assert small[2] == cache_codec.COMPRESSIONS["none"]
+    assert large[2] == cache_codec.COMPRESSIONS["zlib"]
+    assert len(large) < len(json.dumps(POSTS, default=str))
+
+
+def test_decodes_values_written_before_codecs():
+    codec = CacheCodec("json", "zlib")
+
+    assert codec.decode(json.dumps({"value": [1, 2]}).encode("utf-8")) == {
+        "value": [1, 2]
+    }
+
+
+def test_decodes_values_written_with_another_codec():
+    written = CacheCodec("json", "zlib", compress_min_bytes=0).encode(POSTS)
+
+    assert CacheCodec("json", "none").decode(written) == POSTS
+
+
+def test_msgpack_round_trips_datetimes():
+    pytest.importorskip("msgpack")
+    codec = CacheCodec("msgpack", "zlib", compress_min_bytes=64)
+
+    assert codec.decode(codec.encode(POSTS)) == POSTS
+
+
+def test_rejects_unknown_codecs():
+    with pytest.raises(ValueError):
+        CacheCodec("pickle")
+    with pytest.raises(ValueError):
+        CacheCodec("json", "brotli")
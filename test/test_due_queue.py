@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+
+from rss_reader.utils.message_queue import DueQueue
+
+
+@pytest.fixture(name="due_queue")
+def due_queue_fixture():
+    q: DueQueue = DueQueue()
+    q.setup(fakeredis.FakeRedis())
+
+    yield q
+
+
+def test_schedule_and_remove(due_queue: DueQueue):
+    now = datetime.now()
+    due_queue.schedule_many({1: now, 2: now + timedelta(minutes=5)})
+    due_queue.schedule(3, now)
+    due_queue.remove([2])
+
+    assert due_queue.feed_ids() == {1, 3}
+    assert due_queue.size() == 2
+
+
+def test_claim_leases_due_feeds(due_queue: DueQueue):
+    pytest.importorskip("lupa")
+
+    now = datetime.now()
+    due_queue.schedule_many(
+        {1: now - timedelta(minutes=1), 2: now, 3: now + timedelta(hours=1)}
+    )
+
+    assert sorted(due_queue.claim(limit=10, lease=60)) == [1, 2]
+
+    # claimed feeds are leased, not removed
+    assert due_queue.claim(limit=10, lease=60) == []
+    assert due_queue.feed_ids() == {1, 2, 3}
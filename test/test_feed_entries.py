@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from rss_reader.utils.feed_entries import get_parse_pool, parse_feed
+
+FEED_BODY = b"""<rss version='2.0'><channel><title>example</title><ttl>60</ttl>
+<item><guid>post-1</guid><link>https://example.com/1</link><title>one</title>
+<pubDate>Mon, 06 May 2024 10:00:00 GMT</pubDate></item>
+<item><link>https://example.com/2</link></item>
+<item><title>no guid or link</title></item>
+</channel></rss>"""
+
+
+def test_parse_feed_keeps_stored_fields():
+    entries, ttl = parse_feed(FEED_BODY, {})
+
+    assert ttl == 60
+    assert entries == [
+        {
+            "guid": "post-1",
+            "url": "https://example.com/1",
+            "title": "one",
+            "published_at": datetime(2024, 5, 6, 10, 0),
+        },
+        {
+            "guid": "https://example.com/2",
+            "url": "https://example.com/2",
+            "title": "",
+            "published_at": None,
+        },
+    ]
+
+
+def test_parse_feed_in_pool():
+    with get_parse_pool(workers=2, pending=1) as pool:
+        entries, ttl = pool.submit(parse_feed, FEED_BODY, {}).result()
+
+    assert len(entries) == 2
+    assert ttl == 60
@@ -0,0 +1,285 @@
+import asyncio
+import gzip
+import hashlib
+
+import fakeredis
+import httpx
+import pytest
+from fastapi import status
+
+from rss_reader.config.config import FetchConfig
+from rss_reader.utils import feed_fetcher
+from rss_reader.utils.feed_fetcher import (
+    FeedRateLimited,
+    FeedTooLarge,
+    FetchRequest,
+    HostThrottle,
+    fetch_feed,
+    fetch_feeds_bulk,
+)
+
+FEED_URL = "https://example.com/feed.xml"
+FEED_BODY = b"<rss version='2.0'><channel><title>example</title></channel></rss>"
+
+# built around the config singleton, which keeps whichever instance was
+# built first, the app's one when another test module imported it
+FETCH_CONFIG = type.__call__(
+    FetchConfig,
+    {
+        "timeout": 5,
+        "concurrency": 2,
+        "max_connections": 2,
+        "max_keepalive": 2,
+        "per_host_concurrency": 2,
+        "per_host_rate": 100,
+        "per_host_burst": 2,
+        "max_body_size": 1024,
+    },
+)
+
+
+@pytest.fixture(name="origin")
+def origin_fixture(monkeypatch: pytest.MonkeyPatch):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(status.HTTP_304_NOT_MODIFIED)
+
+        return httpx.Response(
+            status.HTTP_200_OK,
+            content=FEED_BODY,
+            headers={"etag": '"v1"', "last-modified": "Mon, 06 May 2024 10:00:00 GMT"},
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(feed_fetcher, "_http_client", client)
+
+    yield requests
+
+
+def test_fetch_feed_stores_validators(origin: list[httpx.Request]):
+    result = fetch_feed(FEED_URL)
+
+    assert not result.not_modified
+    assert result.content == FEED_BODY
+    assert result.etag == '"v1"'
+    assert result.last_modified == "Mon, 06 May 2024 10:00:00 GMT"
+    assert result.content_hash == hashlib.sha256(FEED_BODY).hexdigest()
+
+
+def test_fetch_feed_sends_validators(origin: list[httpx.Request]):
+    result = fetch_feed(FEED_URL, etag='"v1"', last_modified="yesterday")
+
+    assert origin[0].headers["if-none-match"] == '"v1"'
+    assert origin[0].headers["if-modified-since"] == "yesterday"
+    assert result.not_modified
+    assert result.etag == '"v1"'
+
+
+def test_fetch_feed_same_content_hash(origin: list[httpx.Request]):
+    digest = hashlib.sha256(FEED_BODY).hexdigest()
+    result = fetch_feed(FEED_URL, content_hash=digest)
+
+    assert result.not_modified
+
+
+def test_fetch_feeds_bulk_keeps_order_and_errors():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/broken.xml":
+            raise httpx.ConnectError("connection refused", request=request)
+
+        return httpx.Response(status.HTTP_200_OK, content=FEED_BODY)
+
+    requests = [
+        FetchRequest(feed_id=feed_id, url="https://example.com/{}.xml".format(name))
+        for feed_id, name in enumerate(["a", "broken", "b"])
+    ]
+
+    results = fetch_feeds_bulk(
+        requests, FETCH_CONFIG, transport=httpx.MockTransport(handler)
+    )
+
+    assert [r.feed_id for r in results] == [0, 1, 2]
+    assert not results[0].has_failed()
+    assert results[0].content == FEED_BODY
+    assert results[1].has_failed()
+    assert not results[2].has_failed()
+
+
+def test_fetch_feed_rate_limited(monkeypatch: pytest.MonkeyPatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_429_TOO_MANY_REQUESTS, headers={"retry-after": "600"}
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(feed_fetcher, "_http_client", client)
+
+    with pytest.raises(FeedRateLimited) as exc:
+        fetch_feed(FEED_URL)
+
+    assert exc.value.retry_after == 600
+
+
+def test_fetch_feeds_bulk_pauses_rate_limited_host():
+    requests_by_host: dict[str, int] = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        requests_by_host[host] = requests_by_host.get(host, 0) + 1
+        if host == "busy.example.com":
+            return httpx.Response(
+                status.HTTP_429_TOO_MANY_REQUESTS, headers={"retry-after": "120"}
+            )
+
+        return httpx.Response(status.HTTP_200_OK, content=FEED_BODY)
+
+    urls = ["https://busy.example.com/{}.xml".format(i) for i in range(4)]
+    urls.append("https://example.com/feed.xml")
+    requests = [FetchRequest(feed_id=i, url=url) for i, url in enumerate(urls)]
+
+    results = fetch_feeds_bulk(
+        requests, FETCH_CONFIG, transport=httpx.MockTransport(handler)
+    )
+
+    # the rest of the busy host's feeds are not requested once it throttled
+    assert requests_by_host["busy.example.com"] <= FETCH_CONFIG.per_host_concurrency
+    assert all(r.retry_after() is not None for r in results[:4])
+    assert not results[4].has_failed()
+
+
+def test_fetch_feed_decodes_gzip(monkeypatch: pytest.MonkeyPatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_200_OK,
+            content=gzip.compress(FEED_BODY),
+            headers={"content-encoding": "gzip"},
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(feed_fetcher, "_http_client", client)
+
+    assert fetch_feed(FEED_URL).content == FEED_BODY
+
+
+def test_fetch_feeds_bulk_aborts_large_body():
+    def handler(request: httpx.Request) -> httpx.Response:
+        # compresses well below the limit, decodes far above it
+        return httpx.Response(
+            status.HTTP_200_OK,
+            content=gzip.compress(FEED_BODY * 1000),
+            headers={"content-encoding": "gzip"},
+        )
+
+    results = fetch_feeds_bulk(
+        [FetchRequest(feed_id=1, url=FEED_URL)],
+        FETCH_CONFIG,
+        transport=httpx.MockTransport(handler),
+    )
+
+    assert isinstance(results[0].error, FeedTooLarge)
+
+
+def test_fetch_feeds_bulk_waits_for_host_before_taking_a_slot():
+    done: list[str] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "slow.example.com":
+            await asyncio.sleep(0.2)
+
+        done.append(request.url.host)
+        return httpx.Response(status.HTTP_200_OK, content=FEED_BODY)
+
+    config = type.__call__(
+        FetchConfig,
+        {
+            "timeout": 5,
+            "concurrency": 2,
+            "max_connections": 2,
+            "max_keepalive": 2,
+            "per_host_concurrency": 1,
+            "per_host_rate": 100,
+            "per_host_burst": 2,
+            "max_body_size": 1024,
+        },
+    )
+    urls = [
+        "https://slow.example.com/a.xml",
+        "https://slow.example.com/b.xml",
+        "https://fast.example.com/c.xml",
+    ]
+
+    fetch_feeds_bulk(
+        [FetchRequest(feed_id=i, url=url) for i, url in enumerate(urls)],
+        config,
+        transport=httpx.MockTransport(handler),
+    )
+
+    # the second slow request queues on its host, not on a global slot
+    assert done == ["fast.example.com", "slow.example.com", "slow.example.com"]
+
+
+def test_host_throttle_is_shared_by_fetches(monkeypatch: pytest.MonkeyPatch):
+    config = type.__call__(
+        FetchConfig,
+        {
+            "timeout": 5,
+            "concurrency": 2,
+            "max_connections": 2,
+            "max_keepalive": 2,
+            "per_host_concurrency": 2,
+            "per_host_rate": 0.1,
+            "per_host_burst": 2,
+            "max_body_size": 1024,
+        },
+    )
+    throttle: HostThrottle = type.__call__(HostThrottle)
+    throttle.setup(fakeredis.FakeRedis(), config)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            status.HTTP_429_TOO_MANY_REQUESTS, headers={"retry-after": "600"}
+        )
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(feed_fetcher, "_http_client", client)
+
+    assert throttle.take("example.com") == 0
+    assert throttle.take("example.com") == 0
+    assert throttle.take("example.com") > 0
+
+    # a 429 on the per feed path pauses the host for bulk fetches too
+    with pytest.raises(FeedRateLimited):
+        fetch_feed("https://other.example.com/feed.xml", throttle=throttle)
+
+    results = fetch_feeds_bulk(
+        [FetchRequest(feed_id=1, url="https://other.example.com/feed.xml")],
+        config,
+        transport=httpx.MockTransport(handler),
+        throttle=throttle,
+    )
+    assert 590 <= results[0].retry_after() <= 600
+    assert throttle.paused_for("other.example.com") > 590
+
+
+def test_fetch_feeds_bulk_keeps_unexpected_errors_per_feed():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/odd.xml":
+            raise RuntimeError("unexpected")
+
+        return httpx.Response(status.HTTP_200_OK, content=FEED_BODY)
+
+    requests = [
+        FetchRequest(feed_id=feed_id, url="https://example.com/{}.xml".format(name))
+        for feed_id, name in enumerate(["a", "odd", "b"])
+    ]
+
+    results = fetch_feeds_bulk(
+        requests, FETCH_CONFIG, transport=httpx.MockTransport(handler)
+    )
+
+    assert [r.feed_id for r in results] == [0, 1, 2]
+    assert isinstance(results[1].error, RuntimeError)
+    assert not results[0].has_failed() and not results[2].has_failed()
@@ -0,0 +1,274 @@
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+from rq_scheduler import Scheduler
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from rss_reader.database.models import (
+    Feeds as FeedModel,
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+    Users as UserModel,
+)
+from rss_reader.database.bulk import batched
+from rss_reader.utils import feed_parser
+from rss_reader.utils.cache import Cache
+from rss_reader.utils.feed_parser import (
+    _SYNC_BACKOFF_INTERVALS,
+    _claim_due_feeds,
+    _create_posts_add_links,
+    _create_posts_fan_out_links,
+    _reconcile_feed_jobs,
+    _requeue_feeds,
+    _schedule_feed_sync,
+    _sync_job_id,
+)
+from rss_reader.utils.message_queue import DueQueue
+from rss_reader.utils.retention import delete_posts
+from rss_reader.utils.unread_counters import UnreadCounters, count_unread_links
+
+NOW = datetime.now()
+
+
+@pytest.fixture(name="conn")
+def conn_fixture():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+
+    with Session(engine) as conn:
+        for i in range(2):
+            conn.add(UserModel(email="user{}@example.com".format(i), uuid=str(i)))
+        conn.add(FeedModel(url="https://example.com/feed.xml", uuid="feed"))
+        conn.commit()
+
+        yield conn
+
+
+@pytest.fixture(name="counters", autouse=True)
+def counters_fixture(monkeypatch):
+    # the parser moves the shared counters, keep them off the real redis
+    counters: UnreadCounters = UnreadCounters()
+    monkeypatch.setattr(counters, "_redis", fakeredis.FakeRedis(), raising=False)
+
+    yield counters
+
+
+@pytest.fixture(name="scheduler")
+def scheduler_fixture(monkeypatch):
+    # reconciliation writes through the shared cache and due queue too
+    redis_conn = fakeredis.FakeRedis()
+    monkeypatch.setattr(Cache(), "_redis", redis_conn, raising=False)
+    monkeypatch.setattr(DueQueue(), "_redis", redis_conn, raising=False)
+
+    yield Scheduler(connection=redis_conn)
+
+
+def _subscribe(conn: Session, user_ids: list[int], feed_id: int = 1):
+    for user_id in user_ids:
+        conn.add(SubscriptionModel(user_id=user_id, feed_id=feed_id))
+    conn.commit()
+
+
+def _post_rows(guids: list[str]) -> list[dict]:
+    return [
+        {
+            "uuid": guid,
+            "guid": guid,
+            "url": "https://example.com/{}".format(guid),
+            "title": "post {}".format(guid),
+            "published_at": NOW - timedelta(days=i),
+            "feed_id": 1,
+        }
+        for i, guid in enumerate(guids)
+    ]
+
+
+def test_following_a_feed_subscribes_in_links_mode(conn: Session):
+    _create_posts_add_links(
+        conn=conn, post_rows=_post_rows(["a", "b"]), post_ids=[], user_id=1, feed_id=1
+    )
+
+    # a second follower links the existing posts
+    post_ids = conn.exec(select(PostModel.id)).all()
+    _create_posts_add_links(
+        conn=conn, post_rows=[], post_ids=post_ids, user_id=2, feed_id=1
+    )
+
+    subs = conn.exec(select(SubscriptionModel.user_id, SubscriptionModel.feed_id)).all()
+    assert sorted(subs) == [(1, 1), (2, 1)]
+    assert len(conn.exec(select(UserFeedPostLink)).all()) == 4
+
+
+def test_pruned_feed_keeps_its_followers(conn: Session):
+    _create_posts_add_links(
+        conn=conn, post_rows=_post_rows(["a", "b"]), post_ids=[], user_id=1, feed_id=1
+    )
+
+    # retention prunes every post of a quiet feed along with its links
+    delete_posts(conn, conn.exec(select(PostModel.id)).all())
+    conn.commit()
+    assert count_unread_links(conn=conn, user_ids=[1]) == {1: {1: 0}}
+
+    _create_posts_fan_out_links(conn=conn, post_rows=_post_rows(["c"]), feed_id=1)
+
+    links = conn.exec(select(UserFeedPostLink.user_id, UserFeedPostLink.feed_id)).all()
+    assert links == [(1, 1)]
+    assert count_unread_links(conn=conn, user_ids=[1]) == {1: {1: 1}}
+
+
+def test_new_posts_fan_out_to_every_subscriber(conn: Session, counters: UnreadCounters):
+    _subscribe(conn, [1, 2])
+    counters.replace({1: {}, 2: {}})
+
+    rows = _post_rows(["a", "b", "c"])
+    assert _create_posts_fan_out_links(conn=conn, post_rows=rows, feed_id=1) == 3
+
+    # each post is stored once and linked once per subscriber, unread
+    posts = conn.exec(select(PostModel.id, PostModel.published_at)).all()
+    assert len(posts) == 3
+
+    links = conn.exec(
+        select(
+            UserFeedPostLink.user_id,
+            UserFeedPostLink.post_id,
+            UserFeedPostLink.published_at,
+            UserFeedPostLink.is_read,
+        )
+    ).all()
+    assert sorted(links) == sorted(
+        (user_id, post_id, published_at, False)
+        for user_id in [1, 2]
+        for post_id, published_at in posts
+    )
+    assert counters.get(1) == {1: 3}
+    assert counters.get(2) == {1: 3}
+
+
+def test_posts_and_links_are_written_one_batch_per_transaction(
+    conn: Session, counters: UnreadCounters, monkeypatch
+):
+    monkeypatch.setattr(feed_parser, "_get_batch_size", lambda: 2)
+    counters.replace({1: {}})
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    # the last batch fails, the batches before it stay committed
+    rows = _post_rows(["a", "b", "c", "d", "e"])
+    rows[-1]["title"] = None
+    with pytest.raises(IntegrityError):
+        _create_posts_add_links(
+            conn=conn, post_rows=rows, post_ids=[], user_id=1, feed_id=1
+        )
+
+    guids = conn.exec(select(PostModel.guid).order_by(PostModel.id)).all()
+    assert guids == ["a", "b", "c", "d"]
+    assert len(conn.exec(select(UserFeedPostLink)).all()) == 4
+    assert counters.get(1) == {1: 4}
+
+
+def test_synced_entries_are_deduplicated_on_feed_and_guid(
+    conn: Session, counters: UnreadCounters
+):
+    _subscribe(conn, [1])
+    counters.replace({1: {}})
+
+    assert (
+        _create_posts_fan_out_links(
+            conn=conn, post_rows=_post_rows(["a", "b"]), feed_id=1
+        )
+        == 2
+    )
+
+    # a later tick sees the same entries again next to a new one, the
+    # unique index skips the stored ones and nothing is linked twice
+    rows = _post_rows(["a", "b", "c"])
+    rows[0]["title"] = "post a, edited"
+    assert _create_posts_fan_out_links(conn=conn, post_rows=rows, feed_id=1) == 1
+
+    posts = conn.exec(select(PostModel.guid, PostModel.title)).all()
+    assert sorted(posts) == [("a", "post a"), ("b", "post b"), ("c", "post c")]
+    assert len(conn.exec(select(UserFeedPostLink)).all()) == 3
+    assert counters.get(1) == {1: 3}
+
+
+def test_requeue_replaces_the_feed_job(conn: Session, scheduler: Scheduler):
+    conn.add(FeedModel(url="https://example.com/other.xml", uuid="other"))
+    conn.commit()
+
+    # a force refresh of feed 1, twice, leaves a single job for it
+    for _ in range(2):
+        _requeue_feeds(conn=conn, scheduler=scheduler, feed_id=1)
+
+    jobs = list(scheduler.get_jobs())
+    assert [job.id for job in jobs] == [_sync_job_id(1)]
+    assert jobs[0].kwargs == {"url": "https://example.com/feed.xml", "feed_id": 1}
+
+
+def test_reconcile_only_touches_the_difference(conn: Session, scheduler: Scheduler):
+    conn.add(
+        FeedModel(url="https://example.com/gone.xml", uuid="gone", is_active=False)
+    )
+    conn.commit()
+
+    # feed 1 has no job yet, inactive feed 2 still has one
+    _schedule_feed_sync(
+        scheduler=scheduler,
+        feed_id=2,
+        url="https://example.com/gone.xml",
+        interval=300,
+        scheduled_time=NOW,
+    )
+    other = scheduler.schedule(scheduled_time=NOW, func=print, interval=60)
+
+    assert _reconcile_feed_jobs(conn=conn, scheduler=scheduler) == {
+        "added": 1,
+        "removed": 1,
+    }
+    assert {job.id for job in scheduler.get_jobs()} == {_sync_job_id(1), other.id}
+
+    assert _reconcile_feed_jobs(conn=conn, scheduler=scheduler) == {
+        "added": 0,
+        "removed": 0,
+    }
+
+
+def test_dispatcher_claims_due_feeds_once(conn: Session):
+    now = datetime.now()
+    for i, (next_sync_at, extra) in enumerate(
+        [
+            (now - timedelta(hours=1), {}),
+            (now + timedelta(hours=1), {}),
+            (now - timedelta(hours=2), {"is_active": False}),
+            (
+                now - timedelta(hours=2),
+                {"sync_failures": len(_SYNC_BACKOFF_INTERVALS) + 1},
+            ),
+            (now - timedelta(minutes=1), {}),
+        ]
+    ):
+        conn.add(
+            FeedModel(
+                url="https://example.com/{}.xml".format(i),
+                uuid=str(i),
+                next_sync_at=next_sync_at,
+                **extra,
+            )
+        )
+    conn.commit()
+
+    # feed 1 was never synced and goes first, then the longest overdue.
+    # future, inactive and given up feeds are never claimed
+    assert _claim_due_feeds(conn=conn, limit=2, lease=300) == [1, 2]
+    assert _claim_due_feeds(conn=conn, limit=2, lease=300) == [6]
+
+    # claimed feeds are leased until the sync is done
+    assert _claim_due_feeds(conn=conn, limit=2, lease=300) == []
+    next_sync_at = conn.exec(
+        select(FeedModel.next_sync_at).where(FeedModel.id.in_([1, 2, 6]))
+    ).all()
+    assert all(t > now + timedelta(seconds=290) for t in next_sync_at)
@@ -0,0 +1,40 @@
+import time
+
+from rss_reader.utils.local_cache import MISSING, LocalCache
+
+
+def test_evicts_least_recently_used():
+    cache = LocalCache(max_entries=2, ttl=60)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_entries_expire():
+    cache = LocalCache(max_entries=10, ttl=60)
+
+    cache.set("a", None, ttl=0.01)
+    assert cache.get("a") is None
+
+    time.sleep(0.02)
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def test_zero_entries_disables_cache():
+    cache = LocalCache(max_entries=0, ttl=60)
+
+    cache.set("a", 1)
+    assert cache.get("a") is MISSING
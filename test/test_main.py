@@ -1,15 +1,29 @@
 # builtin imports
 import json
+from datetime import datetime, timedelta
 
+import fakeredis
 import pytest
-from sqlmodel import create_engine, SQLModel, Session
+from rq import Queue
+from sqlmodel import create_engine, select, SQLModel, Session
 from sqlmodel.pool import StaticPool
 
 # internal imports
 from fastapi.testclient import TestClient
 from rss_reader.main import app
 from rss_reader.api.v1.app_data import AppMetadata
+from rss_reader.database.models import (
+    Feeds as FeedModel,
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+    Users as UserModel,
+)
 from rss_reader.utils.database import get_db_connection
+from rss_reader.utils.message_queue import get_queue_conn
+from rss_reader.utils.unread_counters import UnreadCounters, get_unread_counters
+
+PUBLISHED_AT = datetime(2024, 5, 1, 12)
 
 
 @pytest.fixture(name="session")
@@ -26,18 +40,94 @@ def session_fixture():
     SQLModel.metadata.drop_all(engine)
 
 
+@pytest.fixture(name="mq")
+def mq_fixture():
+    yield Queue(connection=fakeredis.FakeRedis())
+
+
+@pytest.fixture(name="counters")
+def counters_fixture():
+    counters: UnreadCounters = type.__call__(UnreadCounters)
+    counters.setup(fakeredis.FakeRedis())
+
+    yield counters
+
+
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(session: Session, mq: Queue, counters: UnreadCounters):
     def get_session_override():
         return session
 
     app.dependency_overrides[get_db_connection] = get_session_override
+    app.dependency_overrides[get_queue_conn] = lambda: mq
+    app.dependency_overrides[get_unread_counters] = lambda: counters
 
     client = TestClient(app)
     yield client
     app.dependency_overrides.clear()
 
 
+@pytest.fixture(name="feed_posts")
+def create_feed_posts(session: Session):
+    # one feed followed by two users, five posts of which user 1 has read
+    # the oldest two. posts 2 and 3 are published at the same time
+    for i in range(2):
+        session.add(UserModel(email="user{}@example.com".format(i), uuid=str(i)))
+    session.add(FeedModel(url="https://example.com/feed.xml", uuid="feed"))
+    session.commit()
+
+    for i, hours in enumerate([0, 1, 2, 2, 3]):
+        published_at = PUBLISHED_AT + timedelta(hours=hours)
+        session.add(
+            PostModel(
+                title="post {}".format(i),
+                url="https://example.com/{}".format(i),
+                guid=str(i),
+                uuid="post-{}".format(i),
+                published_at=published_at,
+                feed_id=1,
+            )
+        )
+        for user_id in [1, 2]:
+            session.add(
+                UserFeedPostLink(
+                    user_id=user_id,
+                    feed_id=1,
+                    post_id=i + 1,
+                    published_at=published_at,
+                    is_read=user_id == 1 and i < 2,
+                )
+            )
+    session.commit()
+
+    yield 1
+
+
+def _list_titles(client: TestClient, path: str, params: dict) -> list[list[str]]:
+    pages = []
+    cursor = None
+    while True:
+        resp = client.get(
+            path, params={**params, "cursor": cursor} if cursor else params
+        )
+        assert resp.status_code == 200
+
+        pages.append([p.get("post", p)["title"] for p in resp.json()["posts"]])
+        cursor = resp.json()["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def _unread_post_ids(session: Session, user_id: int) -> list[int]:
+    q = (
+        select(UserFeedPostLink.post_id)
+        .where(UserFeedPostLink.user_id == user_id)
+        .where(UserFeedPostLink.is_read == False)
+        .order_by(UserFeedPostLink.post_id)
+    )
+    return session.exec(q).all()
+
+
 def test_ping_main(client: TestClient):
     resp = client.get("/ping")
     assert resp.status_code == 200
@@ -53,3 +143,130 @@ def test_app_metadata(client: TestClient):
 
     assert resp_json["app_version"] == amd.app_version
     assert resp_json["fastapi_version"] == amd.fastapi_version
+
+
+def test_unfollow_feed_drops_subscription_and_links(
+    client: TestClient, session: Session
+):
+    now = datetime.now()
+    session.add(UserModel(email="user@example.com", uuid="user"))
+    session.add(FeedModel(url="https://example.com/feed.xml", uuid="feed"))
+    session.add(
+        PostModel(
+            title="post",
+            url="https://example.com/post",
+            guid="post",
+            uuid="post",
+            published_at=now,
+            feed_id=1,
+        )
+    )
+    session.add(SubscriptionModel(user_id=1, feed_id=1, created_at=now, updated_at=now))
+    session.add(UserFeedPostLink(user_id=1, feed_id=1, post_id=1))
+    session.commit()
+
+    resp = client.request("DELETE", "/v1/feeds/", json={"user_id": 1, "feed_ids": [1]})
+    assert resp.status_code == 204
+
+    assert session.exec(select(SubscriptionModel)).all() == []
+    assert session.exec(select(UserFeedPostLink)).all() == []
+
+
+def test_force_refresh_queues_a_requeue_of_the_feed(
+    client: TestClient, session: Session, mq: Queue
+):
+    session.add(FeedModel(url="https://example.com/feed.xml", uuid="feed"))
+    session.commit()
+
+    resp = client.post("/v1/feeds/1/force-refresh")
+    assert resp.status_code == 202
+
+    (job,) = mq.jobs
+    assert job.func_name == "rss_reader.utils.feed_parser.requeue_jobs_for_user_feed"
+    assert job.args == (1,)
+
+    resp = client.post("/v1/feeds/2/force-refresh")
+    assert resp.status_code == 404
+    assert len(mq.jobs) == 1
+
+
+def test_feed_posts_are_paged_newest_first(client: TestClient, feed_posts: int):
+    # every post once although two users follow the feed, the page break
+    # between the posts published at the same time is resolved by id
+    pages = _list_titles(client, "/v1/feeds/{}/".format(feed_posts), {"limit": 2})
+    assert pages == [["post 4", "post 3"], ["post 2", "post 1"], ["post 0"]]
+
+    resp = client.get("/v1/feeds/{}/".format(feed_posts), params={"limit": 1})
+    assert resp.json()["feed"]["url"] == "https://example.com/feed.xml"
+
+
+def test_user_feed_posts_are_paged_and_filtered(client: TestClient, feed_posts: int):
+    path = "/v1/feeds/{}/user/1".format(feed_posts)
+
+    pages = _list_titles(client, path, {"limit": 2, "is_read": False})
+    assert pages == [["post 4", "post 3"], ["post 2"]]
+
+    pages = _list_titles(client, path, {"limit": 10, "is_read": True})
+    assert pages == [["post 1", "post 0"]]
+
+
+def test_feed_posts_reject_bad_pages(client: TestClient, feed_posts: int):
+    path = "/v1/feeds/{}/".format(feed_posts)
+
+    assert client.get(path, params={"cursor": "nope"}).status_code == 400
+    assert client.get(path, params={"limit": 0}).status_code == 422
+    assert client.get("/v1/feeds/404/").status_code == 404
+
+
+def test_mark_read_covers_every_feed_in_one_call(
+    client: TestClient, session: Session, counters: UnreadCounters, feed_posts: int
+):
+    session.add(FeedModel(url="https://example.com/other.xml", uuid="other"))
+    session.add(
+        PostModel(
+            title="other",
+            url="https://example.com/other",
+            guid="other",
+            uuid="other",
+            published_at=PUBLISHED_AT,
+            feed_id=2,
+        )
+    )
+    session.add(
+        UserFeedPostLink(user_id=1, feed_id=2, post_id=6, published_at=PUBLISHED_AT)
+    )
+    session.commit()
+    counters.replace({1: {1: 3, 2: 1}})
+
+    resp = client.post("/v1/feeds/mark-read", json={"user_id": 1, "feed_ids": [1, 2]})
+    assert resp.status_code == 200
+    assert resp.json() == {"updated": 4}
+
+    assert _unread_post_ids(session, 1) == []
+    assert _unread_post_ids(session, 2) == [1, 2, 3, 4, 5]
+    assert counters.get(1) == {1: 0, 2: 0}
+
+    resp = client.post("/v1/feeds/mark-read", json={"user_id": 1, "feed_ids": [404]})
+    assert resp.status_code == 404
+
+
+def test_mark_all_read_leaves_newer_posts_unread(
+    client: TestClient, session: Session, counters: UnreadCounters, feed_posts: int
+):
+    counters.replace({1: {1: 3}})
+    path = "/v1/feeds/{}/mark-all-read".format(feed_posts)
+
+    # posts published up to before are read, post 4 came in later
+    before = PUBLISHED_AT + timedelta(hours=2)
+    resp = client.post(path, params={"user_id": 1, "before": before.isoformat()})
+    assert resp.status_code == 204
+
+    assert _unread_post_ids(session, 1) == [5]
+    assert counters.get(1) == {1: 1}
+
+    resp = client.post(path, params={"user_id": 1})
+    assert resp.status_code == 204
+
+    assert _unread_post_ids(session, 1) == []
+    assert _unread_post_ids(session, 2) == [1, 2, 3, 4, 5]
+    assert counters.get(1) == {1: 0}
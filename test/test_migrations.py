@@ -0,0 +1,114 @@
+# builtin imports
+import importlib.util
+import os
+from datetime import datetime
+from glob import glob
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.exc import OperationalError
+
+# internal imports
+from rss_reader.config.config import Config
+from rss_reader.utils.database import Database
+
+_VERSIONS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions"
+)
+
+_SCHEMA = "migration_test"
+
+NOW = datetime(2024, 5, 1, 12, 0)
+
+
+@pytest.fixture(name="pg")
+def pg_fixture():
+    # migrations use postgres only sql, they run on the test database in
+    # a schema of their own that is rolled back with the transaction
+    database: Database = type.__call__(Database)
+    database.setup(Config(os.getenv("APP_MODE") or "test").db_config)
+
+    try:
+        conn = database.get_engine().connect()
+    except OperationalError:
+        pytest.skip("postgres is not reachable")
+
+    with conn:
+        trans = conn.begin()
+        conn.execute(text("CREATE SCHEMA {}".format(_SCHEMA)))
+        conn.execute(text("SET LOCAL search_path TO {}".format(_SCHEMA)))
+
+        yield conn
+
+        trans.rollback()
+
+
+def _upgrade(conn: Connection, revision: str):
+    (path,) = glob(os.path.join(_VERSIONS, "{}_*.py".format(revision)))
+    spec = importlib.util.spec_from_file_location(revision, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    with Operations.context(MigrationContext.configure(conn)):
+        module.upgrade()
+
+
+def test_guid_migration_backfills_and_merges_duplicates(pg: Connection):
+    # schema as it was right before guids were added
+    for revision in ["9c7caadfc0a5", "5ecddbaaf9ef", "3f1c2a7d9b41"]:
+        _upgrade(pg, revision)
+
+    pg.execute(
+        text(
+            "INSERT INTO feeds VALUES (1, 'feed', 'https://example.com/feed.xml', "
+            "true, false, :now, :now, NULL)"
+        ),
+        {"now": NOW},
+    )
+    pg.execute(
+        text(
+            "INSERT INTO users VALUES "
+            "(1, 'a', 'a@example.com', true, :now, :now), "
+            "(2, 'b', 'b@example.com', true, :now, :now)"
+        ),
+        {"now": NOW},
+    )
+    # post 2 is the same entry as post 1, inserted again by a later sync
+    pg.execute(
+        text(
+            "INSERT INTO posts (id, title, url, uuid, published_at, feed_id) VALUES "
+            "(1, 'a', 'https://example.com/a', '1', :now, 1), "
+            "(2, 'a', 'https://example.com/a', '2', :now, 1), "
+            "(3, 'b', 'https://example.com/b', '3', :now, 1)"
+        ),
+        {"now": NOW},
+    )
+    pg.execute(
+        text(
+            "INSERT INTO user_feed_post_link "
+            "(user_id, feed_id, post_id, is_read, read_at, created_at, updated_at) "
+            "VALUES (1, 1, 1, false, NULL, :now, :now), "
+            "(1, 1, 2, true, :now, :now, :now), "
+            "(2, 1, 2, false, NULL, :now, :now)"
+        ),
+        {"now": NOW},
+    )
+
+    _upgrade(pg, "a84e6c1f2d07")
+
+    posts = pg.execute(text("SELECT id, guid FROM posts ORDER BY id")).all()
+    assert posts == [(1, "https://example.com/a"), (3, "https://example.com/b")]
+
+    # links of the duplicate move to the kept post, a read wins
+    links = pg.execute(
+        text(
+            "SELECT user_id, post_id, is_read, read_at FROM user_feed_post_link "
+            "ORDER BY user_id, post_id"
+        )
+    ).all()
+    assert links == [(1, 1, True, NOW), (2, 1, False, None)]
+
+    constraints = inspect(pg).get_unique_constraints("posts", schema=_SCHEMA)
+    assert [c["column_names"] for c in constraints] == [["feed_id", "guid"]]
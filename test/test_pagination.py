@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pytest
+
+from rss_reader.utils.pagination import Cursor, page
+
+
+def test_cursor_round_trip():
+    cursor = Cursor.decode(Cursor(datetime(2024, 5, 6, 10, 0), 42).encode())
+
+    assert cursor.published_at == datetime(2024, 5, 6, 10, 0)
+    assert cursor.id == 42
+
+
+def test_cursor_rejects_garbage():
+    with pytest.raises(ValueError):
+        Cursor.decode("not-a-cursor")
+
+
+def test_page_returns_next_cursor_only_when_more_rows():
+    rows = [(datetime(2024, 5, 6, 10 - i), i) for i in range(3)]
+
+    trimmed, next_cursor = page(rows=rows, limit=2, key=lambda row: row)
+    assert trimmed == rows[:2]
+    assert Cursor.decode(next_cursor).id == 1
+
+    trimmed, next_cursor = page(rows=rows, limit=3, key=lambda row: row)
+    assert trimmed == rows
+    assert next_cursor is None
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from rss_reader.config.config import PollConfig
+from rss_reader.utils.polling import (
+    compute_poll_interval,
+    parse_max_age,
+    parse_ttl,
+)
+
+
+@pytest.fixture(name="config")
+def poll_config_fixture():
+    # a fresh instance, PollConfig() hands back the first one built
+    yield type.__call__(
+        PollConfig,
+        {"default_interval": 300, "min_interval": 300, "max_interval": 86400},
+    )
+
+
+def test_interval_widens_without_new_posts(config: PollConfig):
+    interval = compute_poll_interval(
+        config=config,
+        current_interval=600,
+        published_at=[],
+        has_new_posts=False,
+    )
+
+    assert interval == 900
+
+
+def test_interval_narrows_with_new_posts(config: PollConfig):
+    interval = compute_poll_interval(
+        config=config,
+        current_interval=3600,
+        published_at=[],
+        has_new_posts=True,
+    )
+
+    assert interval == 1800
+
+
+def test_interval_follows_publish_rate(config: PollConfig):
+    now = datetime.now()
+    daily = [now - timedelta(days=day) for day in range(5)]
+
+    interval = compute_poll_interval(
+        config=config,
+        current_interval=None,
+        published_at=daily,
+        has_new_posts=False,
+    )
+
+    # widened default interval blended with half a day
+    assert interval == int((450 + timedelta(days=1).total_seconds() / 2) / 2)
+
+
+def test_interval_within_bounds(config: PollConfig):
+    assert (
+        compute_poll_interval(
+            config=config,
+            current_interval=config.min_interval,
+            published_at=[],
+            has_new_posts=True,
+        )
+        == config.min_interval
+    )
+    assert (
+        compute_poll_interval(
+            config=config,
+            current_interval=config.max_interval,
+            published_at=[],
+            has_new_posts=False,
+        )
+        == config.max_interval
+    )
+
+
+def test_interval_honors_ttl_and_max_age(config: PollConfig):
+    interval = compute_poll_interval(
+        config=config,
+        current_interval=None,
+        published_at=[],
+        has_new_posts=True,
+        ttl=60,
+    )
+    assert interval == 3600
+
+    interval = compute_poll_interval(
+        config=config,
+        current_interval=None,
+        published_at=[],
+        has_new_posts=True,
+        max_age=7200,
+    )
+    assert interval == 7200
+
+
+def test_parse_ttl_and_max_age():
+    assert parse_ttl("60") == 60
+    assert parse_ttl("") is None
+    assert parse_ttl(None) is None
+    assert parse_max_age({"cache-control": "public, max-age=900"}) == 900
+    assert parse_max_age({"cache-control": "no-cache"}) is None
+    assert parse_max_age({}) is None
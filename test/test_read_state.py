@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+
+from rss_reader.database.models import Subscriptions as SubscriptionModel
+from rss_reader.utils.read_state import is_read, mark_post, mark_read_until
+
+NOW = datetime(2024, 5, 6, 10, 0, 0)
+
+
+def test_mark_post_only_keeps_exceptions():
+    sub = SubscriptionModel(user_id=1, feed_id=1, read_until=NOW)
+
+    mark_post(sub, post_id=5, published_at=NOW + timedelta(hours=1), read=True)
+    mark_post(sub, post_id=2, published_at=NOW - timedelta(hours=1), read=True)
+    mark_post(sub, post_id=3, published_at=NOW - timedelta(hours=1), read=False)
+
+    # post 2 is already read by the watermark
+    assert sub.read_post_ids == [5]
+    assert sub.unread_post_ids == [3]
+    assert is_read(sub, 5, NOW + timedelta(hours=1))
+    assert not is_read(sub, 3, NOW - timedelta(hours=1))
+    assert is_read(sub, 2, NOW - timedelta(hours=1))
+    assert not is_read(sub, 7, NOW + timedelta(hours=2))
+
+    mark_post(sub, post_id=5, published_at=NOW + timedelta(hours=1), read=False)
+    assert sub.read_post_ids == []
+
+
+def test_mark_read_until_drops_covered_exceptions():
+    sub = SubscriptionModel(
+        user_id=1, feed_id=1, read_post_ids=[4, 9, 12], unread_post_ids=[1]
+    )
+    published_at = {
+        1: NOW - timedelta(hours=3),
+        4: NOW - timedelta(hours=1),
+        9: NOW + timedelta(hours=1),
+    }
+
+    mark_read_until(sub, NOW, published_at)
+
+    # 12 no longer exists, 4 and 1 are covered by the watermark
+    assert sub.read_until == NOW
+    assert sub.read_post_ids == [9]
+    assert sub.unread_post_ids == []
+
+    # the watermark never moves back
+    mark_read_until(sub, NOW - timedelta(days=1), published_at)
+    assert sub.read_until == NOW
@@ -0,0 +1,144 @@
+import json
+import time
+
+import fakeredis
+import pytest
+from redis import exceptions as redis_exceptions
+
+from rss_reader.config.config import ResponseCacheConfig
+from rss_reader.utils.cache import Cache
+from rss_reader.utils.response_cache import ResponseCache, feed_scope
+
+# built around the singleton, the app's config has the cache turned off
+RESPONSE_CACHE_CONFIG = type.__call__(
+    ResponseCacheConfig,
+    {
+        "enabled": True,
+        "ttl": 300,
+        "negative_ttl": 30,
+        "local_max_entries": 100,
+        "local_ttl": 10,
+        "stale_ttl": 60,
+        "lock_timeout": 10,
+        "lock_wait": 2,
+    },
+)
+
+
+class Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture(name="cache")
+def cache_fixture():
+    c: Cache = Cache()
+    c._redis = fakeredis.FakeRedis()
+
+    # a cache of its own, the app's one stays as the app set it up
+    rc: ResponseCache = type.__call__(ResponseCache)
+    rc.setup(c, RESPONSE_CACHE_CONFIG, subscribe=False)
+
+    yield rc
+
+
+def test_reads_through_until_invalidated(cache: ResponseCache):
+    loader = Loader({"id": 1})
+
+    for _ in range(2):
+        assert cache.get_or_load("feed:1", [feed_scope(1)], loader) == {"id": 1}
+    assert loader.calls == 1
+
+    # other scopes keep their values
+    cache.invalidate(feed_scope(2))
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert loader.calls == 1
+
+    cache.invalidate(feed_scope(1))
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert loader.calls == 2
+
+
+def test_missing_rows_are_cached(cache: ResponseCache):
+    loader = Loader(None)
+
+    assert cache.get_or_load("feed:404", [feed_scope(404)], loader) is None
+    assert cache.get_or_load("feed:404", [feed_scope(404)], loader) is None
+    assert loader.calls == 1
+
+    key = next(iter(cache._cache.get_redis_connection().scan_iter("*feed:404:*")))
+    assert cache._cache.get(key)["expires_at"] <= time.time() + 30
+
+
+def test_redis_errors_fall_back_to_loader(cache: ResponseCache):
+    class Unavailable:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise redis_exceptions.ConnectionError("redis is down")
+
+            return fail
+
+    cache._cache._redis = Unavailable()
+    loader = Loader({"id": 1})
+
+    assert cache.get_or_load("feed:1", [feed_scope(1)], loader) == {"id": 1}
+    cache.invalidate(feed_scope(1))
+    assert loader.calls == 1
+
+
+def test_local_tier_serves_repeated_reads(cache: ResponseCache):
+    loader = Loader({"id": 1})
+
+    for _ in range(3):
+        cache.get_or_load("feed:1", [feed_scope(1)], loader)
+
+    stats = cache.stats()
+    assert loader.calls == 1
+    assert stats["redis"] == {"hits": 0, "misses": 1, "errors": 0}
+    assert stats["local"]["hits"] == 2
+
+    # a new process starts with an empty local tier and reads from redis
+    cache.setup(cache._cache, RESPONSE_CACHE_CONFIG, subscribe=False)
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert loader.calls == 1
+    assert cache.stats()["redis"]["hits"] == 1
+
+
+def test_invalidation_messages_drop_local_generations(cache: ResponseCache):
+    loader = Loader({"id": 1})
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+
+    # another process sets a new generation, until its message arrives the
+    # local generation is still used
+    cache._cache.get_redis_connection().set(cache._generation_key(feed_scope(1)), "1")
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert loader.calls == 1
+
+    cache._on_invalidate({"data": json.dumps([feed_scope(1)]).encode("utf-8")})
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert loader.calls == 2
+
+
+def test_generations_outlive_values_and_never_repeat(cache: ResponseCache):
+    loader = Loader({"id": 1})
+    redis = cache._cache.get_redis_connection()
+    gen_key = cache._generation_key(feed_scope(1))
+
+    cache.invalidate(feed_scope(1))
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert (
+        redis.ttl(gen_key) > RESPONSE_CACHE_CONFIG.ttl + RESPONSE_CACHE_CONFIG.stale_ttl
+    )
+
+    # once the generation expired the next invalidation still moves the
+    # scope past the values written before
+    redis.delete(gen_key)
+    cache.invalidate(feed_scope(1))
+    cache.setup(cache._cache, RESPONSE_CACHE_CONFIG, subscribe=False)
+    cache.get_or_load("feed:1", [feed_scope(1)], loader)
+    assert loader.calls == 2
@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from rss_reader.config.config import RetentionConfig
+from rss_reader.database.partitions import add_months, partition_name
+from rss_reader.database.models import (
+    Feeds as FeedModel,
+    Posts as PostModel,
+    Subscriptions as SubscriptionModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+    Users as UserModel,
+)
+from rss_reader.utils.retention import (
+    PostArchive,
+    delete_posts,
+    drop_expired_rows,
+    find_expired_posts,
+    get_partition_cutoff,
+    get_retention_limits,
+    restore_archive,
+    _count_unread_for_subscriptions,
+    _subscribe_partition_pairs,
+)
+
+NOW = datetime.now()
+
+
+@pytest.fixture(name="conn")
+def conn_fixture():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+
+    with Session(engine) as conn:
+        conn.add(UserModel(email="user@example.com", uuid="user"))
+        conn.add(FeedModel(url="https://example.com/feed.xml", uuid="feed"))
+        for i in range(5):
+            conn.add(
+                PostModel(
+                    title="post {}".format(i),
+                    url="https://example.com/{}".format(i),
+                    guid=str(i),
+                    uuid=str(i),
+                    published_at=NOW - timedelta(days=i * 10),
+                    feed_id=1,
+                )
+            )
+            conn.add(UserFeedPostLink(user_id=1, feed_id=1, post_id=i + 1))
+        conn.commit()
+
+        yield conn
+
+
+# not through the singleton, the app's retention config may exist already
+RETENTION_CONFIG = type.__call__(
+    RetentionConfig,
+    {
+        "enabled": True,
+        "max_age_days": 90,
+        "max_posts": 0,
+        "batch_size": 100,
+        "interval": 3600,
+        "archive_dir": "",
+    },
+)
+
+
+def test_feed_overrides_global_limits():
+    config = RETENTION_CONFIG
+
+    assert get_retention_limits(config, None, None) == (90, 0)
+    assert get_retention_limits(config, 0, 10) == (0, 10)
+
+
+def test_drop_expired_rows():
+    rows = [{"published_at": NOW - timedelta(days=days)} for days in (1, 30)]
+
+    assert drop_expired_rows(rows, 7) == rows[:1]
+    assert drop_expired_rows(rows, 0) == rows
+
+
+def test_find_expired_posts_by_age_and_count(conn: Session):
+    expired = find_expired_posts(
+        conn, feed_id=1, max_age_days=25, max_posts=0, limit=10
+    )
+    assert expired == [5, 4]
+
+    expired = find_expired_posts(conn, feed_id=1, max_age_days=0, max_posts=2, limit=2)
+    assert expired == [5, 4]
+
+
+def test_archive_round_trip(conn: Session, tmp_path):
+    archive = PostArchive(str(tmp_path))
+    unread = delete_posts(conn, [4, 5], archive)
+    conn.commit()
+    archive.close()
+
+    assert unread == {(1, 1): -2}
+    assert len(conn.exec(select(PostModel)).all()) == 3
+
+    restored = restore_archive(conn, archive.path, batch_size=1)
+
+    assert restored == {"posts": 2, "user_feed_post_link": 2}
+    assert conn.get(PostModel, 5).published_at == NOW - timedelta(days=40)
+    assert len(conn.exec(select(UserFeedPostLink)).all()) == 5
+
+
+def test_partition_cutoff_is_the_longest_max_age():
+    cutoff = get_partition_cutoff(RETENTION_CONFIG, [None, 120, 30])
+    assert cutoff.date() == (NOW - timedelta(days=120)).date()
+
+    # a feed keeping its posts forever keeps every partition
+    assert get_partition_cutoff(RETENTION_CONFIG, [None, 0]) is None
+    assert get_partition_cutoff(RETENTION_CONFIG, []) is None
+
+
+def test_monthly_partition_names():
+    month = add_months(date(2024, 11, 1), 3)
+
+    assert month == date(2025, 2, 1)
+    assert (
+        partition_name("user_feed_post_link", month) == "user_feed_post_link_p2025_02"
+    )
+
+
+def test_partition_pairs_are_subscribed_before_the_drop(conn: Session):
+    # any table with user and feed ids stands in for a partition here
+    assert _subscribe_partition_pairs(conn, "user_feed_post_link") == 1
+    assert _subscribe_partition_pairs(conn, "user_feed_post_link") == 0
+    conn.commit()
+
+    subs = conn.exec(select(SubscriptionModel)).all()
+    assert [(s.user_id, s.feed_id, s.read_until) for s in subs] == [(1, 1, None)]
+
+
+def test_pruned_unread_posts_are_counted_per_subscription(conn: Session):
+    conn.add(UserModel(email="other@example.com", uuid="other"))
+    conn.add(FeedModel(url="https://example.com/other.xml", uuid="other"))
+    conn.add(
+        SubscriptionModel(
+            user_id=1, feed_id=1, read_until=NOW - timedelta(days=15), read_post_ids=[1]
+        )
+    )
+    conn.add(SubscriptionModel(user_id=2, feed_id=2))
+    conn.commit()
+
+    posts = [
+        {"id": post.id, "feed_id": post.feed_id, "published_at": post.published_at}
+        for post in conn.exec(select(PostModel)).all()
+    ]
+    posts.append({"id": 6, "feed_id": 2, "published_at": NOW})
+
+    # post 2 is the only unread one of feed 1, user 2 only follows feed 2
+    assert _count_unread_for_subscriptions(conn, posts) == Counter(
+        {(1, 1): -1, (2, 2): -1}
+    )
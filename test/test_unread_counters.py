@@ -0,0 +1,33 @@
+from collections import Counter
+
+import fakeredis
+import pytest
+
+from rss_reader.utils.unread_counters import UnreadCounters
+
+
+@pytest.fixture(name="counters")
+def counters_fixture():
+    c: UnreadCounters = UnreadCounters()
+    c.setup(fakeredis.FakeRedis())
+
+    yield c
+
+
+def test_counts_are_untrusted_until_replaced(counters: UnreadCounters):
+    counters.incr(user_id=1, feed_id=10, amount=3)
+    assert counters.get(1) is None
+
+    counters.replace({1: {10: 5, 11: 0}})
+    assert counters.get(1) == {10: 5, 11: 0}
+
+
+def test_incr_and_remove(counters: UnreadCounters):
+    counters.replace({1: {10: 1}, 2: {10: 4}})
+
+    counters.incr_many(Counter({(1, 10): -2, (1, 11): 2, (2, 10): 1}))
+    counters.remove(user_id=2, feed_ids=[10])
+
+    # counts never go below zero
+    assert counters.get(1) == {10: 0, 11: 2}
+    assert counters.get(2) == {}
@@ -1,4 +1,5 @@
 import datetime
+import fakeredis
 import pytest
 import uuid
 from httpx import QueryParams
@@ -11,7 +12,13 @@ from sqlalchemy import create_engine
 
 from rss_reader.main import app
 from rss_reader.utils.database import get_db_connection
-from rss_reader.database.models import Users as UserModel
+from rss_reader.utils.unread_counters import UnreadCounters, get_unread_counters
+from rss_reader.database.models import (
+    Feeds as FeedModel,
+    Posts as PostModel,
+    User_Feed_Post_Link as UserFeedPostLink,
+    Users as UserModel,
+)
 
 
 @pytest.fixture(name="session")
@@ -28,12 +35,22 @@ def session_fixture():
     SQLModel.metadata.drop_all(engine)
 
 
+@pytest.fixture(name="counters")
+def counters_fixture():
+    # counters of their own, the app's ones live in the shared redis
+    counters: UnreadCounters = type.__call__(UnreadCounters)
+    counters.setup(fakeredis.FakeRedis())
+
+    yield counters
+
+
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+def client_fixture(session: Session, counters: UnreadCounters):
     def get_session_override():
         return session
 
     app.dependency_overrides[get_db_connection] = get_session_override
+    app.dependency_overrides[get_unread_counters] = lambda: counters
     app.debug = True
 
     client = TestClient(app)
@@ -109,6 +126,46 @@ def create_multiple_users(session: Session):
     yield users_list
 
 
+@pytest.fixture(name="followed_feeds")
+def create_followed_feeds(session: Session, test_user: UserModel):
+    now = datetime.datetime(2024, 5, 1, 12)
+    feeds = [
+        FeedModel(url="https://example.com/{}.xml".format(i), uuid="feed-{}".format(i))
+        for i in range(2)
+    ]
+    session.add_all(feeds)
+    session.commit()
+
+    # six posts over two feeds, two of them published at the same time
+    published_at = [0, 1, 2, 2, 3, 4]
+    for i, hours in enumerate(published_at):
+        feed = feeds[i % 2]
+        post = PostModel(
+            title="post {}".format(i),
+            url="https://example.com/{}".format(i),
+            guid=str(i),
+            uuid="post-{}".format(i),
+            published_at=now + datetime.timedelta(hours=hours),
+            feed_id=feed.id,
+        )
+        session.add(post)
+        session.commit()
+        session.refresh(post)
+
+        session.add(
+            UserFeedPostLink(
+                user_id=test_user.id,
+                feed_id=feed.id,
+                post_id=post.id,
+                published_at=post.published_at,
+                is_read=i < 2,
+            )
+        )
+    session.commit()
+
+    yield [feed.id for feed in feeds]
+
+
 def test_create_user_success(client: TestClient):
     email = "user@example.com"
     resp = client.post("/v1/users", json={"email": email})
@@ -246,3 +303,90 @@ def test_delete_user_not_found(client: TestClient, nil_uuid: str):
     resp = client.delete(path)
 
     assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_user_timeline_pages_newest_first(
+    client: TestClient, test_user: UserModel, followed_feeds: list[int]
+):
+    titles = []
+    cursor = None
+    for _ in range(2):
+        params = {"limit": 3}
+        if cursor is not None:
+            params["cursor"] = cursor
+
+        resp = client.get("/v1/users/{}/timeline".format(test_user.id), params=params)
+        assert resp.status_code == status.HTTP_200_OK
+
+        titles.extend(p["post"]["title"] for p in resp.json()["posts"])
+        cursor = resp.json()["next_cursor"]
+
+    # the first page ends between the two posts published at the same
+    # time, the cursor picks up the other one by id
+    assert titles == ["post {}".format(i) for i in [5, 4, 3, 2, 1, 0]]
+    assert cursor is None
+
+
+def test_get_user_timeline_unread_only(
+    client: TestClient, test_user: UserModel, followed_feeds: list[int]
+):
+    resp = client.get(
+        "/v1/users/{}/timeline".format(test_user.id),
+        params={"is_read": False, "limit": 10},
+    )
+    posts = resp.json()["posts"]
+
+    assert [p["post"]["title"] for p in posts] == [
+        "post {}".format(i) for i in [5, 4, 3, 2]
+    ]
+    assert all(not p["is_read"] for p in posts)
+    assert resp.json()["next_cursor"] is None
+
+
+def test_get_user_timeline_invalid_cursor(client: TestClient, test_user: UserModel):
+    resp = client.get(
+        "/v1/users/{}/timeline".format(test_user.id), params={"cursor": "nope"}
+    )
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_user_timeline_user_not_found(client: TestClient):
+    resp = client.get("/v1/users/404/timeline")
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_get_user_unread_counts(
+    client: TestClient,
+    counters: UnreadCounters,
+    test_user: UserModel,
+    followed_feeds: list[int],
+):
+    resp = client.get("/v1/users/{}/unread-counts".format(test_user.id))
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "counts": {str(followed_feeds[0]): 2, str(followed_feeds[1]): 2},
+        "total": 4,
+    }
+
+    # counted once, later reads come from the counters
+    counters.incr(user_id=test_user.id, feed_id=followed_feeds[0], amount=1)
+    resp = client.get("/v1/users/{}/unread-counts".format(test_user.id))
+    assert resp.json()["total"] == 5
+
+
+def test_get_user_unread_counts_without_redis(
+    client: TestClient,
+    counters: UnreadCounters,
+    test_user: UserModel,
+    followed_feeds: list[int],
+):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    counters.setup(fakeredis.FakeRedis(server=server))
+
+    # counted from the links when redis is unavailable
+    resp = client.get("/v1/users/{}/unread-counts".format(test_user.id))
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["total"] == 4